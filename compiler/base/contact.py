@@ -20,8 +20,9 @@ class contact(design.design):
         The well/implant_type is an option to add a select/implant layer enclosing the contact. 
         This is necessary to import layouts into Magic which requires the select to be in the same GDS
         hierarchy as the contact. """
+    memoize = True
         
-    def __init__(self, layer_stack, dimensions=[1,1], implant_type=None, well_type=None, add_extra_layer=None):
+    def __init__(self, layer_stack, dimensions=[1,1], implant_type=None, well_type=None, add_extra_layer=False):
         if implant_type or well_type:
             name = "{0}_{1}_{2}_{3}x{4}_{5}{6}".format(layer_stack[0],
                                                        layer_stack[1],
@@ -36,8 +37,10 @@ class contact(design.design):
                                                 layer_stack[2],
                                                 dimensions[0],
                                                 dimensions[1])
+        if add_extra_layer:
+            name += "_x"
         design.design.__init__(self, name)
-        debug.info(4, "create contact object {0}".format(name))
+        debug.info(4, "create contact object {0}", name)
 
         self.layer_stack = layer_stack
         self.dimensions = dimensions
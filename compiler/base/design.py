@@ -10,12 +10,43 @@ import hierarchy_spice
 import globals
 import debug
 import os
+import inspect
 from globals import OPTS
 
+class design_registry(type):
+    """ Metaclass of the designs. A design class that sets memoize is built once
+        for each set of constructor arguments and the same design is returned after that. """
+
+    designs = {}
+
+    def __call__(cls, *args, **kwargs):
+        if not cls.memoize:
+            return type.__call__(cls, *args, **kwargs)
+        # bind the arguments so defaults and keywords give the same key as positions
+        arguments = inspect.getcallargs(cls.__init__.im_func, None, *args, **kwargs)
+        del arguments["self"]
+        # modules reloaded by bank and sram give new classes that build the same designs
+        key = (cls.__module__, cls.__name__, freeze(arguments))
+        if key not in design_registry.designs:
+            design_registry.designs[key] = type.__call__(cls, *args, **kwargs)
+        return design_registry.designs[key]
+
+def freeze(value):
+    """ Return a hashable copy of nested lists and dictionaries of arguments """
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for (key, item) in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
 class design(hierarchy_spice.spice, hierarchy_layout.layout):
     """ Design Class for all modules to inherit the base features.
         Class consisting of a set of modules and instances of these modules """
-    name_map = []
+    __metaclass__ = design_registry
+    name_map = set()
+    # Designs named after their constructor arguments set this so equal
+    # arguments share one design instead of building a duplicate
+    memoize = False
 
     def __init__(self, name):
         self.gds_file = OPTS.AMC_tech + "gds_lib/" + name + ".gds"
@@ -29,28 +60,9 @@ class design(hierarchy_spice.spice, hierarchy_layout.layout):
         
         # Check if the name already exists, if so, give an error
         # because each reference must be a unique name.
-        # These modules ensure unique names or have no changes if they
-        # aren't unique
-        ok_list = ['split.split',
-                   'merge.merge',
-                   'bitcell.bitcell',
-                   'contact.contact',
-                   'ptx.ptx',
-                   'pinv.pinv',
-                   'nand2.nand2',
-                   'nor2.nor2',
-                   'nand3.nand3',
-                   'nor3.nor3',
-                   'single_driver.single_driver',
-                   'driver.driver',
-                   'flipflop.flipflop',
-                   'xor2.xor2',
-                   'hierarchical_predecode2x4.hierarchical_predecode2x4',
-                   'hierarchical_predecode3x8.hierarchical_predecode3x8']
+        # Memoized modules with equal arguments are never built twice.
         if name not in design.name_map:
-            design.name_map.append(name)
-        elif str(self.__class__) in ok_list:
-            pass
+            design.name_map.add(name)
         else:
             debug.error("Duplicate layout reference name {0} of class {1}. GDS2 requires names be unique.".format(name,self.__class__),-1)
         
@@ -142,11 +154,8 @@ class design(hierarchy_spice.spice, hierarchy_layout.layout):
         """ Return a map of pin locations of the instance offset """
         
         # find the instance
-        for i in self.insts:
-            if i.name == inst.name:
-                break
-        else:
-            debug.error("Couldn't find instance {0}".format(inst_name),-1)
+        if self.get_inst(inst.name) is None:
+            debug.error("Couldn't find instance {0}".format(inst.name),-1)
         inst_map = inst.mod.pin_map
         return inst_map
 
@@ -7,18 +7,54 @@
 
 """ This provides a set of useful generic types for the gdsMill interface. """
 import debug
-from vector import vector
+import array
+import itertools
+from vector import vector, grid_vector, to_grid, from_grid
 import tech
-import math
 from globals import OPTS
 
-class geometry:
+class geometry(object):
     """ A specific path, shape, or text geometry. Base class for shared items. """
+
+    # The layout holding the geometry. Its pending translation (origin) is
+    # subtracted from the offset and boundary when they are read.
+    frame = None
+
     def __init__(self):
         """ By default, everything has no size. """
         self.width = 0
         self.height = 0
 
+    def get_offset(self):
+        """ Return the offset in the current coordinates of the holding layout """
+        if self.frame is None or self.frame.origin is None:
+            return self.placement
+        return self.placement - self.frame.origin
+
+    def set_offset(self, offset):
+        """ Set the offset given in the current coordinates of the holding layout """
+        if self.frame is None or self.frame.origin is None:
+            self.placement = offset
+        else:
+            self.placement = offset + self.frame.origin
+
+    offset = property(get_offset, set_offset)
+
+    def get_boundary(self):
+        """ Return the boundary in the current coordinates of the holding layout """
+        if self.frame is None or self.frame.origin is None:
+            return self.placed_boundary
+        return [self.placed_boundary[0] - self.frame.origin, self.placed_boundary[1] - self.frame.origin]
+
+    def set_boundary(self, boundary):
+        """ Set the boundary given in the current coordinates of the holding layout """
+        if self.frame is None or self.frame.origin is None:
+            self.placed_boundary = boundary
+        else:
+            self.placed_boundary = [boundary[0] + self.frame.origin, boundary[1] + self.frame.origin]
+
+    boundary = property(get_boundary, set_boundary)
+
     def __str__(self):
         """ override print function output """
         debug.error("__str__ must be overridden by all geometry types.",1)
@@ -27,16 +63,6 @@ class geometry:
         """ override print function output """
         debug.error("__repr__ must be overridden by all geometry types.",1)
 
-    def transform_coords(self, coords, offset, mirr, angle):
-        """Calculate coordinates after flip, rotate, and shift"""
-        
-        coordinate = []
-        for item in coords:
-            x = item[0]*math.cos(angle) - item[1]*mirr*math.sin(angle) + offset[0]
-            y = item[0]*math.sin(angle) + item[1]*mirr*math.cos(angle) + offset[1]
-            coordinate += [[x, y]]
-        return coordinate
-    
     def normalize(self):
         """ Re-find the LL and UR points after a transform """
         
@@ -107,68 +133,78 @@ class geometry:
         
 class instance(geometry):
     """ An instance of an instance/module with a specified location and rotation """
-    def __init__(self, name, mod, offset, mirror, rotate):
+    def __init__(self, name, mod, offset, mirror, rotate, frame=None):
         """Initializes an instance to represent a module"""
         geometry.__init__(self)
+        self.frame = frame
         debug.check(mirror not in ["R90","R180","R270"], "Please use rotation and not mirroring during instantiation.")
         
         self.name = name
         self.mod = mod
-        self.gds = mod.gds
         self.rotate = rotate
-        self.offset = vector(offset).snap_to_grid()
+        self.offset = grid_vector(offset)
         self.mirror = mirror
         self.width = mod.width
         self.height = mod.height
         self.compute_boundary(offset,mirror,rotate)
+        # pin name -> (master pins, their rects, frame origin, transformed pins), see get_pins
+        self.pin_cache = {}
         
-        debug.info(4, "creating instance: " + self.name)
+        debug.info(4, "creating instance: {}", self.name)
 
     def get_blockages(self, layer, top=False):
         """ Retrieve rectangular blockages of all modules in this instance.
         Apply the transform of the instance placement to give absolute blockages."""
         
-        angle = math.radians(float(self.rotate))
-        mirr = 1
-        if self.mirror=="R90":
-            angle += math.radians(90.0)
-        elif self.mirror=="R180":
-            angle += math.radians(180.0)
-        elif self.mirror=="R270":
-            angle += math.radians(270.0)
-        elif self.mirror=="MX":
-            mirr = -1
-        elif self.mirror=="MY":
-            mirr = -1
-            angle += math.radians(180.0)
-        elif self.mirror=="XY":
-            mirr = 1
-            angle += math.radians(180.0)
-            
+        return [[vector(from_grid(x1), from_grid(y1)), vector(from_grid(x2), from_grid(y2))]
+                for (x1, y1, x2, y2) in self.get_grid_blockages(layer)]
+
+    def get_grid_blockages(self, layer):
+        """ Return the blockages of the module placed by this instance as (x1,y1,x2,y2)
+        in grid units. Mirrors and rotations are exact in grid units. """
+        
         if self.mod.is_library_cell:
             # For lib cells, block the whole thing except on metal3
             # since they shouldn't use metal3
             if layer==tech.layer["metal1"] or layer==tech.layer["metal2"]:
-                return [self.transform_coords(self.mod.get_boundary(), self.offset, mirr, angle)]
+                blockages = [(0, 0, to_grid(self.mod.width), to_grid(self.mod.height))]
             else:
                 return []
         else:
+            blockages = self.mod.get_grid_blockages(layer)
+        return [self.transform_rect(b) for b in blockages]
 
-            blockages = self.mod.get_blockages(layer)
-            new_blockages = []
-            for b in blockages:
-                new_blockages.append(self.transform_coords(b,self.offset, mirr, angle))
-            return new_blockages
+    def transform_rect(self, rect):
+        """ Mirror, rotate and then offset a (x1,y1,x2,y2) grid rectangle of the module """
+        
+        (x1, y1, x2, y2) = rect
+        if self.mirror=="MX":
+            (y1, y2) = (-y1, -y2)
+        elif self.mirror=="MY":
+            (x1, x2) = (-x1, -x2)
+        elif self.mirror=="XY":
+            (x1, y1, x2, y2) = (-x1, -y1, -x2, -y2)
+
+        if self.rotate==90:
+            (x1, y1, x2, y2) = (-y1, x1, -y2, x2)
+        elif self.rotate==180:
+            (x1, y1, x2, y2) = (-x1, -y1, -x2, -y2)
+        elif self.rotate==270:
+            (x1, y1, x2, y2) = (y1, -x1, y2, -x2)
+
+        offset = self.offset
+        (x, y) = (to_grid(offset.x), to_grid(offset.y))
+        return (min(x1,x2)+x, min(y1,y2)+y, max(x1,x2)+x, max(y1,y2)+y)
         
     def gds_write_file(self, new_layout):
         """Recursively writes all the sub-modules in this instance"""
         
-        debug.info(4, "writing instance: " + self.name)
+        debug.info(4, "writing instance: {}", self.name)
         # make sure to write out my module/structure 
         # (it will only be written the first time though)
-        self.mod.gds_write_file(self.gds)
+        self.mod.gds_write_file(self.mod.gds)
         # now write an instance of my module/structure
-        new_layout.addInstance(self.gds,
+        new_layout.addInstance(self.mod.gds,
                               offsetInMicrons=self.offset,
                               mirror=self.mirror,
                               rotate=self.rotate)
@@ -179,15 +215,12 @@ class instance(geometry):
         """ Return an absolute pin that is offset and transformed based on
         this instance location. Index will return one of several pins."""
 
-        import copy
         if index==-1:
-            pin = copy.deepcopy(self.mod.get_pin(name))
-            pin.transform(self.offset,self.mirror,self.rotate)
-            return pin
+            # the master reports missing pins
+            self.mod.get_pin(name)
+            return self.get_pins(name)[0]
         else:
-            pins = copy.deepcopy(self.mod.get_pin(name))
-            pin.transform(self.offset,self.mirror,self.rotate)
-            return pin[index]
+            return self.get_pins(name)[index]
 
     def get_num_pins(self, name):
         """ Return the number of pins of a given name """
@@ -195,16 +228,21 @@ class instance(geometry):
     
     def get_pins(self,name):
         """ Return an absolute pin that is offset and transformed based on
-        this instance location. """
-        
-        import copy
-        pin = copy.deepcopy(self.mod.get_pins(name))
+        this instance location. The pins are transformed once and shared
+        by later calls, so they must not be changed. They are transformed
+        again when the master pins are replaced or moved (a new rect) or
+        when the parent is translated (a new origin). """
         
-        new_pins = []
-        for p in pin:
-            p.transform(self.offset,self.mirror,self.rotate)                
-            new_pins.append(p)
-        return new_pins
+        master_pins = self.mod.get_pins(name)
+        rects = [pin.rect for pin in master_pins]
+        origin = self.frame.origin if self.frame else None
+        cached = self.pin_cache.get(name)
+        if (cached == None or cached[2] is not origin or len(cached[0]) != len(master_pins)
+            or not all(a is b for (a, b) in zip(cached[0] + cached[1], master_pins + rects))):
+            cached = (list(master_pins), rects, origin, [pin.transformed(self.offset,self.mirror,self.rotate)
+                                                         for pin in master_pins])
+            self.pin_cache[name] = cached
+        return list(cached[3])
         
     def __str__(self):
         """ override print function output """
@@ -214,6 +252,159 @@ class instance(geometry):
         """ override print function output """
         return "( inst: " + self.name + " @" + str(self.offset) + " mod=" + self.mod.name + " " + self.mirror + " R=" + str(self.rotate) + ")"
 
+    def get_connections(self, conns):
+        """ Return the (name, nets) of the spice instance """
+        return [(self.name, conns)]
+
+class instance_array(geometry):
+    """ A rows x columns array of one module stored once with its pitch and mirrors.
+        The tile in a row and column has its lower left corner at the offset plus
+        the pitch times the row and column, and is mirrored and rotated as
+        mirrors[row % len(mirrors)][col % len(mirrors[0])] says. The tiles are
+        named and connected by formatting the name and nets with row and col. """
+    def __init__(self, name, mod, offset, rows, columns, pitch, mirrors, frame=None):
+        """Initializes an array of instances to represent a tiled module"""
+        geometry.__init__(self)
+        self.frame = frame
+        debug.check(rows > 0 and columns > 0, "Array {0} needs at least one row and column.", name)
+
+        self.name = name
+        self.mod = mod
+        self.rows = rows
+        self.columns = columns
+        self.mirrors = mirrors
+        self.pitch = (to_grid(pitch[0]), to_grid(pitch[1]))
+        self.offset = grid_vector(offset)
+        self.width = from_grid((columns-1)*self.pitch[0] + to_grid(mod.width))
+        self.height = from_grid((rows-1)*self.pitch[1] + to_grid(mod.height))
+        self.compute_boundary(self.offset,"",0)
+
+        # (mirror, rotate) -> instance at the origin with that orientation and
+        # the offset in grid units that puts its lower left corner on the tile
+        self.prototypes = {}
+        for (mirror, rotate) in itertools.chain(*mirrors):
+            prototype = instance(name, mod, vector(0,0), mirror, rotate)
+            (x, y) = prototype.ll().grid()
+            self.prototypes[mirror, rotate] = (prototype, (-x, -y))
+
+        debug.info(4, "creating instance array: {0} {1}x{2}", self.name, rows, columns)
+
+    def orientation(self, row, col):
+        """ Return the (mirror, rotate) of a tile """
+        mirror_row = self.mirrors[row % len(self.mirrors)]
+        return mirror_row[col % len(mirror_row)]
+
+    def grid_offset(self, row, col):
+        """ Return the offset of a tile in grid units of the current coordinates """
+        (shift_x, shift_y) = self.prototypes[self.orientation(row, col)][1]
+        (x, y) = self.offset.grid()
+        return (x + col*self.pitch[0] + shift_x, y + row*self.pitch[1] + shift_y)
+
+    def tile_offset(self, row, col):
+        """ Return the offset of a tile in the current coordinates """
+        (x, y) = self.grid_offset(row, col)
+        return vector(from_grid(x), from_grid(y))
+
+    def __getitem__(self, index):
+        """ Return the tile in a (row, col) as an instance. It is made on every call. """
+        (row, col) = index
+        debug.check(0 <= row < self.rows and 0 <= col < self.columns,
+                    "Tile {0} is outside of array {1}.", index, self.name)
+        (mirror, rotate) = self.orientation(row, col)
+        return instance(self.name.format(row=row, col=col), self.mod,
+                        self.tile_offset(row, col), mirror, rotate, frame=self.frame)
+
+    def tiles(self):
+        """ Return the (row, col) of the tiles column by column """
+        return ((row, col) for col in range(self.columns) for row in range(self.rows))
+
+    def get_connections(self, conns):
+        """ Return the (name, nets) of the spice instance of every tile
+            with the row and col formatted into the name and nets """
+        # nets like vdd are the same in every tile
+        fixed = ["{" not in net for net in conns]
+        for (row, col) in self.tiles():
+            yield (self.name.format(row=row, col=col),
+                   [net if net_fixed else net.format(row=row, col=col)
+                    for (net, net_fixed) in zip(conns, fixed)])
+
+    def get_blockages(self, layer, top=False):
+        """ Retrieve rectangular blockages of the module in all tiles. """
+
+        return [[vector(from_grid(x1), from_grid(y1)), vector(from_grid(x2), from_grid(y2))]
+                for (x1, y1, x2, y2) in self.get_grid_blockages(layer)]
+
+    def get_grid_blockages(self, layer):
+        """ Return the blockages of the module in all tiles as (x1,y1,x2,y2) in grid
+            units. Tiles that are blocked completely and abut give a single rectangle. """
+
+        # blockages of each orientation relative to the lower left corner of a tile
+        tile_blockages = {}
+        for (key, (prototype, (shift_x, shift_y))) in self.prototypes.items():
+            tile_blockages[key] = [(x1 + shift_x, y1 + shift_y, x2 + shift_x, y2 + shift_y)
+                                   for (x1, y1, x2, y2) in prototype.get_grid_blockages(layer)]
+
+        tile = (0, 0, to_grid(self.mod.width), to_grid(self.mod.height))
+        if self.pitch == tile[2:] and all(rects == [tile] for rects in tile_blockages.values()):
+            (x, y) = self.offset.grid()
+            return [(x, y, x + self.columns*self.pitch[0], y + self.rows*self.pitch[1])]
+
+        (x, y) = self.offset.grid()
+        blockages = []
+        for (row, col) in self.tiles():
+            (dx, dy) = (x + col*self.pitch[0], y + row*self.pitch[1])
+            blockages.extend((x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+                             for (x1, y1, x2, y2) in tile_blockages[self.orientation(row, col)])
+        return blockages
+
+    def gds_write_file(self, new_layout):
+        """ Writes the module once and then each group of tiles with the same
+            orientation as a GDS array when the frame writes arrays and a
+            reference for every tile otherwise """
+
+        debug.info(4, "writing instance array: {}", self.name)
+        self.mod.gds_write_file(self.mod.gds)
+        if self.frame is None or not self.frame.gds_arrays:
+            for (row, col) in self.tiles():
+                (mirror, rotate) = self.orientation(row, col)
+                new_layout.addInstance(self.mod.gds,
+                                       offsetInMicrons=self.tile_offset(row, col),
+                                       mirror=mirror,
+                                       rotate=rotate)
+            return
+
+        row_period = len(self.mirrors)
+        col_period = len(self.mirrors[0])
+        for first_col in range(min(col_period, self.columns)):
+            for first_row in range(min(row_period, self.rows)):
+                (mirror, rotate) = self.orientation(first_row, first_col)
+                offset = self.tile_offset(first_row, first_col)
+                rows = len(range(first_row, self.rows, row_period))
+                columns = len(range(first_col, self.columns, col_period))
+                if rows*columns == 1:
+                    new_layout.addInstance(self.mod.gds, offsetInMicrons=offset,
+                                           mirror=mirror, rotate=rotate)
+                    continue
+                # a pitch is needed for a single column or row even though it is not used
+                pitches = []
+                for (count, period, pitch, size) in [(columns, col_period, self.pitch[0], self.mod.width),
+                                                     (rows, row_period, self.pitch[1], self.mod.height)]:
+                    if count == 1:
+                        pitches.append(max(new_layout.userUnits(size), 1)*new_layout.units[0])
+                    else:
+                        pitches.append(from_grid(period*pitch))
+                new_layout.addArray(self.mod.gds, columns, rows, pitches[0], pitches[1],
+                                    offsetInMicrons=offset, mirror=mirror, rotate=rotate)
+
+    def __str__(self):
+        """ override print function output """
+        return "inst array: " + self.name + " mod=" + self.mod.name
+
+    def __repr__(self):
+        """ override print function output """
+        return "( inst array: " + self.name + " @" + str(self.offset) + " mod=" + self.mod.name + " " + \
+               str(self.rows) + "x" + str(self.columns) + " mirrors=" + str(self.mirrors) + ")"
+
 class path(geometry):
     """Represents a Path"""
 
@@ -223,7 +414,7 @@ class path(geometry):
         self.name = "path"
         self.layerNumber = layerNumber
         self.coordinates = map(lambda x: [x[0], x[1]], coordinates)
-        self.coordinates = vector(self.coordinates).snap_to_grid()
+        self.coordinates = grid_vector(self.coordinates)
         self.path_width = path_width
 
         # FIXME figure out the width/height. This type of path is not
@@ -232,7 +423,7 @@ class path(geometry):
 
     def gds_write_file(self, newLayout):
         """Writes the path to GDS"""
-        debug.info(4, "writing path (" + str(self.layerNumber) +  "): " + self.coordinates)
+        debug.info(4, "writing path ({0}): {1}", self.layerNumber, self.coordinates)
         newLayout.addPath(layerNumber=self.layerNumber,
                           dataType=self.layer_datatype,
                           coordinates=self.coordinates,
@@ -260,7 +451,7 @@ class label(geometry):
         self.name = "label"
         self.text = text
         self.layerNumber = layerNumber
-        self.offset = vector(offset).snap_to_grid()
+        self.offset = grid_vector(offset)
 
         if zoom<0:
             self.zoom = tech.GDS["zoom"]
@@ -269,11 +460,11 @@ class label(geometry):
 
         self.size = 0
 
-        debug.info(4,"creating label " + self.text + " " + str(self.layerNumber) + " " + str(self.offset))
+        debug.info(4, "creating label {0} {1} {2}", self.text, self.layerNumber, self.offset)
 
     def gds_write_file(self, newLayout):
         """Writes the text label to GDS"""
-        debug.info(4, "writing label (" + str(self.layerNumber) + "): " + self.text)
+        debug.info(4, "writing label ({0}): {1}", self.layerNumber, self.text)
         newLayout.addText(text=self.text,
                           layerNumber=self.layerNumber,
                           dataType=tech.layer["label_dataType"],
@@ -296,33 +487,35 @@ class label(geometry):
 class rectangle(geometry):
     """Represents a rectangular shape"""
 
-    def __init__(self, layerNumber, offset, layer_datatype, width, height):
+    def __init__(self, layerNumber, offset, layer_datatype, width, height, frame=None):
         """Initializes a rectangular shape for specified layer"""
         geometry.__init__(self)
+        self.frame = frame
         self.name = "rect"
         self.layerNumber = layerNumber
-        self.offset = vector(offset).snap_to_grid()
-        self.size = vector(width, height).snap_to_grid()
+        self.offset = grid_vector(offset)
+        self.size = grid_vector((width, height))
         self.width = self.size.x
         self.height = self.size.y
         self.layer_datatype = layer_datatype 
         self.compute_boundary(offset,"",0)
 
-        debug.info(4, "creating rectangle (" + str(self.layerNumber) + "): " 
-                   + str(self.width) + "x" + str(self.height) + " @ " + str(self.offset))
+        debug.info(4, "creating rectangle ({0}): {1}x{2} @ {3}",
+                   self.layerNumber, self.width, self.height, self.offset)
 
         
     def get_blockages(self, layer):
         """ Returns a list of one rectangle if it is on this layer"""
         if self.layerNumber == layer:
-            return [[self.offset, vector(self.offset.x+self.width,self.offset.y+self.height)]]
+            offset = self.offset
+            return [[offset, vector(offset.x+self.width,offset.y+self.height)]]
         else:
             return []
 
     def gds_write_file(self, newLayout):
         """Writes the rectangular shape to GDS"""
-        debug.info(4, "writing rectangle (" + str(self.layerNumber) + "):" 
-                   + str(self.width) + "x" + str(self.height) + " @ " + str(self.offset))
+        debug.info(4, "writing rectangle ({0}):{1}x{2} @ {3}",
+                   self.layerNumber, self.width, self.height, self.offset)
         if (self.width!=0 and self.height!=0):
             newLayout.addBox(layerNumber=self.layerNumber,
                              dataType=self.layer_datatype,
@@ -338,3 +531,60 @@ class rectangle(geometry):
     def __repr__(self):
         """ override print function output """
         return "( rect: @" + str(self.offset) + " " + str(self.width) + "x" + str(self.height) + " layer=" + str(self.layerNumber) + " )"
+
+
+class rectangle_array(object):
+    """ The rectangles of one layer of a layout kept as columns of grid units:
+        offset (x, y), size (width, height) and datatype. The offsets are where the
+        rectangles were placed; the layout origin is subtracted when they are read. """
+
+    __slots__ = ("layerNumber", "x", "y", "width", "height", "datatype")
+
+    def __init__(self, layerNumber):
+        self.layerNumber = layerNumber
+        self.x = array.array("i")
+        self.y = array.array("i")
+        self.width = array.array("i")
+        self.height = array.array("i")
+        self.datatype = array.array("h")
+
+    def __len__(self):
+        return len(self.x)
+
+    def append(self, offset, size, datatype):
+        """ Add a rectangle with an offset and size in grid units """
+        self.x.append(offset[0])
+        self.y.append(offset[1])
+        self.width.append(size[0])
+        self.height.append(size[1])
+        self.datatype.append(datatype)
+
+    def rectangle(self, index, frame=None):
+        """ Return one rectangle as a geometry.rectangle of the frame layout """
+        rect = rectangle(self.layerNumber,
+                         vector(from_grid(self.x[index]), from_grid(self.y[index])),
+                         self.datatype[index],
+                         from_grid(self.width[index]),
+                         from_grid(self.height[index]))
+        rect.frame = frame
+        return rect
+
+    def get_grid_blockages(self, origin=None):
+        """ Return all the rectangles as (x1,y1,x2,y2) in grid units with the origin subtracted """
+        (ox, oy) = (0, 0) if origin is None else (to_grid(origin.x), to_grid(origin.y))
+        blockages = []
+        for (x, y, width, height) in itertools.izip(self.x, self.y, self.width, self.height):
+            (x1, y1, x2, y2) = (x - ox, y - oy, x + width - ox, y + height - oy)
+            blockages.append((min(x1,x2), min(y1,y2), max(x1,x2), max(y1,y2)))
+        return blockages
+
+    def gds_write_file(self, newLayout, origin=None):
+        """ Writes all the rectangles with a size to GDS """
+        (ox, oy) = (0, 0) if origin is None else (origin.x, origin.y)
+        newLayout.addBoxes(layerNumber=self.layerNumber,
+                           boxes=[(datatype, (from_grid(x) - ox, from_grid(y) - oy),
+                                   from_grid(width), from_grid(height))
+                                  for (x, y, width, height, datatype)
+                                  in itertools.izip(self.x, self.y, self.width, self.height, self.datatype)
+                                  if width!=0 and height!=0])
+
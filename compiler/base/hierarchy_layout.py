@@ -12,9 +12,11 @@ import debug
 from tech import drc, GDS
 from tech import layer as techlayer
 import os
-from vector import vector
+from vector import vector, grid_vector, from_grid
 from pin_layout import pin_layout
+from utils import grid_rect, merge_rects
 import lef
+import libcell_cache
 
 class layout(lef.lef):
     """
@@ -32,10 +34,16 @@ class layout(lef.lef):
         self.width = None
         self.height = None
         self.insts = []      # Holds module/cell layout instances
-        self.objs = []       # Holds all other objects (labels, geometries, etc)
+        self.inst_map = {}   # Holds name->instance map, the first instance of each name
+        self.rect_map = {}   # Holds layer->rectangle_array map of the rectangles
+        self.origin = None   # Holds the translation of objs and insts, see translate_all
+        self.extent = None   # Holds the [minx, miny, maxx, maxy] of objs and insts before the translation
         self.pin_map = {}    # Holds name->pin_layout map for all pins
         self.visited = False # Flag for traversing the hierarchy 
         self.is_library_cell = False # Flag for library cells 
+        self.gds_arrays = False # Flag for writing the instances that tile a lattice as GDS arrays, see gds_write_arrays
+        self.blockage_map = {}  # Holds (layer, top_level)->merged blockages in grid units
+        self.vlsi_layout = None # Holds the gdsMill layout, made on first use, see gds
         self.gds_read()
 
     ############################################################
@@ -100,54 +108,46 @@ class layout(lef.lef):
         """Finds the lowest set of 2d cartesian coordinates within
         this layout"""
 
-        if len(self.objs)>0:
-            lowestx1 = min(obj.lx() for obj in self.objs if obj.name!="label")
-            lowesty1 = min(obj.by() for obj in self.objs if obj.name!="label")
-        else:
-            lowestx1=lowesty1=None
-        if len(self.insts)>0:
-            lowestx2 = min(inst.lx() for inst in self.insts)
-            lowesty2 = min(inst.by() for inst in self.insts)
-        else:
-            lowestx2=lowesty2=None
-        if lowestx1==None:
-            return vector(lowestx2,lowesty2)
-        elif lowestx2==None:
-            return vector(lowestx1,lowesty1)            
-        else:
-            return vector(min(lowestx1, lowestx2), min(lowesty1, lowesty2))
+        if self.extent==None:
+            return vector(None,None)
+        return self.to_frame(vector(self.extent[0], self.extent[1]))
 
     def find_highest_coords(self):
         """Finds the highest set of 2d cartesian coordinates within this layout"""
 
-        if len(self.objs)>0:
-            highestx1 = max(obj.rx() for obj in self.objs if obj.name!="label")
-            highesty1 = max(obj.uy() for obj in self.objs if obj.name!="label")
-        else:
-            highestx1=highesty1=None        
-        if len(self.insts)>0:            
-            highestx2 = max(inst.rx() for inst in self.insts)
-            highesty2 = max(inst.uy() for inst in self.insts)
-        else:
-            highestx2=highesty2=None
-        if highestx1==None:
-            return vector(highestx2,highesty2)
-        elif highestx2==None:
-            return vector(highestx1,highesty1)            
+        if self.extent==None:
+            return vector(None,None)
+        return self.to_frame(vector(self.extent[2], self.extent[3]))
+
+    def add_extent(self, first, second):
+        """ Grow the extent to cover the corners of a new object or instance. The extent
+            is kept in the coordinates the objects were placed in, before translate_all. """
+        
+        (lx, by, rx, uy) = (min(first.x, second.x), min(first.y, second.y),
+                            max(first.x, second.x), max(first.y, second.y))
+        if self.extent==None:
+            self.extent = [lx, by, rx, uy]
         else:
-            return vector(max(highestx1, highestx2), max(highesty1, highesty2))
+            self.extent = [min(self.extent[0], lx), min(self.extent[1], by),
+                           max(self.extent[2], rx), max(self.extent[3], uy)]
 
+    def to_frame(self, point):
+        """ Return a point placed before translate_all in the current coordinates """
+        
+        if self.origin is None:
+            return point
+        return point - self.origin
 
     def translate_all(self, offset):
-        """ Translates all objects, instances, and pins by the given (x,y) offset """
+        """ Translates all objects, instances, and pins by the given (x,y) offset.
+            Objects and instances subtract the accumulated origin when their
+            offsets are read, so only the pins are moved here. """
         
-        for obj in self.objs:
-            obj.offset = vector(obj.offset - offset)
-        for inst in self.insts:
-            inst.offset = vector(inst.offset - offset)
-            # The instances have a precomputed boundary that we need to update.
-            if inst.__class__.__name__ == "instance":
-                inst.compute_boundary(offset.scale(-1,-1))
+        self.blockage_map.clear()
+        if self.origin is None:
+            self.origin = vector(offset)
+        else:
+            self.origin = self.origin + offset
         for pin_name in self.pin_map.keys():
             # All the pins are absolute coordinates that need to be updated.
             pin_list = self.pin_map[pin_name]
@@ -157,38 +157,66 @@ class layout(lef.lef):
 
     def add_inst(self, name, mod, offset=[0,0], mirror="R0",rotate=0):
         """Adds an instance of a mod to this module"""
-        self.insts.append(geometry.instance(name, mod, offset, mirror, rotate))
-        debug.info(3, "adding instance {}".format(self.insts[-1]))
-        debug.info(4, "instance list: " + ",".join(x.name for x in self.insts))
+        self.blockage_map.clear()
+        self.insts.append(geometry.instance(name, mod, offset, mirror, rotate, frame=self))
+        self.add_extent(*self.insts[-1].placed_boundary)
+        self.inst_map.setdefault(name, self.insts[-1])
+        debug.info(3, "adding instance {}", self.insts[-1])
+        if debug.enabled(4):
+            debug.info(4, "instance list: {}", ",".join(x.name for x in self.insts))
+        return self.insts[-1]
+
+    def add_inst_array(self, name, mod, offset, rows, columns, pitch=None, mirrors=[[("R0", 0)]]):
+        """Adds a rows x columns array of a mod to this module. The name and the
+           nets given to connect_inst are formatted with the row and col of each tile.
+           The pitch defaults to the size of the mod so the tiles abut."""
+        self.blockage_map.clear()
+        if pitch == None:
+            pitch = (mod.width, mod.height)
+        self.insts.append(geometry.instance_array(name, mod, offset, rows, columns, pitch, mirrors, frame=self))
+        self.add_extent(*self.insts[-1].placed_boundary)
+        self.inst_map.setdefault(name, self.insts[-1])
+        debug.info(3, "adding instance array {}", self.insts[-1])
         return self.insts[-1]
 
     def get_inst(self, name):
         """Retrieve an instance by name"""
-        for inst in self.insts:
-            if inst.name == name:
-                return inst
-        return None
+        return self.inst_map.get(name)
     
+    @property
+    def objs(self):
+        """ Return the rectangles as geometry.rectangle objects. They are made on
+            every call from the rectangle arrays in rect_map, which hold them. """
+        
+        return [rects.rectangle(i, self) for layer_num in sorted(self.rect_map)
+                for rects in [self.rect_map[layer_num]] for i in range(len(rects))]
+
     def add_rect(self, layer, offset, layer_dataType = 0, width=0, height=0):
         """Adds a rectangle on a given layer,offset with width and height"""
         
         # negative layers indicate "unused" layers in a given technology
         layer_num = techlayer[layer]
-        if layer_num >= 0:
-            self.objs.append(geometry.rectangle(layer_num, offset, layer_dataType, width, height))
-            return self.objs[-1]
-        return None
+        if layer_num < 0:
+            return None
+        self.blockage_map.clear()
+        # rectangles are stored where they are placed, before the translation
+        offset = vector(offset)
+        if self.origin is not None:
+            offset = offset + self.origin
+        size = grid_vector((width, height))
+        self.add_extent(offset, offset + size)
+
+        if layer_num not in self.rect_map:
+            self.rect_map[layer_num] = geometry.rectangle_array(layer_num)
+        rects = self.rect_map[layer_num]
+        rects.append(offset.grid(), size.grid(), layer_dataType)
+        return rects.rectangle(len(rects)-1, self)
 
     def add_rect_center(self, layer, offset, layer_dataType = 0, width=0, height=0):
         """Adds a rectangle on a given layer at the center point with width and height"""
         
-        # negative layers indicate "unused" layers in a given technology
-        layer_num = techlayer[layer]
         corrected_offset = offset - vector(0.5*width,0.5*height)
-        if layer_num >= 0:
-            self.objs.append(geometry.rectangle(layer_num, corrected_offset, layer_dataType, width, height))
-            return self.objs[-1]
-        return None
+        return self.add_rect(layer, corrected_offset, layer_dataType, width, height)
 
 
     def add_segment_center(self, layer, start, end, layer_dataType = 0):
@@ -294,11 +322,12 @@ class layout(lef.lef):
             label_dataType=techlayer["label_dataType"]
         
         new_pin = pin_layout(text, [offset,offset+vector(width,height)], layer, pin_dataType, label_dataType)
+        self.blockage_map.clear()
 
         try:
             # Check if there's a duplicate!
             # and if so, silently ignore it.
-            # Rounding errors may result in some duplicates.
+            # Pins compare in grid units, so rounding errors do not hide duplicates.
             pin_list = self.pin_map[text]
             for pin in pin_list:
                 if pin == new_pin:
@@ -313,7 +342,7 @@ class layout(lef.lef):
     def add_path(self, layer, coordinates, width=None):
         """Connects a routing path on given layer,coordinates,width."""
         
-        debug.info(4,"add path " + str(layer) + " " + str(coordinates))
+        debug.info(4, "add path {0} {1}", layer, coordinates)
         import path
         # NOTE: (UNTESTED) add_path(...) is currently not used
         # negative layers indicate "unused" layers in a given technology
@@ -338,7 +367,7 @@ class layout(lef.lef):
                   horiz_width=horiz_width)
 
     def add_contact(self, layers, offset, size=[1,1], mirror="R0", rotate=0, 
-                   implant_type=None, well_type=None, add_extra_layer=None):
+                   implant_type=None, well_type=None, add_extra_layer=False):
         """ This is just an alias for a via."""
         return self.add_via(layers=layers,
                             offset=offset,
@@ -350,7 +379,7 @@ class layout(lef.lef):
                             add_extra_layer=add_extra_layer)
 
     def add_contact_center(self, layers, offset, size=[1,1], mirror="R0", rotate=0, 
-                           implant_type=None, well_type=None, add_extra_layer=None):
+                           implant_type=None, well_type=None, add_extra_layer=False):
         """ This is just an alias for a via."""
         return self.add_via_center(layers=layers,
                                    offset=offset,
@@ -362,7 +391,7 @@ class layout(lef.lef):
                                    add_extra_layer=add_extra_layer)      
     
     def add_via(self, layers, offset, size=[1,1], mirror="R0", rotate=0, 
-                implant_type=None, well_type=None, add_extra_layer=None):
+                implant_type=None, well_type=None, add_extra_layer=False):
         """ Add a three layer via structure. """
         import contact
         via = contact.contact(layer_stack=layers,
@@ -381,7 +410,7 @@ class layout(lef.lef):
         return inst
 
     def add_via_center(self, layers, offset, size=[1,1], mirror="R0", rotate=0, 
-                       implant_type=None, well_type=None, add_extra_layer=None):
+                       implant_type=None, well_type=None, add_extra_layer=False):
         """ Add a three layer via structure by the center coordinate accounting 
             for mirroring and rotation. """
         import contact
@@ -429,19 +458,26 @@ class layout(lef.lef):
 
 
     def gds_read(self):
-        """Reads a GDSII file in the library and checks if it exists
-           Otherwise, start a new layout for dynamic generation."""
+        """Checks if a GDSII file of the module is in the library. The library
+           layout or a new layout for dynamic generation is made on first use."""
         
-        # open the gds file if it exists or else create a blank layout
         if os.path.isfile(self.gds_file):
-            debug.info(3, "opening %s" % self.gds_file)
             self.is_library_cell=True
-            self.gds = gdsMill.VlsiLayout(units=GDS["unit"])
-            reader = gdsMill.Gds2reader(self.gds)
-            reader.loadFromFile(self.gds_file)
-        else:
-            debug.info(4, "creating structure %s" % self.name)
-            self.gds = gdsMill.VlsiLayout(name=self.name, units=GDS["unit"])
+
+    @property
+    def gds(self):
+        """ Return the gdsMill layout of the module, reading the library file
+            or creating a blank layout the first time it is needed """
+        
+        if self.vlsi_layout == None:
+            if self.is_library_cell:
+                debug.info(3, "opening {}", self.gds_file)
+                # the parsed library cell is shared through the cell cache
+                self.vlsi_layout = libcell_cache.get_layout(self.gds_file, self.name, GDS["unit"])
+            else:
+                debug.info(4, "creating structure {}", self.name)
+                self.vlsi_layout = gdsMill.VlsiLayout(name=self.name, units=GDS["unit"])
+        return self.vlsi_layout
 
     def print_gds(self, gds_file=None):
         """Print the gds file (not the vlsi class) to the terminal """
@@ -466,15 +502,79 @@ class layout(lef.lef):
         # Visited means that we already prepared self.gds for this subtree
         if self.visited:
             return
-        for i in self.insts:
-            i.gds_write_file(newLayout)
-        for i in self.objs:
+        if self.gds_arrays:
+            insts = self.gds_write_arrays(newLayout)
+        else:
+            insts = self.insts
+        for i in insts:
             i.gds_write_file(newLayout)
+        for layer_num in sorted(self.rect_map):
+            self.rect_map[layer_num].gds_write_file(newLayout, self.origin)
         for pin_name in self.pin_map.keys():
             for pin in self.pin_map[pin_name]:
                 pin.gds_write_file(newLayout)
         self.visited = True
 
+    def gds_write_arrays(self, newLayout):
+        """ Write the instances of a mod with the same orientation that tile a
+            regular lattice as one GDS array. Return the instances left over.
+            Instance arrays are left over since they write their own GDS arrays. """
+
+        groups = {}
+        keys = []
+        for inst in self.insts:
+            if isinstance(inst, geometry.instance_array):
+                continue
+            key = (inst.mod.name, inst.mirror, inst.rotate)
+            if key not in groups:
+                groups[key] = []
+                keys.append(key)
+            groups[key].append(inst)
+
+        arrayed = set()
+        for group in [groups[key] for key in keys]:
+            lattice = self.find_lattice(group, newLayout)
+            if lattice == None:
+                continue
+            (offset, columns, rows, column_pitch, row_pitch) = lattice
+            mod = group[0].mod
+            debug.info(4, "writing array of {0}x{1} {2}", columns, rows, mod.name)
+            mod.gds_write_file(mod.gds)
+            newLayout.addArray(mod.gds, columns, rows, column_pitch, row_pitch,
+                               offsetInMicrons=offset,
+                               mirror=group[0].mirror,
+                               rotate=group[0].rotate)
+            arrayed.update(id(inst) for inst in group)
+        return [inst for inst in self.insts if id(inst) not in arrayed]
+
+    def find_lattice(self, group, newLayout):
+        """ Return the offset, columns, rows and pitches of the lattice the instances
+            fill completely or None. The check is done in GDS units so every array
+            element lands exactly where its own reference would. """
+
+        if len(group) < 2:
+            return None
+        points = set((newLayout.userUnits(inst.offset.x), newLayout.userUnits(inst.offset.y)) for inst in group)
+        xs = sorted(set(point[0] for point in points))
+        ys = sorted(set(point[1] for point in points))
+        if len(points) != len(group) or len(xs)*len(ys) != len(group):
+            return None
+
+        pitches = []
+        for (coords, size) in [(xs, group[0].mod.width), (ys, group[0].mod.height)]:
+            if len(coords) == 1:
+                # any pitch will do for a single column or row
+                pitch = max(newLayout.userUnits(size), 1)
+            else:
+                pitch = coords[1] - coords[0]
+                for i in range(1, len(coords)):
+                    if coords[i] - coords[i-1] != pitch:
+                        return None
+            pitches.append(pitch*newLayout.units[0])
+
+        offset = (xs[0]*newLayout.units[0], ys[0]*newLayout.units[0])
+        return (offset, len(xs), len(ys), pitches[0], pitches[1])
+
     def gds_write(self, gds_name):
         """Write the entire gds of the object to the file."""
         
@@ -483,6 +583,8 @@ class layout(lef.lef):
         writer = gdsMill.Gds2writer(self.gds)
         # recursively create all the remaining objects
         self.gds_write_file(self.gds)
+        # cells with a subcircuit keep their names for LVS, even if another cell is equal
+        self.gds.keepNames = self.sp_subckt_names()
         # populates the xyTree data structure for gds
         # self.gds.prepareForWrite()
         writer.writeToFile(gds_name)
@@ -502,15 +604,25 @@ class layout(lef.lef):
         else:
             layer_num = layer
             
-        blockages = []
-        for i in self.objs:
-            blockages += i.get_blockages(layer_num)
-        for i in self.insts:
-            blockages += i.get_blockages(layer_num)
-        # Must add pin blockages to non-top cells
-        if not top_level:
-            blockages += self.get_pin_blockages(layer_num)
-        return blockages
+        return [[vector(from_grid(x1), from_grid(y1)), vector(from_grid(x2), from_grid(y2))]
+                for (x1, y1, x2, y2) in self.get_grid_blockages(layer_num, top_level)]
+
+    def get_grid_blockages(self, layer_num, top_level=False):
+        """ Return the merged obstacles of the module and its children as (x1,y1,x2,y2)
+            in grid units. They are kept for every instance of the module to reuse. """
+        
+        key = (layer_num, top_level)
+        if key not in self.blockage_map:
+            blockages = []
+            if layer_num in self.rect_map:
+                blockages += self.rect_map[layer_num].get_grid_blockages(self.origin)
+            for i in self.insts:
+                blockages += i.get_grid_blockages(layer_num)
+            # Must add pin blockages to non-top cells
+            if not top_level:
+                blockages += [grid_rect(b) for b in self.get_pin_blockages(layer_num)]
+            self.blockage_map[key] = merge_rects(blockages)
+        return self.blockage_map[key]
 
     def get_pin_blockages(self, layer_num):
         """ Return the pin shapes as blockages for non-top-level blocks. """
@@ -6,10 +6,18 @@
 
 
 import debug
-import re
 import os
 import math
+import gzip
 import verilog
+import libcell_cache
+
+# instance lines are formatted in batches of this many lines before a write
+sp_batch_lines = 4096
+# bytes of the write buffer of the spice file
+sp_buffer_size = 1 << 20
+# gzip level of compressed spice files, faster than the default of 9 for little size
+sp_compress_level = 6
 
 class spice(verilog.verilog):
     """
@@ -30,6 +38,7 @@ class spice(verilog.verilog):
         # for each instance, this is the set of nets/nodes that map to the pins for this instance
         # THIS MUST MATCH THE ORDER OF THE PINS (restriction imposed by the Spice format)
         self.conns = []
+        self.spice_lines = None # Holds the spice lines, made on first use, see spice
         self.sp_read()
 
 ############################################################
@@ -96,96 +105,127 @@ class spice(verilog.verilog):
 
 
     def sp_read(self):
-        """Reads the sp file (and parse the pins) from the library 
-           Otherwise, initialize it to null for dynamic generation"""
+        """Reads the sp file (and parse the pins) from the library if it exists.
+           Otherwise, the lines are initialized to null for dynamic generation on first use."""
         
         if os.path.isfile(self.sp_file):
             debug.info(3, "opening {0}".format(self.sp_file))
-            f = open(self.sp_file)
-            self.spice = f.readlines()
-            for i in range(len(self.spice)):
-                self.spice[i] = self.spice[i].rstrip(" \n")
-
-            # find the correct subckt line in the file
-            subckt = re.compile("^.subckt {}".format(self.name), re.IGNORECASE)
-            subckt_line = filter(subckt.search, self.spice)[0]
-            # parses line into ports and remove subckt
-            self.pins = subckt_line.split(" ")[2:]
-        else:
-            self.spice = []
+            # the lines and subckt pins are parsed once and shared through the cell cache,
+            # the lines are a tuple so every module of the cell can hold them without a copy
+            (self.spice_lines, pins) = libcell_cache.get_sp(self.sp_file, self.name)
+            self.pins = list(pins)
+
+    @property
+    def spice(self):
+        """ Return the spice lines of the module, the shared lines of the library file
+            or a list for dynamic generation made the first time it is needed """
+        
+        if self.spice_lines == None:
+            self.spice_lines = []
+        return self.spice_lines
 
     def contains(self, mod, modlist):
-        for x in modlist:
-            if x.name == mod.name:
-                return True
-        return False
+        """ Check if a module is in the set of module names """
+        
+        return mod.name in modlist
+
+    def sp_modules(self):
+        """ Return the modules of the hierarchy in the order they are written,
+            each one after the modules it instantiates and the first time it is reached.
+            Library cells are written from their own lines, so their modules are not visited. """
+        
+        modules = []
+        visited = set([self.name])
+        # depth first walk with a stack of (module, iterator over its modules)
+        stack = [(self, iter([] if self.spice else self.mods))]
+        while stack:
+            (mod, children) = stack[-1]
+            for child in children:
+                if not self.contains(child, visited):
+                    visited.add(child.name)
+                    stack.append((child, iter([] if child.spice else child.mods)))
+                    break
+            else:
+                stack.pop()
+                modules.append(mod)
+        return modules
 
     def sp_write_file(self, sp, usedMODS):
-        """ Recursive spice subcircuit write;
-            Writes the spice subcircuit from the library or the dynamically generated one"""
+        """ Spice subcircuit write of the whole hierarchy in dependency order;
+            Writes the spice subcircuits from the library or the dynamically generated ones.
+            usedMODS is the set of names of the modules already written. """
         
-        if not self.spice:
-            # recursively write the modules
-            for i in self.mods:
-                if self.contains(i, usedMODS):
-                    continue
-                usedMODS.append(i)
-                i.sp_write_file(sp, usedMODS)
-
-            if len(self.insts) == 0:
-                return
-            if self.pins == []:
-                return
-
-            
-            # write out the first spice line (the subcircuit)
-            sp.write("\n.SUBCKT {0} {1}\n".format(self.name,
-                                                  " ".join(self.pins)))
-
-            # every instance must have a set of connections, even if it is empty.
-            if  len(self.insts)!=len(self.conns):
-                debug.error("{0} : Not all instance pins ({1}) are connected ({2}).".format(self.name,
-                                                                                            len(self.insts),
-                                                                                            len(self.conns)))
-                debug.error("Instances: \n"+str(self.insts))
-                debug.error("-----")
-                debug.error("Connections: \n"+str(self.conns),1)
-
-
-
-            for i in range(len(self.insts)):
-                # we don't need to output connections of empty instances.
-                # these are wires and paths
-                if self.conns[i] == []:
-                    continue
-                if hasattr(self.insts[i].mod,"spice_device"):
-                    sp.write(self.insts[i].mod.spice_device.format(self.insts[i].name,
-                                                                   " ".join(self.conns[i])))
-                    sp.write("\n")
-
-                else:
-                    sp.write("X{0} {1} {2}\n".format(self.insts[i].name,
-                                                     " ".join(self.conns[i]),
-                                                     self.insts[i].mod.name))
-
-            sp.write(".ENDS {0}\n".format(self.name))
+        for mod in self.sp_modules():
+            if self.contains(mod, usedMODS):
+                continue
+            usedMODS.add(mod.name)
+            mod.sp_write_module(sp)
 
-        else:
+    def sp_subckt_names(self):
+        """ Return the names of the modules of the hierarchy that are written as subcircuits """
+
+        return set(mod.name for mod in self.sp_modules()
+                   if not hasattr(mod, "spice_device") and (mod.spice or (mod.insts and mod.pins)))
+
+    def sp_write_module(self, sp):
+        """ Writes the spice subcircuit of this module only, the instance lines in batches """
+        
+        if self.spice:
             # write the subcircuit itself
             # Including the file path makes the unit test fail for other users.
             #if os.path.isfile(self.sp_file):
             #    sp.write("\n* {0}\n".format(self.sp_file))
             sp.write("\n".join(self.spice))
-            
             sp.write("\n")
+            return
+
+        if len(self.insts) == 0:
+            return
+        if self.pins == []:
+            return
+
+        # every instance must have a set of connections, even if it is empty.
+        if  len(self.insts)!=len(self.conns):
+            debug.error("{0} : Not all instance pins ({1}) are connected ({2}).".format(self.name,
+                                                                                        len(self.insts),
+                                                                                        len(self.conns)))
+            debug.error("Instances: \n"+str(self.insts))
+            debug.error("-----")
+            debug.error("Connections: \n"+str(self.conns),1)
+
+        # write out the first spice line (the subcircuit)
+        lines = ["\n.SUBCKT {0} {1}\n".format(self.name, " ".join(self.pins))]
+        for (inst, conns) in zip(self.insts, self.conns):
+            # we don't need to output connections of empty instances.
+            # these are wires and paths
+            if conns == []:
+                continue
+            if hasattr(inst.mod,"spice_device"):
+                line = inst.mod.spice_device + "\n"
+            else:
+                line = "X{0} {1} {2}\n"
+            # an instance array gives the name and nets of each of its tiles
+            for (name, nets) in inst.get_connections(conns):
+                lines.append(line.format(name, " ".join(nets), inst.mod.name))
+                if len(lines) >= sp_batch_lines:
+                    sp.write("".join(lines))
+                    del lines[:]
+        lines.append(".ENDS {0}\n".format(self.name))
+        sp.write("".join(lines))
+
+    def sp_open(self, spname):
+        """ Open a spice file for writing through a large buffer,
+            compressed with gzip if the name ends with .gz """
+        
+        if spname.endswith(".gz"):
+            return gzip.open(spname, 'wb', sp_compress_level)
+        return open(spname, 'w', sp_buffer_size)
 
     def sp_write(self, spname):
         """Writes the spice to files"""
         debug.info(3, "Writing to {0}".format(spname))
-        spfile = open(spname, 'w')
+        spfile = self.sp_open(spname)
         spfile.write("*FIRST LINE IS A COMMENT\n")
-        usedMODS = list()
-        self.sp_write_file(spfile, usedMODS)
-        del usedMODS
+        self.sp_write_file(spfile, set())
         spfile.close()
 
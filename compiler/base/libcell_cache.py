@@ -0,0 +1,256 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+import os
+import re
+import hashlib
+import cPickle
+import debug
+import gdsMill
+from globals import OPTS
+
+# The cells of the GDS files and the SPICE files of the technology library are
+# read once per process. If OPTS.libcell_cache_path is set, the GDS file indices,
+# parsed structures, cell sizes, pin shapes and subckt pins are also kept there,
+# keyed by the content hash of the file, so later runs skip parsing.
+
+# (path, cell name) -> entry of the cells and files parsed in this process,
+# SPICE files are whole files and have no cell name
+cache = {}
+
+# path -> (size and mtime, SHA-1) of the files hashed in this process
+digests = {}
+
+# bump this when the format of what is cached changes
+cache_version = 6
+
+class entry:
+    """ The parsed contents of one library file, or of one cell of a GDS file,
+        and everything measured from it """
+
+    def __init__(self, path, name, stamp, digest, kind):
+        self.path = path
+        self.name = name
+        self.stamp = stamp
+        self.digest = digest
+        self.kind = kind
+        self.data = {}
+        self.derived = {}
+        self.layout = None
+        # set when something was measured since the entry was last saved
+        self.dirty = False
+
+    def __getstate__(self):
+        # the initialized layout is rebuilt on demand in each process
+        state = self.__dict__.copy()
+        state["layout"] = None
+        state["dirty"] = False
+        return state
+
+    def cache_file(self):
+        if not OPTS.libcell_cache_path:
+            return None
+        if self.name == None:
+            file_name = "{0}_v{1}_{2}.pkl".format(self.kind, cache_version, self.digest)
+        else:
+            file_name = "{0}_v{1}_{2}_{3}.pkl".format(self.kind, cache_version, self.digest, self.name)
+        return os.path.join(OPTS.libcell_cache_path, file_name)
+
+    def save(self):
+        """ Write the entry to the on-disk cache if there is one """
+        cache_file = self.cache_file()
+        if cache_file == None:
+            return
+        try:
+            if not os.path.isdir(OPTS.libcell_cache_path):
+                os.makedirs(OPTS.libcell_cache_path, 0o750)
+            # write to a private name first so readers never see a partial file
+            temp_file = "{0}.{1}".format(cache_file, os.getpid())
+            f = open(temp_file, "wb")
+            cPickle.dump(self, f, 2)
+            f.close()
+            os.rename(temp_file, cache_file)
+            self.dirty = False
+        except (IOError, OSError) as e:
+            debug.warning("Unable to write library cache {0}: {1}".format(cache_file, e))
+
+    def get(self, key, compute):
+        """ Return a value measured from this file, computing it only once.
+            New values are written to disk by save_all. """
+        if key not in self.derived:
+            self.derived[key] = compute()
+            self.dirty = True
+        return self.derived[key]
+
+
+def lookup(path, name, kind, parse):
+    """ Return the cache entry of a file or of one of its cells, parsing it only if
+        nothing cached matches its path and mtime or, failing that, its content hash. """
+
+    key = (path, name)
+    file_stat = os.stat(path)
+    stamp = (file_stat.st_size, file_stat.st_mtime)
+    if key in cache and cache[key].stamp == stamp:
+        return cache[key]
+
+    digest = file_digest(path, stamp)
+    cached = None
+    if key in cache and cache[key].digest == digest:
+        cached = cache[key]
+    else:
+        cached = load(entry(path, name, stamp, digest, kind).cache_file())
+    if cached == None or cached.digest != digest:
+        debug.info(3, "parsing library file {0} {1}".format(path, name or ""))
+        cached = entry(path, name, stamp, digest, kind)
+        cached.data = parse(path, name)
+        cached.save()
+    cached.path = path
+    cached.stamp = stamp
+    cache[key] = cached
+    return cached
+
+def file_digest(path, stamp):
+    """ Return the content hash of a file, read once for all the cells in it """
+    if path in digests and digests[path][0] == stamp:
+        return digests[path][1]
+    f = open(path, "rb")
+    digest = hashlib.sha1(f.read()).hexdigest()
+    f.close()
+    digests[path] = (stamp, digest)
+    return digest
+
+def save_all():
+    """ Write the entries with new measurements to the on-disk cache """
+    for cached in cache.values():
+        if cached.dirty:
+            cached.save()
+
+def load(cache_file):
+    """ Read an entry back from the on-disk cache """
+    if cache_file == None or not os.path.isfile(cache_file):
+        return None
+    try:
+        f = open(cache_file, "rb")
+        cached = cPickle.load(f)
+        f.close()
+    except Exception:
+        # a stale or damaged cache file is simply rebuilt
+        return None
+    return cached
+
+
+def parse_gds(path, name):
+    # only the hierarchy of the cell is parsed, through the indexed library
+    # of the file that is shared with everything else reading it
+    layout = gdsMill.VlsiLayout()
+    gdsMill.openLibrary(path, index_file(path)).loadInto(layout, name)
+    return {"structures" : layout.structures,
+            "info" : layout.info,
+            "layers" : layout.layerNumbersInUse}
+
+def index_file(path):
+    """ Return where the index of a GDS file is kept, next to the on-disk cache if there is one """
+    if not OPTS.libcell_cache_path:
+        return None
+    if not os.path.isdir(OPTS.libcell_cache_path):
+        os.makedirs(OPTS.libcell_cache_path, 0o750)
+    # lookup hashed the file before parsing it
+    return os.path.join(OPTS.libcell_cache_path, "gds_index_{0}.idx".format(digests[path][1]))
+
+def get_gds(path, name):
+    """ Return the cache entry of a cell of a GDS file """
+    return lookup(path, name, "gds", parse_gds)
+
+def copy_structure(structure):
+    """ Copy a structure so elements can be added to it without touching the cache """
+    new_structure = gdsMill.GdsStructure()
+    new_structure.name = structure.name
+    new_structure.createDate = structure.createDate
+    new_structure.modDate = structure.modDate
+    new_structure.boundaries = list(structure.boundaries)
+    new_structure.paths = list(structure.paths)
+    new_structure.srefs = list(structure.srefs)
+    new_structure.arefs = list(structure.arefs)
+    new_structure.texts = list(structure.texts)
+    new_structure.nodes = list(structure.nodes)
+    new_structure.boxes = list(structure.boxes)
+    return new_structure
+
+def get_master(path, name, units):
+    """ Return the VlsiLayout of a cell of a GDS library file kept in the cache.
+        It is only measured and searched for pins, never modified. """
+
+    cached = get_gds(path, name)
+    if cached.layout == None or cached.layout.units != units:
+        cached.layout = gdsMill.VlsiLayout(units=units)
+        cached.layout.structures = cached.data["structures"]
+        cached.layout.info = cached.data["info"]
+        cached.layout.layerNumbersInUse = cached.data["layers"]
+        cached.layout.rootStructureName = name
+    return cached.layout
+
+def get_layout(path, name, units):
+    """ Return a new VlsiLayout holding a cell of a GDS library file and the
+        structures below it. The elements are shared with the cache and must
+        not be modified, the structure lists belong to the new layout. """
+
+    master = get_master(path, name, units)
+    layout = gdsMill.VlsiLayout(units=units)
+    for name in master.structures:
+        layout.structures[name] = copy_structure(master.structures[name])
+    layout.info = dict(master.info)
+    layout.layerNumbersInUse = list(master.layerNumbersInUse)
+    layout.rootStructureName = master.rootStructureName
+    # the xyTree is populated by the first pin query, of the master or of the copy
+    if master.xyTreeRoot == master.rootStructureName:
+        layout.xyTree = list(master.xyTree)
+        layout.xyTreeRoot = master.xyTreeRoot
+    return layout
+
+def get_size(path, name, units, layer):
+    """ Return the cell size from either the border layer or the bounding box """
+    cached = get_gds(path, name)
+    def measure():
+        layout = get_master(path, name, units)
+        measure_result = layout.getLayoutBorder(layer)
+        if measure_result == None:
+            measure_result = layout.measureSize(name)
+        return [float(x) for x in measure_result]
+    return list(cached.get(("size", name, units, layer), measure))
+
+def get_pin_shapes(path, name, pin, units):
+    """ Return the (name, layer, boundary) shapes of a pin label of a cell """
+    cached = get_gds(path, name)
+    def measure():
+        layout = get_master(path, name, units)
+        shapes = []
+        for (shape_name, layer, boundary) in layout.getPinShapeByLabel(str(pin)):
+            shapes.append([shape_name, layer, [float(x) for x in boundary]])
+        return shapes
+    return cached.get(("pins", str(pin), units), measure)
+
+
+def parse_sp(path, name):
+    f = open(path, "rb")
+    lines = f.read().split("\n")
+    f.close()
+    if lines[-1] == "":
+        lines.pop()
+    return {"lines" : tuple(line.rstrip(" \n") for line in lines)}
+
+def get_sp(path, name):
+    """ Return the lines of a SPICE library file and the pins of its subckt.
+        Both are shared with the cache, the lines are a tuple so they cannot be changed
+        and the pins must be copied by modules that add to them. """
+    cached = lookup(path, None, "sp", parse_sp)
+    def find_pins():
+        # find the correct subckt line in the file
+        subckt = re.compile("^.subckt {}".format(name), re.IGNORECASE)
+        subckt_line = filter(subckt.search, cached.data["lines"])[0]
+        # parses line into ports and remove subckt
+        return subckt_line.split(" ")[2:]
+    return (cached.data["lines"], cached.get(("pins", name), find_pins))
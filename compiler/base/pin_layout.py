@@ -7,21 +7,19 @@
 
 import debug
 from tech import GDS
-from vector import vector
+from vector import vector, grid_vector
 from tech import layer
 
-class pin_layout:
+class pin_layout(object):
     """ A class to represent a rectangular design pin. It is limited to a single shape. """
 
+    # no per-pin __dict__, every instance pin lookup makes new pins
+    __slots__ = ("name", "rect", "layer", "pin_dataType", "label_dataType")
+
     def __init__(self, name, rect, layer_name_num, pin_dataType, label_dataType):
         self.name = name
-        # repack the rect as a vector, just in case
-        if type(rect[0])==vector:
-            self.rect = rect
-        else:
-            self.rect = [vector(rect[0]),vector(rect[1])]
-        # snap the rect to the grid
-        self.rect = [x.snap_to_grid() for x in self.rect]
+        # snap the rect to the grid, this also repacks it as vectors
+        self.rect = [grid_vector(rect[0]), grid_vector(rect[1])]
         # if it's a layer number look up the layer name. this assumes a unique layer number.
         if type(layer_name_num)==int:
             self.layer = layer.keys()[layer.values().index(layer_name_num)]
@@ -40,12 +38,24 @@ class pin_layout:
         return "({} layer={} ll={} ur={})".format(self.name,self.layer,self.rect[0],self.rect[1])
 
     def __eq__(self, other):
-        """ Check if these are the same pins for duplicate checks """
+        """ Check if these are the same pins for duplicate checks.
+            The rects are compared in grid units so float errors do not matter. """
         if isinstance(other, self.__class__):
-            return (self.name==other.name and self.layer==other.layer and self.rect == other.rect)
+            return (self.name==other.name and self.layer==other.layer and self.grid_rect() == other.grid_rect())
         else:
             return False    
 
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        """ Equal pins have equal hashes so they can be used as keys """
+        return hash((self.name, self.layer, self.grid_rect()))
+
+    def grid_rect(self):
+        """ Return the ll and ur in integer grid units """
+        return (self.rect[0].grid(), self.rect[1].grid())
+
     def overlaps(self, other):
         """ Check if a shape overlaps with a rectangle  """
         
@@ -117,6 +127,18 @@ class pin_layout:
         self.rect=[offset+ll,offset+ur]
         self.normalize()
 
+    def transformed(self,offset,mirror,rotate):
+        """ Return a transformed copy of the pin, leaving this pin as it is """
+        
+        pin = pin_layout.__new__(pin_layout)
+        pin.name = self.name
+        pin.rect = self.rect
+        pin.layer = self.layer
+        pin.pin_dataType = self.pin_dataType
+        pin.label_dataType = self.label_dataType
+        pin.transform(offset,mirror,rotate)
+        return pin
+
     def center(self):
         return vector(0.5*(self.rect[0].x+self.rect[1].x),0.5*(self.rect[0].y+self.rect[1].y))
 
@@ -21,6 +21,7 @@ class ptx(design.design):
         Pins are accessed as D, G, S, B.  Width is the transistor width. Mults is the number of 
         transistors of the given width. Total width is therefore mults*width.  Options allow you 
         to connect the fingered gates and active for parallel devices. """
+    memoize = True
 
     def __init__(self, width=drc["minwidth_tx"], mults=1, tx_type="nmos", connect_active=False, 
                        connect_poly=False, num_contacts=None, min_area=True, dummy_poly=True):
@@ -36,6 +37,8 @@ class ptx(design.design):
             name += "_p"
         if num_contacts:
             name += "_c{}".format(num_contacts)
+        if not dummy_poly:
+            name += "_nd"
         
         # replace periods with underscore for newer spice compatibility
         name=re.sub('\.','_',name)
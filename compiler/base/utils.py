@@ -6,12 +6,13 @@
 
 
 import os
-import gdsMill
+import bisect
 import tech
 import math
 import globals
-from vector import vector
+from vector import vector, to_grid, from_grid
 from pin_layout import pin_layout
+import libcell_cache
 
 OPTS = globals.OPTS
 
@@ -22,11 +23,7 @@ def ceil(decimal):
 
 def round_to_grid(number):
     """ Rounds an arbitrary number to the grid. """
-    grid = tech.drc["grid"]  
-    # this gets the nearest integer value
-    number_grid = int(round(round((number / grid), 2), 0))
-    number_off = number_grid * grid
-    return number_off
+    return from_grid(to_grid(number))
 
 
 def snap_to_grid(offset):
@@ -49,18 +46,12 @@ def auto_measure_libcell(pin_list, name, units, layer):
         Return these as a set of properties including the cell width/height too. """
     
     cell_gds = OPTS.AMC_tech + "gds_lib/" + str(name) + ".gds"
-    cell_vlsi = gdsMill.VlsiLayout(units=units)
-    reader = gdsMill.Gds2reader(cell_vlsi)
-    reader.loadFromFile(cell_gds)
 
     cell = {}
-    measure_result = cell_vlsi.getLayoutBorder(layer)
-    if measure_result == None:
-        measure_result = cell_vlsi.measureSize(name)
-    [cell["width"], cell["height"]] = measure_result
+    [cell["width"], cell["height"]] = libcell_cache.get_size(cell_gds, name, units, layer)
 
     for pin in pin_list:
-        (name, layer, boundary)=cell_vlsi.getPinShapeByLabel(str(pin))        
+        (shape_name, shape_layer, boundary)=libcell_cache.get_pin_shapes(cell_gds, name, pin, units)[0]
         cell[str(pin)] = pin_center(boundary)
     return cell
 
@@ -69,15 +60,7 @@ def get_libcell_size(name, units, layer):
         bounding box or a border layer. """
     
     cell_gds = OPTS.AMC_tech + "gds_lib/" + str(name) + ".gds"
-    cell_vlsi = gdsMill.VlsiLayout(units=units)
-    reader = gdsMill.Gds2reader(cell_vlsi)
-    reader.loadFromFile(cell_gds)
-
-    cell = {}
-    measure_result = cell_vlsi.getLayoutBorder(layer)
-    if measure_result == None:
-        measure_result = cell_vlsi.measureSize(name)
-    return measure_result
+    return libcell_cache.get_size(cell_gds, name, units, layer)
 
 
 def get_libcell_pins(pin_list, name, units):
@@ -85,21 +68,63 @@ def get_libcell_pins(pin_list, name, units):
         Return these as a rectangle layer pair for each pin. """
     
     cell_gds = OPTS.AMC_tech + "gds_lib/" + str(name) + ".gds"
-    cell_vlsi = gdsMill.VlsiLayout(units=units)
-    reader = gdsMill.Gds2reader(cell_vlsi)
-    reader.loadFromFile(cell_gds)
 
     cell = {}
     for pin in pin_list:
         cell[str(pin)]=[]
-        label_list=cell_vlsi.getPinShapeByLabel(str(pin))
+        label_list=libcell_cache.get_pin_shapes(cell_gds, name, pin, units)
         for label in label_list:
-            (name, layer, boundary)=label
+            (shape_name, shape_layer, boundary)=label
             rect = pin_rect(boundary)
             # this is a list because other cells/designs may have must-connect pins
-            cell[str(pin)].append(pin_layout(pin, rect, layer, tech.layer["pin_dataType"], tech.layer["label_dataType"]))
+            cell[str(pin)].append(pin_layout(pin, rect, shape_layer, tech.layer["pin_dataType"], tech.layer["label_dataType"]))
     return cell
 
 
+def grid_rect(rect):
+    """ Return the lower-left and upper-right of a rectangle as (x1,y1,x2,y2) in grid units """
+    (x1, y1, x2, y2) = (to_grid(rect[0][0]), to_grid(rect[0][1]), to_grid(rect[1][0]), to_grid(rect[1][1]))
+    return (min(x1,x2), min(y1,y2), max(x1,x2), max(y1,y2))
 
-
+def merge_rects(rects):
+    """ Return the union of (x1,y1,x2,y2) grid rectangles as a sorted list of disjoint
+        rectangles. A scanline over y merges the overlapping or abutting x intervals of each
+        band between two y edges and bands with the same interval are joined vertically. """
+    
+    rects = sorted((rect for rect in rects if rect[0]<rect[2] and rect[1]<rect[3]), key=lambda rect: rect[1])
+    if not rects:
+        return []
+    tops = set(rect[3] for rect in rects)
+    edges = sorted(tops.union(rect[1] for rect in rects))
+
+    merged = []
+    # the rectangles crossing the band, sorted by x
+    active = []
+    # x interval -> bottom of the rectangle it is growing
+    growing = {}
+    next_rect = 0
+    for (bottom, top) in zip(edges[:-1], edges[1:]):
+        if bottom in tops:
+            active = [rect for rect in active if rect[3] > bottom]
+        while next_rect < len(rects) and rects[next_rect][1] == bottom:
+            bisect.insort(active, rects[next_rect])
+            next_rect += 1
+
+        band = {}
+        (x1, x2) = (None, None)
+        for rect in active:
+            if x1 is not None and rect[0] <= x2:
+                x2 = max(x2, rect[2])
+                continue
+            if x1 is not None:
+                band[(x1, x2)] = growing.pop((x1, x2), bottom)
+            (x1, x2) = (rect[0], rect[2])
+        if x1 is not None:
+            band[(x1, x2)] = growing.pop((x1, x2), bottom)
+        for ((x1, x2), y1) in growing.items():
+            merged.append((x1, y1, x2, bottom))
+        growing = band
+
+    for ((x1, x2), y1) in growing.items():
+        merged.append((x1, y1, x2, edges[-1]))
+    return sorted(merged)
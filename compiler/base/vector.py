@@ -9,21 +9,32 @@ import debug
 import math
 import tech
 
-class vector():
+class vector(object):
     """ This is the vector class to represent the coordinate vector. It makes the coordinate 
         operations easy and short so the code is concise. It needs to override several operators to  
         support concise vector operations, output, and other more complex data structures like lists.
+        Vectors are never changed once made, every operation returns a new vector.
     """
+    # no per-vector __dict__, a layout makes millions of vectors
+    __slots__ = ("x", "y")
+
     def __init__(self, x, y=None):
         """ init function support two init method"""
         # will take single input as a coordinate
-        if y==None:
-            self.x = x[0]
-            self.y = x[1]
+        if y is None:
+            set_x(self, x[0])
+            set_y(self, x[1])
         #will take two inputs as the values of a coordinate
         else:
-            self.x = x
-            self.y = y
+            set_x(self, x)
+            set_y(self, y)
+
+    def __setattr__(self, name, value):
+        """ Vectors are shared and used as keys, so they can not be changed """
+        raise AttributeError("vector is immutable, make a new vector instead")
+
+    def __delattr__(self, name):
+        raise AttributeError("vector is immutable, make a new vector instead")
 
     def __str__(self):
         """ override print function output """
@@ -33,17 +44,6 @@ class vector():
         """ override print function output """
         return "["+str(self.x)+","+str(self.y)+"]"
 
-    def __setitem__(self, index, value):
-        """ override setitem function can set value by vector[index]=value """
-        
-        if index==0:
-            self.x=value
-        elif index==1:
-            self.y=value
-        else:
-            self.x=value[0]
-            self.y=value[1] 
-
     def __getitem__(self, index):
         """ override getitem function can get value by value=vector[index] """
         
@@ -54,8 +54,21 @@ class vector():
         else:
             return self                
 
+    def __copy__(self):
+        """ Vectors do not change, so a copy is the vector itself """
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        """ Pickle the coordinate, unpickling can not set the slots one by one """
+        return (vector, (self.x, self.y))
+
     def __add__(self, other):
         """ Override + function (left add) Can add by vector(x1,y1)+vector(x2,y2) """
+        if other.__class__ is vector:
+            return vector(self.x + other.x, self.y + other.y)
         return vector(self.x + other[0], self.y + other[1])
 
 
@@ -69,6 +82,8 @@ class vector():
 
     def __sub__(self, other):
         """ Override - function (left) """
+        if other.__class__ is vector:
+            return vector(self.x - other.x, self.y - other.y)
         return vector(self.x - other[0], self.y - other[1])
 
     def __rsub__(self, other):
@@ -76,17 +91,16 @@ class vector():
         return vector(other[0]- self.x, other[1] - self.y)
 
     def snap_to_grid(self):
-        self.x = self.snap_offset_to_grid(self.x)
-        self.y = self.snap_offset_to_grid(self.y)
-        return self
+        """ Return a copy of the vector on the nearest grid point """
+        return grid_vector(self)
 
     def snap_offset_to_grid(self, offset):
         """ Changes the coodrinate to match the grid settings """
-        grid = tech.drc["grid"]  
-        # this gets the nearest integer value
-        off_in_grid = int(round(round((offset / grid), 2), 0))
-        offset = off_in_grid * grid
-        return offset
+        return from_grid(to_grid(offset))
+
+    def grid(self):
+        """ Return the coordinate in integer grid units """
+        return (to_grid(self.x), to_grid(self.y))
 
     def rotate(self):
         """ pass a copy of rotated vector, without altering the vector! """
@@ -121,9 +135,13 @@ class vector():
     def __eq__(self, other):
         """Override the default Equals behavior"""
         if isinstance(other, self.__class__):
-            return self.__dict__ == other.__dict__
+            return self.x == other.x and self.y == other.y
         return False
 
+    def __hash__(self):
+        """ Equal vectors have equal hashes so they can be used as keys """
+        return hash((self.x, self.y))
+
     def __ne__(self, other):
         """Override the default non-equality behavior"""
         return not self.__eq__(other)
@@ -135,3 +153,22 @@ class vector():
     def min(self, other):
         """ Min of both values """
         return vector(min(self.x,other.x),min(self.y,other.y))
+
+
+# __init__ sets the slots past the __setattr__ that keeps vectors unchanged
+set_x = vector.x.__set__
+set_y = vector.y.__set__
+
+def to_grid(offset):
+    """ Return the number of grid steps to the nearest grid point """
+    grid = tech.drc["grid"]
+    # the first rounding drops the float error of the division
+    return int(round(round((offset / grid), 2), 0))
+
+def from_grid(steps):
+    """ Return the coordinate of a number of grid steps """
+    return steps * tech.drc["grid"]
+
+def grid_vector(offset):
+    """ Return the vector on the grid point nearest to a coordinate pair """
+    return vector(from_grid(to_grid(offset[0])), from_grid(to_grid(offset[1])))
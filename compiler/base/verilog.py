@@ -16,7 +16,7 @@
 
 import debug
 
-class verilog:
+class verilog(object):
     """ Create a behavioral Verilog file for simulation."""
 
     
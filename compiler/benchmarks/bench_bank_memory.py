@@ -0,0 +1,49 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+""" Report how many vectors and pins building a bank allocates, how much memory
+    the ones still alive take, the memory of the stored rectangles and the peak
+    memory of the process. """
+
+import sys, gc
+import benchmark
+benchmark.setup()
+import debug
+from vector import vector
+from pin_layout import pin_layout
+from geometry import rectangle_array
+import bank
+
+def object_size(obj):
+    """ Size of an object and of its attribute dictionary, if it has one """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+counts = {}
+benchmark.count_allocations(vector, counts)
+benchmark.count_allocations(pin_layout, counts)
+
+(b, runtime) = benchmark.timed(bank.bank, word_size=32, words_per_row=1, num_rows=256,
+                               num_subanks=1, two_level_bank=False, name="bank")
+
+gc.collect()
+for cls in [vector, pin_layout]:
+    alive = [obj for obj in gc.get_objects() if isinstance(obj, cls)]
+    debug.info(0, "{0:12s} allocated {1:9d}  alive {2:8d}  {3:6d} bytes each  {4:10d} bytes alive".format(
+        cls.__name__, counts[cls.__name__], len(alive),
+        object_size(alive[0]) if alive else 0, sum(object_size(obj) for obj in alive)))
+rect_arrays = [obj for obj in gc.get_objects() if isinstance(obj, rectangle_array)]
+rect_count = sum(len(rects) for rects in rect_arrays)
+rect_bytes = sum(sys.getsizeof(rects) + sum(sys.getsizeof(column) for column in
+                 [rects.x, rects.y, rects.width, rects.height, rects.datatype]) for rects in rect_arrays)
+debug.info(0, "{0:12s} stored    {1:9d}  {2:6.1f} bytes each  {3:10d} bytes alive".format(
+    "rectangle", rect_count, rect_bytes/float(max(rect_count, 1)), rect_bytes))
+debug.info(0, "peak memory {0:.1f} MB  build time {1:.1f} s".format(benchmark.peak_memory(), runtime))
+
+benchmark.finish()
@@ -0,0 +1,39 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+""" Report how many designs and gdsMill layouts building a full sram allocates,
+    the peak memory of the build and the peak memory after writing the netlist
+    and the GDS. """
+
+import gc, os
+import benchmark
+benchmark.setup()
+from globals import OPTS
+import debug
+import gdsMill
+import design
+import sram
+
+counts = {}
+benchmark.count_allocations(gdsMill.VlsiLayout, counts)
+
+(s, runtime) = benchmark.timed(sram.sram, word_size=32, words_per_row=2, num_rows=128, num_subanks=2,
+                               branch_factors=(2,4), bank_orientations=("H", "H"), name="sram")
+
+gc.collect()
+designs = [obj for obj in gc.get_objects() if isinstance(obj, design.design)]
+debug.info(0, "designs {0}  layouts allocated {1}  build time {2:.1f} s  peak memory {3:.1f} MB".format(
+    len(designs), counts["VlsiLayout"], runtime, benchmark.peak_memory()))
+
+s.sp_write(OPTS.AMC_temp + "bench_sram.sp")
+s.gds_write(OPTS.AMC_temp + "bench_sram.gds")
+debug.info(0, "layouts allocated after writing {0}  peak memory {1:.1f} MB".format(
+    counts["VlsiLayout"], benchmark.peak_memory()))
+
+os.remove(OPTS.AMC_temp + "bench_sram.sp")
+os.remove(OPTS.AMC_temp + "bench_sram.gds")
+benchmark.finish()
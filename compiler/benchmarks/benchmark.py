@@ -0,0 +1,61 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+""" Setup shared by the benchmarks in this directory. They are run by hand, e.g.
+    python bench_bank_memory.py -t scn3me_subm, with the configuration of the
+    regression tests and without the LVS/DRC checks. """
+
+import sys, os, time, resource
+compiler_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(compiler_dir)
+import globals
+from globals import OPTS
+
+def setup():
+    """ Parse the options and initialize AMC for a benchmark """
+
+    globals.parse_args()
+    del sys.argv[1:]
+    config_file = os.path.join(compiler_dir, "tests", "config_20_{0}".format(OPTS.tech_name))
+    globals.init_AMC(config_file, is_unit_test=False)
+    OPTS.check_lvsdrc = False
+
+def finish():
+    """ Clean up AMC at the end of a benchmark """
+
+    globals.end_AMC()
+
+def count_allocations(cls, counts):
+    """ Count the objects of a class made from now on in counts[class name],
+        also the copies made with cls.__new__ that skip __init__ """
+
+    counts.setdefault(cls.__name__, 0)
+    if not hasattr(cls, "__new__"):
+        # an old-style class, its objects are always initialized
+        init = cls.__init__
+        def counted_init(self, *args, **kwargs):
+            counts[cls.__name__] += 1
+            init(self, *args, **kwargs)
+        cls.__init__ = counted_init
+        return
+    new = cls.__new__
+    def counted_new(subclass, *args, **kwargs):
+        counts[cls.__name__] += 1
+        return new(subclass)
+    cls.__new__ = staticmethod(counted_new)
+
+def timed(function, *args, **kwargs):
+    """ Return the result of a call and the seconds it took """
+
+    start = time.time()
+    result = function(*args, **kwargs)
+    return (result, time.time() - start)
+
+def peak_memory():
+    """ Peak memory of the process in MB, ru_maxrss is in kilobytes on Linux """
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
@@ -37,7 +37,7 @@ class bist(design.design):
     def __init__(self, addr_size, data_size, delay = 0, async_bist = True, name="bist"):
         """ Constructor """
 
-        design.design.name_map=[]
+        design.design.name_map=set()
         start_time = datetime.datetime.now()
         design.design.__init__(self, name)
         debug.info(1, "Creating {}".format(name))
@@ -494,14 +494,12 @@ class bist(design.design):
 
     def sp_write(self, sp_name):
         """ Write the entire spice of the object to the file """
-        sp = open(sp_name, 'w')
+        sp = self.sp_open(sp_name)
 
         sp.write("**************************************************\n")
         sp.write("* AMC generated BIST.\n")
         sp.write("**************************************************\n")        
-        usedMODS = list()
-        self.sp_write_file(sp, usedMODS)
-        del usedMODS
+        self.sp_write_file(sp, set())
         sp.close()
 
 
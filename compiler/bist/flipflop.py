@@ -24,6 +24,7 @@ class flipflop(design.design):
     This module implements the single flipflop cell used in the design. It
     is a hand-made cell, so the layout and netlist should be available in
     the technology library."""
+    memoize = True
 
     pin_names = ["in", "out", "out_bar", "clk", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("flipflop", GDS["unit"], layer["boundary"])
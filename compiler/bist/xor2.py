@@ -24,6 +24,7 @@ class xor2(design.design):
     This module implements the single 2 input xor cell used in the design. It
     is a hand-made cell, so the layout and netlist should be available in
     the technology library."""
+    memoize = True
 
     pin_names = ["A", "B", "Z", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("xor2", GDS["unit"], layer["boundary"])
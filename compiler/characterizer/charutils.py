@@ -7,6 +7,7 @@
 
 import re
 import debug
+import multiprocessing
 from globals import OPTS
 
         
@@ -16,10 +17,12 @@ def relative_compare(value1,value2,error_tolerance=0.001):
     return (abs(value1 - value2) / max(value1,value2) <= error_tolerance)
 
 
-def parse_output(filename, key):
-    """Parses a spice output file for a key value"""
+def parse_output(filename, key, work_dir=None):
+    """Parses a spice output file for a key value, in the temp directory by default"""
     
-    full_filename="{0}{1}.mt".format(OPTS.AMC_temp, filename)
+    if work_dir == None:
+        work_dir = OPTS.AMC_temp
+    full_filename="{0}{1}.mt".format(work_dir, filename)
 
     try:
         f = open(full_filename, "r")
@@ -35,6 +38,35 @@ def parse_output(filename, key):
     else:
         return "Failed"
     
+def call_with_args(function_args):
+    """ Call a function with its arguments, packed in one tuple for the process pool """
+    
+    (function, args) = function_args
+    return function(*args)
+
+def run_parallel(function, args_list, processes=0):
+    """ Call the function with each tuple of arguments in a pool of at most the given number
+        of processes (0 uses every processor) and return the results in the order of the arguments.
+        The function must be defined at module level. """
+    
+    if processes == 0:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(args_list))
+    if processes <= 1:
+        return [function(*args) for args in args_list]
+
+    debug.info(1, "Running {0} simulations in {1} processes", len(args_list), processes)
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(call_with_args, [(function, args) for args in args_list], chunksize=1)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    return results
+    
 def round_time(time,time_precision=3):
     """ times are in ns, so this is how many digits of precision: 3 digits=1ps, 4digits=0.1ps, etc.""" 
     
@@ -35,7 +35,8 @@ import trim_spice
 class functional_test():
     """ Class for providing stimuli and decks for functional verification """
 
-    def __init__(self, size, corner, name, w_per_row, num_rows, load=tech.spice["input_cap"], slew=tech.spice["rise_time"]):
+    def __init__(self, size, corner, name, w_per_row, num_rows, load=tech.spice["input_cap"], slew=tech.spice["rise_time"],
+                 work_dir=None):
         self.vdd_name = tech.spice["vdd_name"]
         self.gnd_name = tech.spice["gnd_name"]
         self.voltage = tech.spice["nom_supply_voltage"]
@@ -43,13 +44,18 @@ class functional_test():
         self.w_per_row = w_per_row
         self.num_rows = num_rows
 
+        # All the files of the simulation are in its own directory so simulations can run at the same time
+        self.work_dir = OPTS.AMC_temp if work_dir == None else work_dir
+        if not path.isdir(self.work_dir):
+            os.makedirs(self.work_dir)
+
         self.deck_file = "test.sp"
-        self.test = open(OPTS.AMC_temp+"test.v", "w")
-        self.dut = open(OPTS.AMC_temp+"dut.sp", "w")
-        self.deck = open(OPTS.AMC_temp+"test.sp", "w")
-        self.source = open(OPTS.AMC_temp+"source.v", "w")
-        self.cosim = open(OPTS.AMC_temp+"cosim.cfg", "w")
-        self.make = open(OPTS.AMC_temp+"Makefile", "w")
+        self.test = open(self.work_dir+"test.v", "w")
+        self.dut = open(self.work_dir+"dut.sp", "w")
+        self.deck = open(self.work_dir+"test.sp", "w")
+        self.source = open(self.work_dir+"source.v", "w")
+        self.cosim = open(self.work_dir+"cosim.cfg", "w")
+        self.make = open(self.work_dir+"Makefile", "w")
         
         (self.addr_bit, self.data_bit) = size
         (self.process, self.voltage, self.temperature) = corner
@@ -91,7 +97,9 @@ class functional_test():
             #trim_spice.trim_spice(filename, reduced_file, dbits, w_per_row, num_rows, "1"*abits, "0"*abits)
             #spice_name="reduced"
         
-        self.dut.write(".inc {0}.sp\n\n".format(spice_name))
+        # the netlist of the sram is in the temp directory
+        sp_file = path.relpath("{0}{1}.sp".format(OPTS.AMC_temp, spice_name), self.work_dir)
+        self.dut.write(".inc {0}\n\n".format(sp_file))
         #self.dut.write("V{0} {0} 0 dc {1}v\n".format("test"+self.vdd_name, self.voltage))
         #self.dut.write("V{0} {0} 0 dc 0.0v\n".format("test"+self.gnd_name))
         self.dut.write("\n")
@@ -186,6 +194,7 @@ class functional_test():
         self.deck.write(".global {0} {1}\n".format(self.vdd_name, self.gnd_name))
         self.deck.write("vpwr0 {0} 0 dc {1}v\n".format(self.vdd_name, self.voltage))
         self.deck.write("vpwr1 {0} 0 dc {1}v\n\n".format(self.gnd_name, 0))
+        self.deck.write(".temp {0}\n".format(self.temperature))
         self.deck.write("*.include or .lib?\n")
         self.deck.write(".lib {0} {1}\n".format(self.device_models, self.process))
         self.deck.write(".include {0} {1}\n".format(self.device_models, self.process))
@@ -477,39 +486,38 @@ class functional_test():
         
         
         for myfile in ["cosim.cfg", "test.sp", "test.v", "source.v", "dut.sp", "Makefile"]:
-            filename="{0}{1}".format(OPTS.AMC_temp, myfile)
+            filename="{0}{1}".format(self.work_dir, myfile)
             while not path.exists(filename):
                 time.sleep(1)
             else:
                 os.chmod(filename, 0o777)
         
-        os.chdir(OPTS.AMC_temp)
-        spice_stdout = open("{0}spice_stdout.log".format(OPTS.AMC_temp), 'w')
-        spice_stderr = open("{0}spice_stderr.log".format(OPTS.AMC_temp), 'w')
+        spice_stdout = open("{0}spice_stdout.log".format(self.work_dir), 'w')
+        spice_stderr = open("{0}spice_stderr.log".format(self.work_dir), 'w')
 
 
-        retcode = subprocess.call("make", shell=True, stdout=spice_stdout, stderr=spice_stderr)
+        retcode = subprocess.call("make", shell=True, cwd=self.work_dir, stdout=spice_stdout, stderr=spice_stderr)
         spice_stdout.close()
         spice_stderr.close()
 
         if (retcode > 1):
-            debug.error("Spice simulation error: " + cmd, -1)
+            debug.error("Spice simulation error in " + self.work_dir, -1)
 
 
-        filename="{0}{1}".format(OPTS.AMC_temp, "hsim.mt")
+        filename="{0}{1}".format(self.work_dir, "hsim.mt")
         while not path.exists(filename):
                 time.sleep(1)
         
         #Parse the hsim.mt file to repoert delay and power values.
-        write_delay = charutils.parse_output("hsim", "write_delay")
-        read_delay = charutils.parse_output("hsim", "read_delay")
-        read_write_delay = charutils.parse_output("hsim", "read_write_delay")
-        slew_hl = charutils.parse_output("hsim", "slew_hl")
-        slew_lh = charutils.parse_output("hsim", "slew_lh")
-        leakage_power = charutils.parse_output("hsim", "leakage_power")
-        write_power = charutils.parse_output("hsim", "write_power")
-        read_power = charutils.parse_output("hsim", "read_power")
-        read_write_power = charutils.parse_output("hsim", "read_write_power")
+        write_delay = charutils.parse_output("hsim", "write_delay", self.work_dir)
+        read_delay = charutils.parse_output("hsim", "read_delay", self.work_dir)
+        read_write_delay = charutils.parse_output("hsim", "read_write_delay", self.work_dir)
+        slew_hl = charutils.parse_output("hsim", "slew_hl", self.work_dir)
+        slew_lh = charutils.parse_output("hsim", "slew_lh", self.work_dir)
+        leakage_power = charutils.parse_output("hsim", "leakage_power", self.work_dir)
+        write_power = charutils.parse_output("hsim", "write_power", self.work_dir)
+        read_power = charutils.parse_output("hsim", "read_power", self.work_dir)
+        read_write_power = charutils.parse_output("hsim", "read_write_power", self.work_dir)
         
         self.result = {"write_delay_lh" : write_delay*(10**9),
                        "write_delay_hl" : write_delay*(10**9),
@@ -52,21 +52,27 @@ class lib():
 
         # Enumerate all possible corners
         self.corners = []
+        self.corner_names = []
         self.lib_files = []
         for proc in self.process_corners:
             for temp in self.temperatures:
                 for volt in self.supply_voltages:
-                    self.corner_name = "{0}_{1}_{2}V_{3}C".format(self.sram.name, proc, volt, temp)
-                    self.corner_name = self.corner_name.replace(".","p") # Remove decimals (point)
-                    lib_name = self.out_dir+"{}.lib".format(self.corner_name)
+                    corner_name = "{0}_{1}_{2}V_{3}C".format(self.sram.name, proc, volt, temp)
+                    corner_name = corner_name.replace(".","p") # Remove decimals (point)
+                    lib_name = self.out_dir+"{}.lib".format(corner_name)
                     
                     # A corner is a tuple of PVT
                     self.corners.append((proc, volt, temp))
+                    self.corner_names.append(corner_name)
                     self.lib_files.append(lib_name)
         
     def characterize_corners(self):
         """ Characterize the list of corners. """
-        for (self.corner,lib_name) in zip(self.corners,self.lib_files):
+        
+        # The corners are simulated once, together, so they share the pool of simulations
+        size = (self.sram.addr_size, self.sram.word_size)
+        self.corner_results = self.delay_power_corners(size, self.corners, self.name, self.loads, self.slews)
+        for (self.corner, self.corner_name, lib_name) in zip(self.corners, self.corner_names, self.lib_files):
             debug.info(1,"Corner: " + str(self.corner))
             (self.process, self.voltage, self.temperature) = self.corner
             self.lib = open(lib_name, "w")
@@ -404,26 +410,46 @@ class lib():
         
         
     def compute_delay(self):
-        """ Do the analysis if we haven't characterized the SRAM yet """
+        """ Use the measurements of the current corner, simulated with all the corners """
 
-        size = (self.sram.addr_size, self.sram.word_size)
-        corner = (OPTS.process_corners[0], OPTS.supply_voltages[0], OPTS.temperatures[0])
-        self.results  = self.delay_power(size, corner, self.name, self.loads , self.slews)
+        self.results = self.corner_results[self.corner]
 
     def delay_power(self, size, corner, name, loads , slews):
         """ Measure the delay, slew and power for all slew/load pairs """
 
-        char_data = {}
-        for m in ["write_delay_lh", "write_delay_hl", "read_delay_lh", "read_delay_hl", 
-                  "read_write_delay_lh", "read_write_delay_hl", "slew_lh", "slew_hl", 
-                  "leakage_power", "read_power", "write_power", "read_write_power"]:
-            char_data[m]=[]
-
-        for slew in slews:
-            for load in loads:
-                d = functional_test.functional_test(size, corner, name, self.sram.w_per_row, 
-                                                    self.sram.num_rows, load ,slew)
-                q = d.result
+        return self.delay_power_corners(size, [corner], name, loads, slews)[corner]
+
+    def delay_power_corners(self, size, corners, name, loads, slews):
+        """ Measure the delay, slew and power for all slew/load pairs of every corner.
+            Every corner and pair is a simulation of the same pool. """
+
+        # each corner and slew/load pair is simulated in its own directory, the results are in the order of the points
+        points = []
+        for (c, corner) in enumerate(corners):
+            for (i, slew) in enumerate(slews):
+                for (j, load) in enumerate(loads):
+                    work_dir = "{0}sim_{1}_{2}_{3}/".format(OPTS.AMC_temp, c, i, j)
+                    points.append((size, corner, name, self.sram.w_per_row, self.sram.num_rows, 
+                                   load, slew, work_dir))
+        results = charutils.run_parallel(simulate_point, points, OPTS.num_sim_processes)
+
+        corner_data = {}
+        num_points = len(slews)*len(loads)
+        for (c, corner) in enumerate(corners):
+            char_data = {}
+            for m in ["write_delay_lh", "write_delay_hl", "read_delay_lh", "read_delay_hl", 
+                      "read_write_delay_lh", "read_write_delay_hl", "slew_lh", "slew_hl", 
+                      "leakage_power", "read_power", "write_power", "read_write_power"]:
+                char_data[m]=[]
+            for q in results[c*num_points:(c+1)*num_points]:
                 for k,v in q.items():
                     char_data[k].append(v)
-        return char_data
+            corner_data[corner] = char_data
+        return corner_data
+
+
+def simulate_point(size, corner, name, w_per_row, num_rows, load, slew, work_dir):
+    """ Simulate one slew/load pair in its work directory and return its measurements """
+    
+    d = functional_test.functional_test(size, corner, name, w_per_row, num_rows, load, slew, work_dir)
+    return d.result
@@ -1,123 +1,439 @@
 # BSD 3-Clause License (See LICENSE.OR for licensing information)
-# Copyright (c) 2016-2019 Regents of the University of California 
-# and The Board of Regents for the Oklahoma Agricultural and 
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
 # Mechanical College (acting for and on behalf of Oklahoma State University)
 # All rights reserved.
 
 
 import debug
 from math import log
+from tech import spice
+
+# scale of the spice unit suffixes of transistor sizes to microns
+unit_scale = {"f": 1e-9, "p": 1e-6, "n": 1e-3, "u": 1.0, "m": 1e3}
+
+def microns(value):
+    """ Convert a spice length (e.g. 0.6u) to microns, a length without a suffix is in meters """
+
+    value = value.lower()
+    if value[-1] in unit_scale:
+        return float(value[:-1])*unit_scale[value[-1]]
+    return float(value)*1e6
+
+
+class subckt():
+    """ A subcircuit of the netlist read by trim_spice. Each element is a tuple of
+        its line, its nets and the name of the subcircuit it instantiates (None for
+        devices and comments). The terminals map each net to the (element, position)
+        pairs on the net. """
+
+    def __init__(self, line, name, pins):
+        self.line = line
+        self.name = name
+        self.pins = pins
+        self.pin_index = dict((pin, i) for (i, pin) in enumerate(pins))
+        self.elements = []
+        self.terminals = {}
+        self.is_leaf = True
+
+    def add_element(self, line, nets, master=None):
+        """ Adds an element and its terminals """
+
+        index = len(self.elements)
+        self.elements.append((line, nets, master))
+        for (position, net) in enumerate(nets):
+            self.terminals.setdefault(net, []).append((index, position))
+        if master != None:
+            self.is_leaf = False
+
 
 class trim_spice():
-    """ A utility to trim redundant parts of an SRAM spice netlist. 
+    """ A utility to trim redundant parts of an SRAM spice netlist.
         Input is an SRAM spice file. Output is an equivalent netlist
-        that works for a single address and range of data bits. """
+        that works for a single address and range of data bits.
+        The netlist is read once into a graph of subcircuits, instances and nets.
+        The rows and columns of the bitcell array are traced through the hierarchy
+        to the repeated cells that serve them (precharge, column mux, sense amp,
+        write driver, write complete and decoder rows). A repeated cell that only
+        serves other rows and columns is removed and its pin capacitance is added
+        as a lumped load to the nets it leaves behind. """
+
+    # a cell is repeated, and may be trimmed, if its subcircuit has this many of it
+    min_array_size = 4
 
-    def __init__(self, spfile, reduced_spfile, word_size, w_per_row, num_rows, 
-                 addr1, addr2):
+    def __init__(self, spfile, reduced_spfile, word_size, w_per_row, num_rows,
+                 addr1, addr2, data_bits=None):
         self.sp_file = spfile
-        self.reduced_spfile = reduced_spfile        
+        self.reduced_spfile = reduced_spfile
 
         debug.info(1,"Trimming non-critical cells to speed-up characterization")
-        
-        # Load the file into a buffer for performance
-        sp = open(self.sp_file, "r")
-        self.spice = sp.readlines()
-        for i in range(len(self.spice)):
-            self.spice[i] = self.spice[i].rstrip(" \n")
-        self.sp_buffer = self.spice
 
         #Set the configuration of SRAM sizes that we are simulating.
         self.word_size = word_size
         self.num_rows = num_rows
         self.w_per_row = w_per_row
+        # the data bits to keep, all the bits of the word by default
+        if data_bits == None:
+            data_bits = range(self.word_size)
+        self.data_bits = data_bits
 
         self.row_addr_size = int(log(self.num_rows, 2))
         self.col_addr_size = int(log(self.w_per_row, 2))
+        self.supplies = [spice["vdd_name"], spice["gnd_name"], "0"]
+
+        # The netlist is parsed and traced once, every trim starts from it without changing it
+        self.read()
+        self.find_array()
+        self.find_candidates()
+        self.trace()
+        self.find_pin_caps()
         self.trim(addr1, addr2)
 
+    def read(self):
+        """ Read the netlist into its subcircuits, the lines out of any subcircuit are kept as the header """
+
+        # join the continuation lines
+        lines = []
+        for line in open(self.sp_file, "r"):
+            line = line.rstrip()
+            if line.startswith("+") and lines:
+                lines[-1] += " " + line[1:]
+            else:
+                lines.append(line)
+
+        self.header = []
+        self.subckts = {}
+        self.order = []
+        current = None
+        for line in lines:
+            tokens = line.split()
+            key = tokens[0].upper() if tokens else ""
+            if key == ".SUBCKT":
+                current = subckt(line, tokens[1], [x for x in tokens[2:] if "=" not in x])
+                self.subckts[current.name] = current
+                self.order.append(current)
+            elif key == ".ENDS":
+                current = None
+            elif current == None:
+                self.header.append(line)
+            elif key.startswith("X"):
+                current.add_element(line, [x for x in tokens[1:-1] if "=" not in x], tokens[-1])
+            elif key.startswith("M"):
+                current.add_element(line, tokens[1:5])
+            elif key.startswith("*") or key == "":
+                current.add_element(line, [])
+            else:
+                current.add_element(line, tokens[1:3])
+
+        # the subcircuits that instantiate each subcircuit and the order of the hierarchy
+        self.parents = dict((ckt.name, []) for ckt in self.order)
+        for ckt in self.order:
+            for (index, (line, nets, master)) in enumerate(ckt.elements):
+                if master in self.subckts:
+                    debug.check(len(nets) == len(self.subckts[master].pins),
+                                "{0} in {1} does not match the pins of {2}.", line.split()[0], ckt.name, master)
+                    self.parents[master].append((ckt, index))
+        self.post_order = self.hierarchy_order()
+
+    def hierarchy_order(self):
+        """ Return the subcircuits each one after the subcircuits it instantiates """
+
+        post_order = []
+        visited = set()
+        for top in self.order:
+            if self.parents[top.name] or top.name in visited:
+                continue
+            visited.add(top.name)
+            stack = [(top, iter(top.elements))]
+            while stack:
+                (ckt, elements) = stack[-1]
+                for (line, nets, master) in elements:
+                    if master in self.subckts and master not in visited:
+                        visited.add(master)
+                        child = self.subckts[master]
+                        stack.append((child, iter(child.elements)))
+                        break
+                else:
+                    stack.pop()
+                    post_order.append(ckt)
+        return post_order
+
+    def find_array(self):
+        """ The bitcell array is the subcircuit with the most instances of a leaf cell with bl, br and wl pins """
+
+        count = {}
+        for ckt in self.order:
+            for (line, nets, master) in ckt.elements:
+                cell = self.subckts.get(master)
+                if cell and cell.is_leaf and set(["bl", "br", "wl"]).issubset(cell.pin_index):
+                    count[(ckt.name, master)] = count.get((ckt.name, master), 0) + 1
+        debug.check(len(count) > 0, "No bitcell array in {0}.", self.sp_file)
+        (array, cell) = max(count, key=count.get)
+        self.array = self.subckts[array]
+        self.cell = self.subckts[cell]
+        debug.info(1, "Bitcell array {0} of {1} {2} cells", array, count[(array, cell)], cell)
+
+    def is_private(self, ckt, net):
+        """ A private net connects two elements at most, like the input and output of a cell in an array """
+
+        return len(ckt.terminals.get(net, [])) <= 2 and net not in self.supplies
+
+    def find_candidates(self):
+        """ The repeated cells of each subcircuit may be trimmed, except the ones that
+            drive another cell through a private net """
+
+        self.candidates = {}
+        for ckt in self.order:
+            count = {}
+            for (line, nets, master) in ckt.elements:
+                if master != None:
+                    count[master] = count.get(master, 0) + 1
+            repeated = set(index for (index, (line, nets, master)) in enumerate(ckt.elements)
+                           if count.get(master, 0) >= self.min_array_size)
+            candidates = set()
+            for index in repeated:
+                nets = ckt.elements[index][1]
+                for net in nets:
+                    if net in ckt.pin_index or not self.is_private(ckt, net):
+                        continue
+                    if any(other != index and other not in repeated for (other, position) in ckt.terminals[net]):
+                        break
+                else:
+                    candidates.add(index)
+            self.candidates[ckt.name] = candidates
+
+    def trace(self):
+        """ Label the nets with the rows and columns of the bitcell array they serve. The labels
+            are the word line and bit line names in the array and go up and down the hierarchy
+            on the pins and across the private nets of the repeated leaf cells. """
+
+        self.labels = dict((ckt.name, {}) for ckt in self.order)
+        array_labels = self.labels[self.array.name]
+        (wl, bl, br) = [self.cell.pin_index[pin] for pin in ["wl", "bl", "br"]]
+        # the row and column of each cell of the array
+        self.cell_labels = {}
+        for (index, (line, nets, master)) in enumerate(self.array.elements):
+            if master == self.cell.name:
+                self.cell_labels[index] = (nets[wl], nets[bl])
+                for (position, label) in [(wl, nets[wl]), (bl, nets[bl]), (br, nets[bl])]:
+                    array_labels.setdefault(nets[position], set()).add(label)
+        self.all_labels = set()
+        for labels in array_labels.values():
+            self.all_labels.update(labels)
+
+        work = [(self.array, net, set(labels)) for (net, labels) in array_labels.items()]
+        while work:
+            (ckt, net, labels) = work.pop()
+            if net in ckt.pin_index:
+                position = ckt.pin_index[net]
+                for (parent, index) in self.parents[ckt.name]:
+                    self.add_labels(parent, parent.elements[index][1][position], labels, work)
+            if ckt is self.array:
+                continue
+            for (index, position) in ckt.terminals.get(net, []):
+                (line, nets, master) = ckt.elements[index]
+                child = self.subckts.get(master)
+                if child and not child.is_leaf:
+                    self.add_labels(child, child.pins[position], labels, work)
+                elif index in self.candidates[ckt.name]:
+                    for other in nets:
+                        if other != net and self.is_private(ckt, other):
+                            self.add_labels(ckt, other, labels, work)
+
+        # the labels of each instance and the labels kept for any address,
+        # the rows and columns of the leaf cells that are never trimmed
+        self.inst_labels = {}
+        self.fixed_labels = set()
+        for ckt in self.order:
+            if ckt is self.array:
+                continue
+            net_labels = self.labels[ckt.name]
+            inst_labels = {}
+            for (index, (line, nets, master)) in enumerate(ckt.elements):
+                if master == None:
+                    continue
+                labels = set()
+                for net in nets:
+                    labels.update(net_labels.get(net, ()))
+                inst_labels[index] = labels
+                leaf = master not in self.subckts or self.subckts[master].is_leaf
+                if leaf and index not in self.candidates[ckt.name]:
+                    self.fixed_labels.update(labels)
+            self.inst_labels[ckt.name] = inst_labels
+
+    def add_labels(self, ckt, net, labels, work):
+        """ Add the labels to a net and queue the new ones, the labels of the array are fixed """
+
+        if ckt is self.array:
+            return
+        net_labels = self.labels[ckt.name].setdefault(net, set())
+        new_labels = labels - net_labels
+        if new_labels:
+            net_labels.update(new_labels)
+            work.append((ckt, net, new_labels))
+
+    def find_pin_caps(self):
+        """ Estimate the capacitance of the pins of every subcircuit in fF from the
+            gate area and the drain and source width of its transistors """
+
+        self.pin_caps = {}
+        for ckt in self.post_order:
+            caps = {}
+            for (line, nets, master) in ckt.elements:
+                if master in self.pin_caps:
+                    child_caps = self.pin_caps[master]
+                    for (pin, net) in zip(self.subckts[master].pins, nets):
+                        caps[net] = caps.get(net, 0.0) + child_caps[pin]
+                elif master == None and line[0] in "mM":
+                    for (net, cap) in self.device_caps(line, nets):
+                        caps[net] = caps.get(net, 0.0) + cap
+            self.pin_caps[ckt.name] = dict((pin, caps.get(pin, 0.0)) for pin in ckt.pins)
+
+    def device_caps(self, line, nets):
+        """ Return the (net, capacitance) of the gate, drain and source of a transistor """
+
+        params = dict(x.lower().split("=", 1) for x in line.split() if "=" in x)
+        width = microns(params.get("w", "0"))*float(params.get("m", "1"))
+        length = microns(params.get("l", "0"))
+        (drain, gate, source) = nets[0:3]
+        return [(gate, width*length*spice["gate_cap"]),
+                (drain, width*spice["drain_cap"]),
+                (source, width*spice["drain_cap"])]
+
     def trim(self, addr1, addr2):
         """ Reduce the spice netlist but KEEP the given bits at the
             address (and things that will add capacitive load!)"""
 
-        # Always start fresh if we do multiple reductions
-        self.sp_buffer = self.spice
-
         # Split up the address and convert to an int
         wl_addr1 = int(addr1[0:self.row_addr_size],2)
         wl_addr2 = int(addr2[0:self.row_addr_size],2)
         if self.w_per_row>1:
-            col_addr1 = int(addr1[self.row_addr_size:self.row_addr_size+int(log(self.w_per_row,2))],2)
-            col_addr2 = int(addr2[self.row_addr_size:self.row_addr_size+int(log(self.w_per_row,2))],2)
+            col_addr1 = int(addr1[self.row_addr_size:self.row_addr_size+self.col_addr_size],2)
+            col_addr2 = int(addr2[self.row_addr_size:self.row_addr_size+self.col_addr_size],2)
         else:
             col_addr1 = 0
             col_addr2 = 0
 
-        # 1. Keep cells in the bitcell array based on WL and BL (first BL from each word for write_complete)
-        bl_name1 = "bl[{0}]".format(col_addr1*self.word_size)
-        bl_name2 = "bl[{0}]".format(col_addr2*self.word_size)
-        wl_name1 = "wl[{0}]".format(wl_addr1)
-        wl_name2 = "wl[{0}]".format(wl_addr2)
-
-
-        # Prepend info about the trimming
-        addr_msg = "Keeping {} address".format(addr1)
-        self.sp_buffer.insert(0, "* "+addr_msg)
-        debug.info(1,addr_msg)
-        addr_msg = "Keeping {} address".format(addr2)
-        self.sp_buffer.insert(0, "* "+addr_msg)
-        debug.info(1,addr_msg)
-        
-        bl_msg = "Keeping {} (trimming other BLs)".format(bl_name1)
-        self.sp_buffer.insert(0, "* "+bl_msg)
-        debug.info(1,bl_msg)
-        bl_msg = "Keeping {} (trimming other BLs)".format(bl_name2)
-        self.sp_buffer.insert(0, "* "+bl_msg)
-        debug.info(1,bl_msg)
-
-        wl_msg = "Keeping {} (trimming other WLs)".format(wl_name1)
-        self.sp_buffer.insert(0, "* "+wl_msg)
-        debug.info(1,wl_msg)
-        wl_msg = "Keeping {} (trimming other WLs)".format(wl_name2)
-        self.sp_buffer.insert(0, "* "+wl_msg)
-        debug.info(1,wl_msg)
-
-        self.sp_buffer.insert(0, "* It should NOT be used for LVS!!")
-        self.sp_buffer.insert(0, "* WARNING: This is a TRIMMED NETLIST.")
-        
-        self.remove_insts("bitcell_ary",[wl_name1, bl_name1])
-        self.remove_insts("bitcell_ary",[wl_name2, bl_name2])
-
-        # Everything else isn't worth removing. :)
-        
+        # 1. Keep the rows of the addresses and the columns of their data bits
+        sp_buffer = ["* WARNING: This is a TRIMMED NETLIST.", "* It should NOT be used for LVS!!"]
+        kept = set()
+        for (addr, wl_addr, col_addr) in [(addr1, wl_addr1, col_addr1), (addr2, wl_addr2, col_addr2)]:
+            wl_name = "wl[{0}]".format(wl_addr)
+            bl_names = ["bl[{0}]".format(bit*self.w_per_row + col_addr) for bit in self.data_bits]
+            for msg in ["Keeping {} address".format(addr),
+                        "Keeping {} (trimming other WLs)".format(wl_name),
+                        "Keeping {0} to {1} (trimming other BLs)".format(bl_names[0], bl_names[-1])]:
+                sp_buffer.append("* " + msg)
+                debug.info(1, msg)
+            kept.add(wl_name)
+            kept.update(bl_names)
+        debug.check(kept.issubset(self.all_labels), "Address is out of the {0} array.", self.array.name)
+
+        # 2. Keep the rows and columns used by the cells that are never trimmed
+        kept.update(self.fixed_labels)
+        removed = self.find_removed(kept)
+        alive = self.find_alive(removed)
+        self.removed = removed
+        debug.info(1, "Kept {0} of {1} transistors", self.flat_transistors(removed), self.flat_transistors())
+
+        # 3. Write the kept elements and a lumped load for the pins of the removed cells
+        sp_buffer.extend(self.header)
+        num_insts = 0
+        num_removed = 0
+        for ckt in self.order:
+            sp_buffer.append(ckt.line)
+            for (index, (line, nets, master)) in enumerate(ckt.elements):
+                if index not in removed[ckt.name]:
+                    sp_buffer.append(line)
+            loads = self.lumped_loads(ckt, removed[ckt.name], alive[ckt.name])
+            for (i, (net, cap)) in enumerate(loads):
+                sp_buffer.append("Ctrim_load{0} {1} 0 {2:.3f}f".format(i, net, cap))
+            sp_buffer.append(".ENDS {0}".format(ckt.name))
+            sp_buffer.append("")
+            num_insts += len(ckt.elements)
+            num_removed += len(removed[ckt.name])
+        debug.info(1, "Removed {0} of {1} elements", num_removed, num_insts)
+
         # Finally, write out the buffer as the new reduced file
         sp = open(self.reduced_spfile, "w")
-        sp.write("\n".join(self.sp_buffer))
-
-        
-    def remove_insts(self, subckt_name, keep_inst_list):
-        """This will remove all of the instances in the list from the named subckt that DO NOT contain 
-           a term in the list. It just does a match of the line with a term so you can search for a 
-           single net connection, the instance name, anything."""
-        
-        start_name = ".SUBCKT {}".format(subckt_name)
-        end_name = ".ENDS {}".format(subckt_name)
-
-        in_subckt=False
-        new_buffer=[]
-        for line in self.sp_buffer:
-            if start_name in line:
-                new_buffer.append(line)
-                in_subckt=True
-            elif end_name in line:
-                new_buffer.append(line)
-                in_subckt=False
-            elif in_subckt:
-                for k in keep_inst_list:
-                    if k in line:
-                        new_buffer.append(line)
-                        break
-            else:
-                new_buffer.append(line)
+        sp.write("\n".join(sp_buffer))
+        sp.close()
+
+    def flat_transistors(self, removed=None):
+        """ Return the number of transistors of the netlist with every subcircuit flattened,
+            leaving out the removed elements of each subcircuit if they are given """
+
+        count = {}
+        for ckt in self.post_order:
+            skipped = removed[ckt.name] if removed else set()
+            count[ckt.name] = sum(count.get(master, 0) if master != None else int(line[0] in "mM")
+                                  for (index, (line, nets, master)) in enumerate(ckt.elements)
+                                  if index not in skipped)
+        return count[self.post_order[-1].name]
+
+    def find_removed(self, kept):
+        """ Return the elements of each subcircuit to remove. The cells of the array are kept
+            on a kept row and a kept column, other repeated cells if they serve a kept row or column. """
+
+        removed = {}
+        for ckt in self.order:
+            if ckt is self.array:
+                removed[ckt.name] = set(index for (index, (row, col)) in self.cell_labels.items()
+                                        if row not in kept or col not in kept)
+                continue
+            inst_labels = self.inst_labels[ckt.name]
+            removed[ckt.name] = set(index for index in self.candidates[ckt.name]
+                                    if inst_labels[index] and inst_labels[index].isdisjoint(kept))
+        return removed
+
+    def find_alive(self, removed):
+        """ Return the nets of each subcircuit that still reach a kept element,
+            inside the subcircuit or through its pins """
+
+        # the nets used by the kept elements, the subcircuits first
+        used = {}
+        used_pins = {}
+        for ckt in self.post_order:
+            nets_used = set()
+            for (index, (line, nets, master)) in enumerate(ckt.elements):
+                if index in removed[ckt.name]:
+                    continue
+                if master in used_pins:
+                    child_pins = used_pins[master]
+                    nets_used.update(net for (pin, net) in zip(self.subckts[master].pins, nets) if pin in child_pins)
+                else:
+                    nets_used.update(nets)
+            used[ckt.name] = nets_used
+            used_pins[ckt.name] = set(pin for pin in ckt.pins if pin in nets_used)
+
+        # the pins used outside, the parents first. The pins of the top subcircuit are
+        # not alive by themselves, a load on a net no element uses would float.
+        alive = {}
+        for ckt in reversed(self.post_order):
+            outer_pins = set()
+            for (parent, index) in self.parents[ckt.name]:
+                if index in removed[parent.name]:
+                    continue
+                parent_nets = parent.elements[index][1]
+                outer_pins.update(pin for (pin, net) in zip(ckt.pins, parent_nets) if net in alive[parent.name])
+            alive[ckt.name] = used[ckt.name] | outer_pins
+        return alive
+
+    def lumped_loads(self, ckt, removed, alive):
+        """ Return the (net, capacitance) of the pins of the removed cells on the alive nets """
 
-        self.sp_buffer = new_buffer
+        loads = {}
+        nets_order = []
+        for index in sorted(removed):
+            (line, nets, master) = ckt.elements[index]
+            if master not in self.pin_caps:
+                continue
+            caps = self.pin_caps[master]
+            for (pin, net) in zip(self.subckts[master].pins, nets):
+                if net not in alive or net in self.supplies or caps[pin] == 0:
+                    continue
+                if net not in loads:
+                    nets_order.append(net)
+                    loads[net] = 0.0
+                loads[net] += caps[pin]
+        return [(net, loads[net]) for net in nets_order]
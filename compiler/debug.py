@@ -6,7 +6,6 @@
 
 
 import os
-import inspect
 import globals
 import sys
 
@@ -16,33 +15,46 @@ import sys
 # 2 = verbose
 # n = custom setting
 
-def check(check,str):
-    (frame, filename, line_number, function_name, lines,
-     index) = inspect.getouterframes(inspect.currentframe())[1]
-    if not check:
-        print("ERROR: file {0}: line {1}: {2}".format(os.path.basename(filename),line_number,str))
-        assert 0
+def check(check, str, *args):
+    """ Fail with the message if the check is false. The message is only
+        formatted with the arguments when it is printed. """
+    if check:
+        return
+    (filename, line_number) = caller()
+    print("ERROR: file {0}: line {1}: {2}".format(filename,line_number,message(str, args)))
+    assert 0
 
 def error(str,return_value=0):
-    (frame, filename, line_number, function_name, lines,
-     index) = inspect.getouterframes(inspect.currentframe())[1]
-    print("ERROR: file {0}: line {1}: {2}".format(os.path.basename(filename),line_number,str))
+    (filename, line_number) = caller()
+    print("ERROR: file {0}: line {1}: {2}".format(filename,line_number,str))
     assert return_value==0
 
 def warning(str):
-    (frame, filename, line_number, function_name, lines,
-     index) = inspect.getouterframes(inspect.currentframe())[1]
-    print("WARNING: file {0}: line {1}: {2}".format(os.path.basename(filename),line_number,str))
-
-
-def info(lev, str):
-    from globals import OPTS
-    if (OPTS.debug_level >= lev):
-        frm = inspect.stack()[1]
-        mod = inspect.getmodule(frm[0])
-        #classname = frm.f_globals['__name__']
-        if mod.__name__ == None:
-            class_name=""
-        else:
-            class_name=mod.__name__
-        print("[{0}/{1}]: {2}".format(class_name,frm[0].f_code.co_name,str))
+    (filename, line_number) = caller()
+    print("WARNING: file {0}: line {1}: {2}".format(filename,line_number,str))
+
+
+def enabled(lev):
+    """ Return true if messages of this level are printed. Use it to skip
+        building messages that are expensive even to pass as arguments. """
+    return globals.OPTS.debug_level >= lev
+
+def info(lev, str, *args):
+    """ Print the message with the module and function that called it. The
+        caller is only looked up and the message formatted when the level is enabled. """
+    if globals.OPTS.debug_level < lev:
+        return
+    frame = sys._getframe(1)
+    class_name = frame.f_globals.get("__name__") or ""
+    print("[{0}/{1}]: {2}".format(class_name,frame.f_code.co_name,message(str, args)))
+
+def caller():
+    """ Return the file name and line of the code that called the debug function """
+    frame = sys._getframe(2)
+    return (os.path.basename(frame.f_code.co_filename), frame.f_lineno)
+
+def message(str, args):
+    """ Format the message with its arguments, if it has any """
+    if args:
+        return str.format(*args)
+    return str
@@ -10,4 +10,6 @@ from pdfLayout import *
 from vlsiLayout import *
 from gdsStreamer import *
 from gdsPrimitives import *
+from gdsLibrary import *
+from gdsTransform import *
 
@@ -5,8 +5,18 @@ from gdsPrimitives import *
 class Gds2reader:
     """Class to read in a file in GDSII format and populate a layout class with it"""
     ## Based on info from http://www.rulabinsky.com/cavd/text/chapc.html
-    global offset
-    offset=0
+    #precompiled decoders shared by every reader
+    recordLength = struct.Struct(">H")
+    recordHeader = struct.Struct(">HBB")   #record length, record type, data type
+    short = struct.Struct(">h")
+    unsignedShort = struct.Struct(">H")
+    integer = struct.Struct(">i")
+    dateFields = struct.Struct(">12h")
+    columnsRows = struct.Struct(">hh")
+    #bulk XY decoders, keyed by the number of 4 byte integers in the record
+    xyDecoders = {}
+    #characters dropped from structure and reference names
+    nonASCII = "".join([chr(c) for c in range(256) if not 0 < c < 127])
 
     def __init__(self,layoutObject,debugToTerminal = 0):
         self.fileHandle = None
@@ -22,8 +32,7 @@ class Gds2reader:
         
     def stripNonASCII(self,string):
     	#''' Returns the string without non ASCII characters'''
-        stripped = (c for c in string if 0 < ord(c) < 127)
-        return "".join(stripped)
+        return string.translate(None,self.nonASCII)
 
     def ieeeDoubleFromIbmData(self,ibmData):
        #the GDS double is in IBM 370 format like this:
@@ -73,14 +82,9 @@ class Gds2reader:
         print "Check:"+str(newFloat)
     
     def readNextRecord(self):
-	global offset
         recordLengthAscii = self.fileHandle.read(2) #first 2 bytes tell us the length of the record
-        recordLength = struct.unpack(">h",recordLengthAscii)  #gives us a tuple with a short int inside
-        offlist = list(recordLength)  #change tuple to a list
-	offset += float(offlist[0])   #count offset
-	#print float(offlist[0])
-	#print offset  #print out the record numbers for de-bugging
-        record = self.fileHandle.read(recordLength[0]-2) #read the rest of it (first 2 bytes were already read)
+        recordLength = self.recordLength.unpack(recordLengthAscii)[0]
+        record = self.fileHandle.read(recordLength-2) #read the rest of it (first 2 bytes were already read)
         return record
 
     def readHeader(self):
@@ -165,7 +169,7 @@ class Gds2reader:
                     print "Mask: "+mask
             elif(idBits==('\x03','\x05')):  #this is also wrong b/c python doesn't natively have an 8 byte float
                 userUnits=self.ieeeDoubleFromIbmData(record[2]+record[3]+record[4]+record[5]+record[6]+record[7]+record[8]+record[9])
-                dbUnits=self.ieeeDoubleFromIbmData
+                dbUnits=self.ieeeDoubleFromIbmData(record[10:18])
                 self.layoutObject.info["units"] = (userUnits,dbUnits)
 	
                 #print "userUnits %s"%((record[2]+record[3]+record[4]+record[5]+record[6]+record[7]+record[8]+record[9])).encode("hex")
@@ -341,8 +345,8 @@ class Gds2reader:
                 if(self.debugToTerminal==1):
                     print "\t\tPLEX: "+str(plex)
             elif(idBits==('\x12','\x06')):  #Reference Name
-                aName = record[2::]
-                thisAref.aName=aName
+                aName = self.stripNonASCII(record[2::])
+                thisAref.aName=aName.rstrip()
                 if(self.debugToTerminal==1):
                     print "\t\tReference Name:"+aName
             elif(idBits==('\x1A','\x01')):  #Transformation
@@ -365,17 +369,19 @@ class Gds2reader:
                 thisAref.rotateAngle=rotateAngle                
                 if(self.debugToTerminal==1):
                     print "\t\t\tRotate Angle (CCW):"+str(rotateAngle)
+            elif(idBits==('\x13','\x02')):  #Columns and Rows
+                (columns,rows)=struct.unpack(">hh",record[2:6])
+                thisAref.columns=columns
+                thisAref.rows=rows
+                if(self.debugToTerminal==1):
+                    print "\t\t\tColumns: "+str(columns)+" Rows: "+str(rows)
             elif(idBits==('\x10','\x03')):  #XY Data Points
-                index=2
-                topLeftX=struct.unpack(">i",record[index]+record[index+1]+record[index+2]+record[index+3])[0]
-                topLeftY=struct.unpack(">i",record[index+4]+record[index+5]+record[index+6]+record[index+7])[0]
-                rightMostX=struct.unpack(">i",record[index+8]+record[index+9]+record[index+10]+record[index+11])[0]
-                bottomMostY=struct.unpack(">i",record[index+12]+record[index+13]+record[index+14]+record[index+15])[0]
-                thisAref.coordinates=[(topLeftX,topLeftY),(rightMostX,topLeftY),(topLeftX,bottomMostY)]
-                if(self.debugToTerminal==1):
-                    print "\t\t\tTop Left Point: "+str(topLeftX)+","+str(topLeftY)
-                    print "\t\t\t\tArray Width: "+str(rightMostX-topLeftX)
-                    print "\t\t\t\tArray Height: "+str(topLeftY-bottomMostY)
+                values = iter(struct.unpack(">6i",record[2:26]))
+                thisAref.coordinates=zip(values,values)
+                if(self.debugToTerminal==1):
+                    print "\t\t\tReference Point: "+str(thisAref.coordinates[0])
+                    print "\t\t\t\tColumn Displacement: "+str(thisAref.coordinates[1])
+                    print "\t\t\t\tRow Displacement: "+str(thisAref.coordinates[2])
             elif(idBits==('\x11','\x00')):  #End Of Element
                 break;
         return thisAref
@@ -438,10 +444,10 @@ class Gds2reader:
                 thisText.pathWidth=pathWidth
                 if(self.debugToTerminal==1):
                     print "\t\t\tPath Width: "+str(pathWidth)
-            elif(idBits==('\x1A','\x01')):  #Text Presentation
+            elif(idBits==('\x17','\x01')):  #Text Presentation
                 presentationFlags = struct.unpack(">H",record[2]+record[3])[0]
                 font = (presentationFlags&0x0030)>>4   ##these flags are a bit sketchy
-                verticalFlags = (presentationFlags&0x000C)
+                verticalFlags = (presentationFlags&0x000C)>>2
                 horizontalFlags = (presentationFlags&0x0003)
                 thisText.presentationFlags=(font,verticalFlags,horizontalFlags)
                 if(self.debugToTerminal==1):
@@ -640,181 +646,193 @@ class Gds2reader:
             print "There was an error parsing the GDS header.  Aborting..."
             
     def loadFromFile(self, fileName):
-        self.fileHandle = open(fileName,"rb")
-        self.readGds2()
-        self.fileHandle.close()
-        self.layoutObject.initialize()
+        if(self.debugToTerminal==1):
+            #the record by record reader reports each record as it goes
+            self.fileHandle = open(fileName,"rb")
+            self.readGds2()
+            self.fileHandle.close()
+            self.layoutObject.initialize()
+        else:
+            #imported here, the library is built on top of this reader
+            from gdsLibrary import openLibrary
+            openLibrary(fileName).loadInto(self.layoutObject)
 
 ##############################################
+## Buffered reader: the whole stream is held in memory and every record
+## is decoded in place with precompiled struct objects.
 
-    def findStruct(self,fileName,findStructName):
-	#print"find struct"
-        self.fileHandle = open(fileName,"rb")
-	self.debugToTerminal=0
-        if(self.readHeader()):  #did the header read ok?
-            record = self.findStruct_readNextStruct(findStructName)
-            while(record == 1):
-                record = self.findStruct_readNextStruct(findStructName)
-            #now we have fallen out of the while, which means we are out of structures
-            #so test for end of library
-        else:
-            print "There was an error parsing the GDS header.  Aborting..."
-	self.fileHandle.close()
-	#print "End the search of",findStructName
-        #self.layoutObject.initialize()
-	return record
+    def readBuffer(self, fileName):
+        fileHandle = open(fileName,"rb")
+        data = fileHandle.read()
+        fileHandle.close()
+        return data
 
-    def findStruct_readNextStruct(self,findStructName):
-	self.debugToTerminal=0
-        thisStructure = GdsStructure()        
-        record = self.readNextRecord()
-        idBits = (record[0],record[1])
-        if(idBits==('\x05','\x02') and len(record)==26):
-            createYear = struct.unpack(">h",record[2]+record[3])[0]            
-            createMonth = struct.unpack(">h",record[4]+record[5])[0]
-            createDay = struct.unpack(">h",record[6]+record[7])[0]
-            createHour = struct.unpack(">h",record[8]+record[9])[0]
-            createMinute = struct.unpack(">h",record[10]+record[11])[0]
-            createSecond = struct.unpack(">h",record[12]+record[13])[0]
-            modYear = struct.unpack(">h",record[14]+record[15])[0]
-            modMonth = struct.unpack(">h",record[16]+record[17])[0]
-            modDay = struct.unpack(">h",record[18]+record[19])[0]
-            modHour = struct.unpack(">h",record[20]+record[21])[0]
-            modMinute = struct.unpack(">h",record[22]+record[23])[0]
-            modSecond = struct.unpack(">h",record[24]+record[25])[0]
-            thisStructure.createDate=(createYear,createMonth,createDay,createHour,createMinute,createSecond)
-            thisStructure.modDate=(modYear,modMonth,modDay,modHour,modMinute,modSecond)
-        else:
-            #means we have hit the last structure, so return the record
-            #to whoever called us to do something with it
-            return record
-	wantedStruct=0
+    def readBufferHeader(self, data, position=0):
+        """Parse the library header and return the position of the first structure"""
+        self.layoutObject.info.clear()
+        (recordLength,recordType,dataType) = self.recordHeader.unpack_from(data, position)
+        if(recordType!=0x00 or recordLength!=6):
+            return -1
+        self.layoutObject.info["gdsVersion"]=self.short.unpack_from(data, position+4)[0]
+        position += recordLength
+        #read records until we hit the UNITS section... this is the last part of the header
+        while position < len(data):
+            (recordLength,recordType,dataType) = self.recordHeader.unpack_from(data, position)
+            record = data[position+2:position+recordLength]
+            position += recordLength
+            if(recordType==0x01 and recordLength==28):  #Modified Date
+                self.layoutObject.info["dates"]=self.dateFields.unpack_from(record, 2)
+            elif(recordType==0x02):  #LibraryName
+                self.layoutObject.info["libraryName"]=record[2::]
+            elif(recordType==0x1F):  #reference libraries
+                self.layoutObject.info["referenceLibraries"]=(record[2:46],record[47:91])
+            elif(recordType==0x20):  #fonts
+                self.layoutObject.info["fonts"]=(record[2:45],record[46:89],record[90:133],record[134:177])
+            elif(recordType==0x23):  #attribute table
+                self.layoutObject.info["attributeTable"]=record[2:45]
+            elif(recordType==0x22):  #generations
+                self.layoutObject.info["generations"]=self.short.unpack_from(record, 2)
+            elif(recordType==0x36):  #format
+                self.layoutObject.info["fileFormat"]=self.short.unpack_from(record, 2)
+            elif(recordType==0x37):  #mask
+                self.layoutObject.info["mask"]=record[2::]
+            elif(recordType==0x03):  #Units
+                userUnits=self.ieeeDoubleFromIbmData(record[2:10])
+                dbUnits=self.ieeeDoubleFromIbmData(record[10:18])
+                self.layoutObject.info["units"] = (userUnits,dbUnits)
+                return position
+        return -1
+
+    def readBufferStructure(self, data, position):
+        """Parse the structure starting at position, return it and the position after ENDSTR"""
+        (recordLength,recordType,dataType) = self.recordHeader.unpack_from(data, position)
+        if(recordType!=0x05 or recordLength!=28):
+            #means we have hit the last structure
+            return (None,position)
+        thisStructure = GdsStructure()
+        dates = self.dateFields.unpack_from(data, position+4)
+        thisStructure.createDate=dates[0:6]
+        thisStructure.modDate=dates[6:12]
+        position += recordLength
+        #hoist the decoders, this loop sees every record of the structure
+        recordHeader = self.recordHeader.unpack_from
+        short = self.short.unpack_from
+        integer = self.integer.unpack_from
+        xyDecoders = self.xyDecoders
+        layerNumbersInUse = self.layoutObject.layerNumbersInUse
+        element = None
         while 1:
-            record = self.readNextRecord()
-            idBits = (record[0],record[1])
-            if idBits==('\x07','\x00'): break; #we've reached the end of the structure
-            elif(idBits==('\x06','\x06')):
-                structName = self.stripNonASCII(record[2::]) #(record[2:1] + record[1::]).rstrip()
-#		print ''.[x for x in structName if ord(x) < 128]
-#	        stripped = (c for c in structName if 0 < ord(c) < 127)
-#	        structName = "".join(stripped)
-#                print self.stripNonASCII(structName) ##FIXME: trimming by Tom g.  ##could be an issue here with string trimming!
-                thisStructure.name = structName
-		if(findStructName==thisStructure.name):
-			wantedStruct=1
-                if(self.debugToTerminal==1):
-                    print "\tStructure Name: "+structName
-            elif(idBits==('\x08','\x00')):
-                thisStructure.boundaries+=[self.readBoundary()]
-            elif(idBits==('\x09','\x00')):
-                thisStructure.paths+=[self.readPath()]
-            elif(idBits==('\x0A','\x00')):
-                thisStructure.srefs+=[self.readSref()]
-            elif(idBits==('\x0B','\x00')):
-                thisStructure.arefs+=[self.readAref()]
-            elif(idBits==('\x0C','\x00')):
-                thisStructure.texts+=[self.readText()]
-            elif(idBits==('\x15','\x00')):
-                thisStructure.nodes+=[self.readNode()]
-            elif(idBits==('\x2E','\x02')):
-                thisStructure.boxes+=[self.readBox()]
-        if(self.debugToTerminal==1):        
-            print "\tEnd of Structure."
-        self.layoutObject.structures[structName]=thisStructure #add this structure to the layout object
-	if(wantedStruct == 0):
-		return 1
-	else:
-		#print "\tDone with collectting bound. Return"
-		return [0,thisStructure.boundaries]
+            (recordLength,recordType,dataType) = recordHeader(data, position)
+            if(recordType==0x10):  #XY Data Points
+                count = (recordLength-4)>>2
+                decoder = xyDecoders.get(count)
+                if decoder == None:
+                    decoder = struct.Struct(">%di"%count)
+                    xyDecoders[count] = decoder
+                values = iter(decoder.unpack_from(data, position+4))
+                element.coordinates=zip(values,values)
+            elif(recordType==0x0D):  #Layer
+                drawingLayer = short(data, position+4)[0]
+                element.drawingLayer=drawingLayer
+                if drawingLayer not in layerNumbersInUse:
+                    layerNumbersInUse.append(drawingLayer)
+            elif(recordType==0x0E):  #DataType
+                element.dataType=short(data, position+4)[0]
+            elif(recordType==0x11):  #End Of Element
+                element = None
+            elif(recordType==0x08):  #Boundary
+                element=GdsBoundary()
+                thisStructure.boundaries.append(element)
+            elif(recordType==0x16):  #Purpose
+                element.purposeLayer=short(data, position+4)[0]
+            elif(recordType==0x0A):  #Structure Reference
+                element=GdsSref()
+                thisStructure.srefs.append(element)
+            elif(recordType==0x12):  #Reference Name
+                if isinstance(element,GdsSref):
+                    element.sName=self.stripNonASCII(data[position+4:position+recordLength]).rstrip()
+                else:
+                    element.aName=self.stripNonASCII(data[position+4:position+recordLength]).rstrip()
+            elif(recordType==0x13):  #Columns and Rows
+                (element.columns,element.rows)=self.columnsRows.unpack_from(data, position+4)
+            elif(recordType==0x1A):  #Transformation
+                transFlags = self.unsignedShort.unpack_from(data, position+4)[0]
+                element.transFlags=(bool(transFlags&0x8000),bool(transFlags&0x0002),bool(transFlags&0x0004))
+            elif(recordType==0x1B):  #Magnify
+                element.magFactor=self.ieeeDoubleFromIbmData(data[position+4:position+12])
+            elif(recordType==0x1C):  #Rotate Angle
+                element.rotateAngle=self.ieeeDoubleFromIbmData(data[position+4:position+12])
+            elif(recordType==0x0C):  #Text
+                element=GdsText()
+                thisStructure.texts.append(element)
+            elif(recordType==0x17):  #Text Presentation
+                presentationFlags = self.unsignedShort.unpack_from(data, position+4)[0]
+                element.presentationFlags=((presentationFlags&0x0030)>>4,(presentationFlags&0x000C)>>2,presentationFlags&0x0003)
+            elif(recordType==0x19):  #Text String
+                element.textString=data[position+4:position+recordLength]
+            elif(recordType==0x09):  #Path
+                element=GdsPath()
+                thisStructure.paths.append(element)
+            elif(recordType==0x21):  #Path type
+                element.pathType=short(data, position+4)[0]
+            elif(recordType==0x0F):  #Path width
+                element.pathWidth=integer(data, position+4)[0]
+            elif(recordType==0x0B):  #Array Reference
+                element=GdsAref()
+                thisStructure.arefs.append(element)
+            elif(recordType==0x15):  #Node
+                element=GdsNode()
+                thisStructure.nodes.append(element)
+            elif(recordType==0x2A):  #Node Type
+                element.nodeType=short(data, position+4)[0]
+            elif(recordType==0x2D):  #Box
+                element=GdsBox()
+                thisStructure.boxes.append(element)
+            elif(recordType==0x2E):  #Box Type
+                element.boxValue=short(data, position+4)[0]
+            elif(recordType==0x26):  #ELFLAGS
+                element.elementFlags=short(data, position+4)[0]
+            elif(recordType==0x2F):  #PLEX
+                element.plex=integer(data, position+4)[0]
+            elif(recordType==0x06):  #Structure Name
+                thisStructure.name = self.stripNonASCII(data[position+4:position+recordLength])
+            elif(recordType==0x07):  #we've reached the end of the structure
+                break
+            position += recordLength
+        #references carry a single point, arrays keep their three lattice points
+        for thisSref in thisStructure.srefs:
+            if(thisSref.coordinates!=""):
+                thisSref.coordinates=thisSref.coordinates[0]
+        return (thisStructure,position+recordLength)
 
-    def findLabel(self,fileName,findLabelName):
-	#print"find Label"
-        self.fileHandle = open(fileName,"rb")
-	self.debugToTerminal=0
-        if(self.readHeader()):  #did the header read ok?
-            record = self.findLabel_readNextStruct(findLabelName)
-            while(record == 1):
-                record = self.findLabel_readNextStruct(findLabelName)
-            #now we have fallen out of the while, which means we are out of structures
-            #so test for end of library
-        else:
+    def readGds2Buffer(self, data):
+        position = self.readBufferHeader(data)
+        if(position<0):
             print "There was an error parsing the GDS header.  Aborting..."
-	self.fileHandle.close()
-	#print "End the search of",findStructName
-        #self.layoutObject.initialize()
-	return record
-
-    def findLabel_readNextStruct(self,findLabelName):
-	self.debugToTerminal=0
-        thisStructure = GdsStructure()        
-        record = self.readNextRecord()
-        idBits = (record[0],record[1])
-        if(idBits==('\x05','\x02') and len(record)==26):
-            createYear = struct.unpack(">h",record[2]+record[3])[0]            
-            createMonth = struct.unpack(">h",record[4]+record[5])[0]
-            createDay = struct.unpack(">h",record[6]+record[7])[0]
-            createHour = struct.unpack(">h",record[8]+record[9])[0]
-            createMinute = struct.unpack(">h",record[10]+record[11])[0]
-            createSecond = struct.unpack(">h",record[12]+record[13])[0]
-            modYear = struct.unpack(">h",record[14]+record[15])[0]
-            modMonth = struct.unpack(">h",record[16]+record[17])[0]
-            modDay = struct.unpack(">h",record[18]+record[19])[0]
-            modHour = struct.unpack(">h",record[20]+record[21])[0]
-            modMinute = struct.unpack(">h",record[22]+record[23])[0]
-            modSecond = struct.unpack(">h",record[24]+record[25])[0]
-            thisStructure.createDate=(createYear,createMonth,createDay,createHour,createMinute,createSecond)
-            thisStructure.modDate=(modYear,modMonth,modDay,modHour,modMinute,modSecond)
-        else:
-            #means we have hit the last structure, so return the record
-            #to whoever called us to do something with it
-            return record
-	wantedLabel=0
-	wantedtexts=[GdsText()]
+            return
         while 1:
-            record = self.readNextRecord()
-            idBits = (record[0],record[1])
-            if idBits==('\x07','\x00'): break; #we've reached the end of the structure
-            elif(idBits==('\x06','\x06')):
-                structName = self.stripNonASCII(record[2::]) #(record[2:1] + record[1::]).rstrip()
-#		print ''.[x for x in structName if ord(x) < 128]
-#	        stripped = (c for c in structName if 0 < ord(c) < 127)
-#	        structName = "".join(stripped)
-#                print self.stripNonASCIIx(structName) ##FIXME: trimming by Tom g.  ##could be an issue here with string trimming!
-                thisStructure.name = structName
-                if(self.debugToTerminal==1):
-                    print "\tStructure Name: "+structName
-            elif(idBits==('\x08','\x00')):
-                thisStructure.boundaries+=[self.readBoundary()]
-            elif(idBits==('\x09','\x00')):
-                thisStructure.paths+=[self.readPath()]
-            elif(idBits==('\x0A','\x00')):
-                thisStructure.srefs+=[self.readSref()]
-            elif(idBits==('\x0B','\x00')):
-                thisStructure.arefs+=[self.readAref()]
-            elif(idBits==('\x0C','\x00')):
-		label=self.readText()
-		#Be careful: label.textString contains one space string in it. Delete that one before use it
-		if( findLabelName == label.textString[0:(len(label.textString)-1)] ):
-			wantedLabel=1
-			# BINWU: Cleanup
-			#print"Find the Label",findLabelName
-			wantedtexts+=[label]
-                thisStructure.texts+=[label]
-		if(self.debugToTerminal == 1):
-			print label.textString[0:(len(label.textString)-1)],findLabelName,( findLabelName == label.textString[0:(len(label.textString)-1)] )
-			# BINWU: Cleanup
-			#print thisStructure.name				
-			#print thisStructure.texts		
-            elif(idBits==('\x15','\x00')):
-                thisStructure.nodes+=[self.readNode()]
-            elif(idBits==('\x2E','\x02')):
-                thisStructure.boxes+=[self.readBox()]
-        if(self.debugToTerminal==1):        
-            print "\tEnd of Structure."
-        self.layoutObject.structures[structName]=thisStructure #add this structure to the layout object
-	if(wantedLabel == 0):
-		return 1
-	else:
-		#print "\tDone with collectting bound. Return"
-		return [0,wantedtexts]
+            (thisStructure,position) = self.readBufferStructure(data, position)
+            if thisStructure == None:
+                break
+            self.layoutObject.structures[thisStructure.name]=thisStructure #add this structure to the layout object
+        #now we are out of structures, so test for end of library
+        if(data[position+2:position+4]!='\x04\x00'):
+            print "There was an error reading the structure list."
+
+##############################################
+
+    def findStruct(self,fileName,findStructName):
+        #imported here, the library is built on top of this reader
+        from gdsLibrary import openLibrary
+        thisStructure = openLibrary(fileName).findStruct(findStructName,self.layoutObject)
+        if thisStructure == None:
+            return '\x04\x00'  #the end of library record, nothing matched
+        return [0,thisStructure.boundaries]
 
+    def findLabel(self,fileName,findLabelName):
+        #imported here, the library is built on top of this reader
+        from gdsLibrary import openLibrary
+        wantedtexts = openLibrary(fileName).findLabel(findLabelName,self.layoutObject)
+        if len(wantedtexts) == 0:
+            return '\x04\x00'  #the end of library record, nothing matched
+        return [0,[GdsText()]+wantedtexts]
@@ -5,11 +5,27 @@ from gdsPrimitives import *
 class Gds2writer:
     """Class to take a populated layout class and write it to a file in GDSII format"""
     ## Based on info from http://www.rulabinsky.com/cavd/text/chapc.html
+    #precompiled encoders shared by every writer, records lead with their length and id
+    recordLength = struct.Struct(">H")
+    recordId = struct.Struct(">HH")
+    shortRecord = struct.Struct(">HHh")
+    integerRecord = struct.Struct(">HHi")
+    flagsRecord = struct.Struct(">HHH")
+    dateRecord = struct.Struct(">HH12h")
+    columnsRowsRecord = struct.Struct(">HHhh")
+    #bulk XY encoders, keyed by the number of 4 byte integers in the record
+    xyEncoders = {}
     
-    def __init__(self,layoutObject):
+    def __init__(self,layoutObject,bufferSize=1<<20):
         self.fileHandle = 0
         self.layoutObject = layoutObject
         self.debugToTerminal=0  #do we dump debug data to the screen
+        #whole structures are assembled here and written once bufferSize bytes have piled up
+        #a bufferSize of 0 writes every structure as soon as it is assembled
+        self.bufferSize = bufferSize
+        self.buffer = bytearray()
+        #structure name -> name of the identical structure written in its place
+        self.structureNames = dict()
         
     def print64AsBinary(self,number):
         #debugging method for binary inspection
@@ -93,8 +109,36 @@ class Gds2writer:
         
     def writeRecord(self,record):
         recordLength = len(record)+2  #make sure to include this in the length
-        recordLengthAscii=struct.pack(">h",recordLength)
-        self.fileHandle.write(recordLengthAscii+record)
+        self.buffer += self.recordLength.pack(recordLength)
+        self.buffer += record
+
+    def flush(self):
+        #hand everything collected so far to the file in one write
+        self.fileHandle.write(self.buffer)
+        del self.buffer[:]
+
+    def xyRecord(self,coordinates):
+        #pack a whole list of points into one XY record
+        count = 2*len(coordinates)
+        encoder = self.xyEncoders.get(count)
+        if encoder == None:
+            encoder = struct.Struct(">HH%di"%count)
+            self.xyEncoders[count] = encoder
+        return encoder.pack(4*count+4,0x1003,*[value for coordinate in coordinates for value in coordinate[0:2]])
+
+    def transFlagsRecord(self,transFlags,magnifyFlag):
+        mirrorFlag = int(transFlags[0])<<15
+        rotateFlag = int(transFlags[1])<<1
+        return self.flagsRecord.pack(6,0x1A01,mirrorFlag|rotateFlag|(int(magnifyFlag)<<3))
+
+    def doubleRecord(self,recordId,value):
+        return self.recordId.pack(12,recordId)+self.ibmDataFromIeeeDouble(value)
+
+    def nameRecord(self,recordId,name):
+        ##caveat: the name needs to be an EVEN number of characters
+        if (len(name) % 2 != 0):
+            name = name+"\0"
+        return self.recordId.pack(len(name)+4,recordId)+name
 
     def writeHeader(self):
         ##  Header
@@ -186,339 +230,151 @@ class Gds2writer:
         return 1
     
     def writeBoundary(self,thisBoundary):
-        idBits = '\x08\x00'  #record Type
-        self.writeRecord(idBits)
+        buffer = self.buffer
+        buffer += '\x00\x04\x08\x00'  #record Type
         if(thisBoundary.elementFlags!=""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisBoundary.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisBoundary.elementFlags)  #ELFLAGS
         if(thisBoundary.plex!=""):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisBoundary.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisBoundary.plex)  #PLEX
         if(thisBoundary.drawingLayer!=""):
-            idBits='\x0D\x02' #drawig layer
-            drawingLayer = struct.pack(">h",thisBoundary.drawingLayer)
-            self.writeRecord(idBits+drawingLayer)
+            buffer += self.shortRecord.pack(6,0x0D02,thisBoundary.drawingLayer)  #drawing layer
         if(thisBoundary.purposeLayer):
-            idBits='\x16\x02' #purpose layer
-            purposeLayer = struct.pack(">h",thisBoundary.purposeLayer)
-            self.writeRecord(idBits+purposeLayer)
+            buffer += self.shortRecord.pack(6,0x1602,thisBoundary.purposeLayer)  #purpose layer
         if(thisBoundary.dataType!=""):
-            idBits='\x0E\x02'#DataType
-            dataType = struct.pack(">h",thisBoundary.dataType)
-            self.writeRecord(idBits+dataType)
+            buffer += self.shortRecord.pack(6,0x0E02,thisBoundary.dataType)  #DataType
         if(thisBoundary.coordinates!=""):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisBoundary.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-    
+            buffer += self.xyRecord(thisBoundary.coordinates)  #XY Data Points
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
     def writePath(self,thisPath):  #writes out a path structure
-        idBits = '\x09\x00'  #record Type
-        self.writeRecord(idBits)
+        buffer = self.buffer
+        buffer += '\x00\x04\x09\x00'  #record Type
         if(thisPath.elementFlags != ""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisPath.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisPath.elementFlags)  #ELFLAGS
         if(thisPath.plex!=""):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisPath.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisPath.plex)  #PLEX
         if(thisPath.drawingLayer):
-            idBits='\x0D\x02' #drawig layer
-            drawingLayer = struct.pack(">h",thisPath.drawingLayer)
-            self.writeRecord(idBits+drawingLayer)
+            buffer += self.shortRecord.pack(6,0x0D02,thisPath.drawingLayer)  #drawing layer
         if(thisPath.purposeLayer):
-            idBits='\x16\x02' #purpose layer
-            purposeLayer = struct.pack(">h",thisPath.purposeLayer)
-            self.writeRecord(idBits+purposeLayer)
+            buffer += self.shortRecord.pack(6,0x1602,thisPath.purposeLayer)  #purpose layer
         if(thisPath.pathType):
-            idBits='\x21\x02'  #Path type
-            pathType = struct.pack(">h",thisPath.pathType)
-            self.writeRecord(idBits+pathType)
+            buffer += self.shortRecord.pack(6,0x2102,thisPath.pathType)  #Path type
         if(thisPath.pathWidth):
-            idBits='\x0F\x03'
-            pathWidth = struct.pack(">i",thisPath.pathWidth)
-            self.writeRecord(idBits+pathWidth)
+            buffer += self.integerRecord.pack(8,0x0F03,thisPath.pathWidth)  #Path width
         if(thisPath.coordinates):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisPath.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-    
-    def writeSref(self,thisSref):  #reads in a reference to another structure
-        idBits = '\x0A\x00'  #record Type
-        self.writeRecord(idBits)
+            buffer += self.xyRecord(thisPath.coordinates)  #XY Data Points
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
+    def writeSref(self,thisSref):  #writes out a reference to another structure
+        buffer = self.buffer
+        buffer += '\x00\x04\x0A\x00'  #record Type
         if(thisSref.elementFlags != ""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisSref.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisSref.elementFlags)  #ELFLAGS
         if(thisSref.plex!=""):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisSref.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisSref.plex)  #PLEX
         if(thisSref.sName!=""):
-            idBits='\x12\x06'
-            if (len(thisSref.sName) % 2 != 0):
-                sName = thisSref.sName+"\0"
-            else:
-                sName = thisSref.sName
-            self.writeRecord(idBits+sName)
+            buffer += self.nameRecord(0x1206,self.structureNames.get(thisSref.sName,thisSref.sName))
         if(thisSref.transFlags!=""):
-            idBits='\x1A\x01'
-            mirrorFlag = int(thisSref.transFlags[0])<<15
-            rotateFlag = int(thisSref.transFlags[1])<<1
-            magnifyFlag = int(thisSref.transFlags[2])<<3
-            transFlags = struct.pack(">H",mirrorFlag|rotateFlag|magnifyFlag)
-            self.writeRecord(idBits+transFlags)
+            buffer += self.transFlagsRecord(thisSref.transFlags,thisSref.transFlags[2])
         if(thisSref.magFactor!=""):
-            idBits='\x1B\x05'
-            magFactor=self.ibmDataFromIeeeDouble(thisSref.magFactor)
-            self.writeRecord(idBits+magFactor)
+            buffer += self.doubleRecord(0x1B05,thisSref.magFactor)
         if(thisSref.rotateAngle!=""):
-            idBits='\x1C\x05'            
-            rotateAngle=self.ibmDataFromIeeeDouble(thisSref.rotateAngle)
-            self.writeRecord(idBits+rotateAngle)
+            buffer += self.doubleRecord(0x1C05,thisSref.rotateAngle)
         if(thisSref.coordinates!=""):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            coordinate = thisSref.coordinates
-            x=struct.pack(">i",coordinate[0])
-            y=struct.pack(">i",coordinate[1])
-            coordinateRecord+=x
-            coordinateRecord+=y
-	    #print thisSref.coordinates
-            self.writeRecord(coordinateRecord)
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-    
+            buffer += self.xyRecord([thisSref.coordinates])  #XY Data Points
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
     def writeAref(self,thisAref):  #an array of references
-        idBits = '\x0B\x00'  #record Type
-        self.writeRecord(idBits)
+        buffer = self.buffer
+        buffer += '\x00\x04\x0B\x00'  #record Type
         if(thisAref.elementFlags!=""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisAref.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisAref.elementFlags)  #ELFLAGS
         if(thisAref.plex):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisAref.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisAref.plex)  #PLEX
         if(thisAref.aName):
-            idBits='\x12\x06'
-            if (len(thisAref.aName) % 2 != 0):
-                aName = thisAref.aName+"\0"
-            else:
-                aName = thisAref.aName
-            self.writeRecord(idBits+aName)
+            buffer += self.nameRecord(0x1206,self.structureNames.get(thisAref.aName,thisAref.aName))
         if(thisAref.transFlags):
-            idBits='\x1A\x01'
-            mirrorFlag = int(thisAref.transFlags[0])<<15
-            rotateFlag = int(thisAref.transFlags[1])<<1
-            magnifyFlag = int(thisAref.transFlags[0])<<3
-            transFlags = struct.pack(">H",mirrorFlag|rotateFlag|magnifyFlag)
-            self.writeRecord(idBits+transFlags)
+            buffer += self.transFlagsRecord(thisAref.transFlags,thisAref.transFlags[2])
         if(thisAref.magFactor):
-            idBits='\x1B\x05'
-            magFactor=self.ibmDataFromIeeeDouble(thisAref.magFactor)
-            self.writeRecord(idBits+magFactor)
+            buffer += self.doubleRecord(0x1B05,thisAref.magFactor)
         if(thisAref.rotateAngle):
-            idBits='\x1C\x05'            
-            rotateAngle=self.ibmDataFromIeeeDouble(thisAref.rotateAngle)
-            self.writeRecord(idBits+rotateAngle)
+            buffer += self.doubleRecord(0x1C05,thisAref.rotateAngle)
+        if(thisAref.columns!=""):
+            buffer += self.columnsRowsRecord.pack(8,0x1302,thisAref.columns,thisAref.rows)  #COLROW
         if(thisAref.coordinates):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisAref.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-    
+            buffer += self.xyRecord(thisAref.coordinates)  #XY Data Points
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
     def writeText(self,thisText):
-        idBits = '\x0C\x00'  #record Type
-        self.writeRecord(idBits)
+        buffer = self.buffer
+        buffer += '\x00\x04\x0C\x00'  #record Type
         if(thisText.elementFlags!=""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisText.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisText.elementFlags)  #ELFLAGS
         if(thisText.plex !=""):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisText.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisText.plex)  #PLEX
         if(thisText.drawingLayer != ""):
-            idBits='\x0D\x02' #drawing layer
-            drawingLayer = struct.pack(">h",thisText.drawingLayer)
-            self.writeRecord(idBits+drawingLayer)
-        #if(thisText.purposeLayer):
-	    idBits='\x16\x02' #purpose layer
-            purposeLayer = struct.pack(">h",thisText.purposeLayer) #changed by SAMIRA
-	    #purposeLayer = struct.pack(">h",thisText.dataType)
-            self.writeRecord(idBits+purposeLayer)
+            buffer += self.shortRecord.pack(6,0x0D02,thisText.drawingLayer)  #drawing layer
+        buffer += self.shortRecord.pack(6,0x1602,thisText.purposeLayer)  #purpose layer, changed by SAMIRA
         if(thisText.transFlags != ""):
-            idBits='\x1A\x01'
-            mirrorFlag = int(thisText.transFlags[0])<<15
-            rotateFlag = int(thisText.transFlags[1])<<1
-            magnifyFlag = int(thisText.transFlags[0])<<3
-            transFlags = struct.pack(">H",mirrorFlag|rotateFlag|magnifyFlag)
-            self.writeRecord(idBits+transFlags)
+            buffer += self.transFlagsRecord(thisText.transFlags,thisText.transFlags[0])
         if(thisText.magFactor != ""):
-            idBits='\x1B\x05'
-            magFactor=self.ibmDataFromIeeeDouble(thisText.magFactor)
-            self.writeRecord(idBits+magFactor)
+            buffer += self.doubleRecord(0x1B05,thisText.magFactor)
         if(thisText.rotateAngle != ""):
-            idBits='\x1C\x05'            
-            rotateAngle=self.ibmDataFromIeeeDouble(thisText.rotateAngle)
-            self.writeRecord(idBits+rotateAngle)
+            buffer += self.doubleRecord(0x1C05,thisText.rotateAngle)
         if(thisText.pathType !=""):
-	    idBits='\x21\x02'  #path type
-            pathType = struct.pack(">h",thisText.pathType)
-            self.writeRecord(idBits+pathType)
+            buffer += self.shortRecord.pack(6,0x2102,thisText.pathType)  #path type
         if(thisText.pathWidth != ""):
-            idBits='\x0F\x03'
-            pathWidth = struct.pack(">i",thisText.pathWidth)
-            self.writeRecord(idBits+pathWidth)
+            buffer += self.integerRecord.pack(8,0x0F03,thisText.pathWidth)  #path width
         if(thisText.presentationFlags!=""):
-            idBits='\x1A\x01'            
             font = thisText.presentationFlags[0]<<4
             verticalFlags = int(thisText.presentationFlags[1])<<2
             horizontalFlags = int(thisText.presentationFlags[2])
-            presentationFlags = struct.pack(">H",font|verticalFlags|horizontalFlags)
-            self.writeRecord(idBits+transFlags)            
+            buffer += self.flagsRecord.pack(6,0x1701,font|verticalFlags|horizontalFlags)  #text presentation
         if(thisText.coordinates!=""):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisText.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
+            buffer += self.xyRecord(thisText.coordinates)  #XY Data Points
         if(thisText.textString):
-            idBits='\x19\x06'
-            textString = thisText.textString
-            self.writeRecord(idBits+textString)
-            
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-    
+            buffer += self.recordId.pack(len(thisText.textString)+4,0x1906)+thisText.textString
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
     def writeNode(self,thisNode):
-        idBits = '\x15\x00'  #record Type
-        self.writeRecord(idBits)
+        buffer = self.buffer
+        buffer += '\x00\x04\x15\x00'  #record Type
         if(thisNode.elementFlags!=""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisNode.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisNode.elementFlags)  #ELFLAGS
         if(thisNode.plex!=""):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisNode.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisNode.plex)  #PLEX
         if(thisNode.drawingLayer!=""):
-            idBits='\x0D\x02' #drawig layer
-            drawingLayer = struct.pack(">h",thisNode.drawingLayer)
-            self.writeRecord(idBits+drawingLayer)            
+            buffer += self.shortRecord.pack(6,0x0D02,thisNode.drawingLayer)  #drawing layer
         if(thisNode.nodeType!=""):
-            idBits='\x2A\x02'
-            nodeType = struct.pack(">h",thisNode.nodeType)
-            self.writeRecord(idBits+nodeType)            
-        if(thisText.coordinates!=""):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisText.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
-        
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-    
+            buffer += self.shortRecord.pack(6,0x2A02,thisNode.nodeType)  #node type
+        if(thisNode.coordinates!=""):
+            buffer += self.xyRecord(thisNode.coordinates)  #XY Data Points
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
     def writeBox(self,thisBox):
-        idBits = '\x2E\x02'  #record Type
-        self.writeRecord(idBits)
+        buffer = self.buffer
+        buffer += '\x00\x04\x2D\x00'  #record Type
         if(thisBox.elementFlags!=""):
-            idBits='\x26\x01' #ELFLAGS
-            elementFlags = struct.pack(">h",thisBox.elementFlags)
-            self.writeRecord(idBits+elementFlags)
+            buffer += self.shortRecord.pack(6,0x2601,thisBox.elementFlags)  #ELFLAGS
         if(thisBox.plex!=""):
-            idBits='\x2F\x03'  #PLEX
-            plex = struct.pack(">i",thisBox.plex)
-            self.writeRecord(idBits+plex)
+            buffer += self.integerRecord.pack(8,0x2F03,thisBox.plex)  #PLEX
         if(thisBox.drawingLayer!=""):
-            idBits='\x0D\x02' #drawig layer
-            drawingLayer = struct.pack(">h",thisBox.drawingLayer)
-            self.writeRecord(idBits+drawingLayer)
+            buffer += self.shortRecord.pack(6,0x0D02,thisBox.drawingLayer)  #drawing layer
         if(thisBox.purposeLayer):
-            idBits='\x16\x02' #purpose layer
-            purposeLayer = struct.pack(">h",thisBox.purposeLayer)
-            self.writeRecord(idBits+purposeLayer)
+            buffer += self.shortRecord.pack(6,0x1602,thisBox.purposeLayer)  #purpose layer
         if(thisBox.boxValue!=""):
-            idBits='\x2D\x00'
-            boxValue = struct.pack(">h",thisBox.boxValue)
-            self.writeRecord(idBits+boxValue)            
+            buffer += self.shortRecord.pack(6,0x2E02,thisBox.boxValue)  #box type
         if(thisBox.coordinates!=""):
-            idBits='\x10\x03' #XY Data Points
-            coordinateRecord = idBits
-            for coordinate in thisBox.coordinates:
-                x=struct.pack(">i",coordinate[0])
-                y=struct.pack(">i",coordinate[1])
-                coordinateRecord+=x
-                coordinateRecord+=y
-            self.writeRecord(coordinateRecord)
-        
-        idBits='\x11\x00' #End Of Element
-        coordinateRecord = idBits
-        self.writeRecord(coordinateRecord)
-            
+            buffer += self.xyRecord(thisBox.coordinates)  #XY Data Points
+        buffer += '\x00\x04\x11\x00'  #End Of Element
+
     def writeNextStructure(self,structureName):
         #first put in the structure head
         thisStructure = self.layoutObject.structures[structureName]
-        idBits='\x05\x02'
-        createYear = struct.pack(">h",thisStructure.createDate[0])
-        createMonth = struct.pack(">h",thisStructure.createDate[1])
-        createDay = struct.pack(">h",thisStructure.createDate[2])
-        createHour = struct.pack(">h",thisStructure.createDate[3])
-        createMinute = struct.pack(">h",thisStructure.createDate[4])
-        createSecond = struct.pack(">h",thisStructure.createDate[5])
-        modYear = struct.pack(">h",thisStructure.modDate[0])
-        modMonth = struct.pack(">h",thisStructure.modDate[1])
-        modDay = struct.pack(">h",thisStructure.modDate[2])
-        modHour = struct.pack(">h",thisStructure.modDate[3])
-        modMinute = struct.pack(">h",thisStructure.modDate[4])
-        modSecond = struct.pack(">h",thisStructure.modDate[5])
-        self.writeRecord(idBits+createYear+createMonth+createDay+createHour+createMinute+createSecond\
-                         +modYear+modMonth+modDay+modHour+modMinute+modSecond)
+        self.buffer += self.dateRecord.pack(28,0x0502,*(tuple(thisStructure.createDate[0:6])+tuple(thisStructure.modDate[0:6])))
         #now the structure name
-        idBits='\x06\x06'
-        ##caveat: the name needs to be an EVEN number of characters
-        if(len(structureName)%2 == 1):
-            #pad with a zero
-            structureName = structureName + '\x00'
-        self.writeRecord(idBits+structureName)
+        self.buffer += self.nameRecord(0x0606,structureName)
         #now go through all the structure elements and write them in
-        
         for boundary in thisStructure.boundaries:
             self.writeBoundary(boundary)
         for path in thisStructure.paths:
@@ -534,18 +390,24 @@ class Gds2writer:
         for box in thisStructure.boxes:
             self.writeBox(box)
         #put in the structure tail
-        idBits='\x07\x00'
-        self.writeRecord(idBits)
-    
+        self.buffer += '\x00\x04\x07\x00'
+        #the whole structure is assembled, write it once enough has piled up
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
     def writeGds2(self):
         self.writeHeader();  #first, put the header in
         #go through each structure in the layout and write it to the file
+        #structures with the same contents are written once and referenced by one name
+        self.structureNames = self.layoutObject.uniqueStructureNames()
         for structureName in self.layoutObject.structures:
-            self.writeNextStructure(structureName)
+            if self.structureNames[structureName] == structureName:
+                self.writeNextStructure(structureName)
         #at the end, put in the END LIB record
         idBits='\x04\x00'
         self.writeRecord(idBits)
-        
+        self.flush()
+
     def writeToFile(self,fileName):
         self.fileHandle = open(fileName,"wb")
         self.writeGds2()
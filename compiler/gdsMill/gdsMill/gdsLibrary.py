@@ -0,0 +1,209 @@
+import os
+import mmap
+import struct
+import marshal
+import hashlib
+from gds2reader import *
+from vlsiLayout import VlsiLayout
+
+class GdsLibrary:
+    """Class to index a GDS file and parse its structures on demand"""
+    ## The file is scanned once for the byte range of every structure, the structures
+    ## it references and the text strings it holds. Only the structures that are
+    ## asked for are ever turned into primitives. The file is memory mapped only
+    ## while it is scanned or parsed.
+    indexVersion = 2
+
+    def __init__(self,fileName,indexFileName=None):
+        ## The index is kept in indexFileName only when one is given: it is read from
+        ## there if it was made for the same file contents, and saved there otherwise.
+        self.fileName = fileName
+        self.indexFileName = indexFileName
+        #structure name -> (first byte, byte after ENDSTR)
+        self.structureRanges = dict()
+        #structure name -> names of the structures it references
+        self.references = dict()
+        #text string -> names of the structures that carry it
+        self.labels = dict()
+        self.headerEnd = -1
+        self.fileDigest = None
+        fileStat = os.stat(fileName)
+        self.fileStamp = (fileStat.st_size,fileStat.st_mtime)
+        data = self.mapFile()
+        try:
+            if self.indexFileName == None:
+                self.buildIndex(data)
+            elif not self.loadIndex(data):
+                self.buildIndex(data)
+                self.saveIndex(data=data)
+        finally:
+            data.close()
+
+    def mapFile(self):
+        """Map the file read only, the mapping is closed by the caller"""
+        fileHandle = open(self.fileName,"rb")
+        try:
+            return mmap.mmap(fileHandle.fileno(),0,access=mmap.ACCESS_READ)
+        finally:
+            fileHandle.close()
+
+    def digest(self,data):
+        """The SHA-1 of the file contents, a saved index is only used for the same contents"""
+        if self.fileDigest == None:
+            self.fileDigest = hashlib.sha1(data).hexdigest()
+        return self.fileDigest
+
+    def buildIndex(self,data):
+        """Walk the record headers once and note where every structure lives"""
+        reader = Gds2reader(VlsiLayout())
+        self.headerEnd = reader.readBufferHeader(data)
+        if self.headerEnd < 0:
+            raise IOError("Unable to parse the GDS header of %s"%self.fileName)
+        recordHeader = reader.recordHeader.unpack_from
+        position = self.headerEnd
+        while position < len(data):
+            (recordLength,recordType,dataType) = recordHeader(data,position)
+            if(recordType==0x05):  #BGNSTR
+                start = position
+                structName = None
+                references = []
+                texts = []
+            elif(recordType==0x06):  #STRNAME
+                structName = reader.stripNonASCII(data[position+4:position+recordLength])
+            elif(recordType==0x12):  #SNAME
+                references.append(reader.stripNonASCII(data[position+4:position+recordLength]).rstrip())
+            elif(recordType==0x19):  #STRING
+                texts.append(data[position+4:position+recordLength])
+            elif(recordType==0x07):  #ENDSTR
+                self.structureRanges[structName] = (start,position+recordLength)
+                self.references[structName] = sorted(set(references))
+                for text in set(texts):
+                    self.labels.setdefault(text,[]).append(structName)
+            elif(recordType==0x04 or recordLength==0):  #ENDLIB
+                break
+            position += recordLength
+
+    def loadIndex(self,data):
+        """Use the saved index if it was made for a file with the same contents"""
+        try:
+            indexFile = open(self.indexFileName,"rb")
+            try:
+                saved = marshal.load(indexFile)
+            finally:
+                indexFile.close()
+            (version,fileSize,fileDigest,headerEnd,structureRanges,references,labels) = saved
+        except (IOError,EOFError,ValueError,TypeError):
+            return False
+        if version != self.indexVersion or fileSize != self.fileStamp[0] or fileDigest != self.digest(data):
+            return False
+        (self.headerEnd,self.structureRanges,self.references,self.labels) = (headerEnd,structureRanges,references,labels)
+        return True
+
+    def saveIndex(self,indexFileName=None,data=None):
+        """Keep the index in a file so the next library of the same contents skips the scan"""
+        if indexFileName == None:
+            indexFileName = self.indexFileName
+        if data == None:
+            data = self.mapFile()
+            try:
+                fileDigest = self.digest(data)
+            finally:
+                data.close()
+        else:
+            fileDigest = self.digest(data)
+        #write to a private name first so other processes never load a partial index
+        tempFileName = "%s.%d"%(indexFileName,os.getpid())
+        try:
+            indexFile = open(tempFileName,"wb")
+            marshal.dump((self.indexVersion,self.fileStamp[0],fileDigest,self.headerEnd,
+                          self.structureRanges,self.references,self.labels),indexFile)
+            indexFile.close()
+            os.rename(tempFileName,indexFileName)
+        except (IOError,OSError):
+            return False
+        return True
+
+    def structureNames(self):
+        return self.structureRanges.keys()
+
+    def hierarchy(self,structureName):
+        """Return the names of a structure and everything below it"""
+        names = []
+        seen = set()
+        pending = [structureName]
+        while pending:
+            name = pending.pop()
+            if name in seen or name not in self.structureRanges:
+                continue
+            seen.add(name)
+            names.append(name)
+            pending.extend(self.references[name])
+        return names
+
+    def readStructure(self,structureName,layoutObject,data):
+        """Parse one structure out of the mapped file into the layout"""
+        reader = Gds2reader(layoutObject)
+        try:
+            (thisStructure,position) = reader.readBufferStructure(data,self.structureRanges[structureName][0])
+        except struct.error:
+            thisStructure = None
+        if thisStructure == None or thisStructure.name != structureName:
+            raise IOError("%s changed since it was indexed"%self.fileName)
+        layoutObject.structures[thisStructure.name] = thisStructure
+        return thisStructure
+
+    def loadInto(self,layoutObject,structureName=None):
+        """Populate a layout with a structure and its hierarchy, or the whole library"""
+        if structureName == None:
+            names = self.structureRanges.keys()
+        elif structureName in self.structureRanges:
+            names = self.hierarchy(structureName)
+        else:
+            raise KeyError("No structure %s in %s"%(structureName,self.fileName))
+        data = self.mapFile()
+        try:
+            Gds2reader(layoutObject).readBufferHeader(data)
+            for name in names:
+                self.readStructure(name,layoutObject,data)
+        finally:
+            data.close()
+        layoutObject.initialize()
+
+    def findStruct(self,findStructName,layoutObject):
+        if findStructName not in self.structureRanges:
+            return None
+        data = self.mapFile()
+        try:
+            return self.readStructure(findStructName,layoutObject,data)
+        finally:
+            data.close()
+
+    def findLabel(self,findLabelName,layoutObject):
+        """Parse the first structure in the file with the label and return its matching texts"""
+        #Be careful: label.textString contains one pad character, drop it before matching
+        structNames = set()
+        for text in self.labels:
+            if findLabelName == text[0:(len(text)-1)]:
+                structNames.update(self.labels[text])
+        if len(structNames) == 0:
+            return []
+        firstStructName = min(structNames,key=lambda name: self.structureRanges[name][0])
+        data = self.mapFile()
+        try:
+            thisStructure = self.readStructure(firstStructName,layoutObject,data)
+        finally:
+            data.close()
+        return [label for label in thisStructure.texts
+                if findLabelName == label.textString[0:(len(label.textString)-1)]]
+
+## The indices of the libraries opened in this process, one for each file
+openLibraries = dict()
+
+def openLibrary(fileName,indexFileName=None):
+    """Return the library of a GDS file, indexing it again only when the file changes"""
+    fileStat = os.stat(fileName)
+    library = openLibraries.get(fileName)
+    if library == None or library.fileStamp != (fileStat.st_size,fileStat.st_mtime):
+        library = GdsLibrary(fileName,indexFileName)
+        openLibraries[fileName] = library
+    return library
@@ -14,9 +14,12 @@ class GdsStructure:
         self.texts=[]
         self.nodes=[]
         self.boxes=[]
+        #orientation -> (number of boundaries, extent of the boundaries), see VlsiLayout.localBoundingBox
+        self.boundingBoxes=dict()
 
-class GdsBoundary:
+class GdsBoundary(object):
     """Class represent a GDS Boundary Object"""
+    __slots__ = ("elementFlags", "plex", "drawingLayer", "purposeLayer", "dataType", "coordinates")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -25,8 +28,9 @@ class GdsBoundary:
         self.dataType=""
         self.coordinates=""
     
-class GdsPath:
+class GdsPath(object):
     """Class represent a GDS Path Object"""
+    __slots__ = ("elementFlags", "plex", "drawingLayer", "purposeLayer", "pathType", "pathWidth", "coordinates")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -112,8 +116,9 @@ class GdsPath:
             lastY = y
         return boundaryEquivalent
 
-class GdsSref:
+class GdsSref(object):
     """Class represent a GDS structure reference Object"""
+    __slots__ = ("elementFlags", "plex", "sName", "transFlags", "magFactor", "rotateAngle", "coordinates")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -123,8 +128,9 @@ class GdsSref:
         self.rotateAngle=""
         self.coordinates=""
 
-class GdsAref:
+class GdsAref(object):
     """Class represent a GDS array reference Object"""
+    __slots__ = ("elementFlags", "plex", "aName", "transFlags", "magFactor", "rotateAngle", "columns", "rows", "coordinates")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -132,10 +138,14 @@ class GdsAref:
         self.transFlags=(False,False,False)
         self.magFactor=""
         self.rotateAngle=""
+        self.columns=""
+        self.rows=""
+        #the first instance, the point columns pitches away and the point rows pitches away
         self.coordinates=""
 
-class GdsText:
+class GdsText(object):
     """Class represent a GDS text Object"""
+    __slots__ = ("elementFlags", "plex", "drawingLayer", "purposeLayer", "transFlags", "magFactor", "rotateAngle", "pathType", "pathWidth", "presentationFlags", "coordinates", "textString", "dataType")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -149,9 +159,11 @@ class GdsText:
         self.presentationFlags=""
         self.coordinates=""
         self.textString = ""
+        self.dataType=""
         
-class GdsNode:
+class GdsNode(object):
     """Class represent a GDS Node Object"""
+    __slots__ = ("elementFlags", "plex", "drawingLayer", "nodeType", "coordinates")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -159,8 +171,9 @@ class GdsNode:
         self.nodeType=""
         self.coordinates=""
         
-class GdsBox:
+class GdsBox(object):
     """Class represent a GDS Box Object"""
+    __slots__ = ("elementFlags", "plex", "drawingLayer", "purposeLayer", "boxValue", "coordinates")
     def __init__(self):
         self.elementFlags=""
         self.plex=""
@@ -0,0 +1,73 @@
+import math
+
+## A transform is the tuple (a,b,c,d,tx,ty) of the affine map
+##     x' = a*x + b*y + tx
+##     y' = c*x + d*y + ty
+## Manhattan rotations and mirrors keep a,b,c,d as the integers 0, 1 and -1,
+## so placing integer database coordinates stays exact.
+
+identityTransform = (1,0,0,1,0,0)
+
+#cosine and sine of the angles that are multiples of 90 degrees
+manhattanRotations = {0:(1,0), 90:(0,1), 180:(-1,0), 270:(0,-1)}
+
+def rotationCosSin(rotateAngle):
+    """Return the (cos,sin) of an angle in degrees, exactly for Manhattan angles"""
+    if rotateAngle == None or rotateAngle == "":
+        return (1,0)
+    rotateAngle = float(rotateAngle)
+    if rotateAngle == int(rotateAngle) and int(rotateAngle)%360 in manhattanRotations:
+        return manhattanRotations[int(rotateAngle)%360]
+    rotateAngle = math.radians(rotateAngle)
+    return (math.cos(rotateAngle),math.sin(rotateAngle))
+
+def srefTransform(rotateAngle=0, transFlags=(0,0,0), coordinates=(0,0)):
+    """Return the transform that places a referenced structure: rotate, then mirror about X, then translate"""
+    (cos,sin) = rotationCosSin(rotateAngle)
+    if transFlags[0]:
+        return (cos,-sin,-sin,-cos,coordinates[0],coordinates[1])
+    return (cos,-sin,sin,cos,coordinates[0],coordinates[1])
+
+def composeTransforms(outer, inner):
+    """Return the transform that applies inner first and then outer"""
+    (a,b,c,d,tx,ty) = outer
+    (e,f,g,h,sx,sy) = inner
+    return (a*e+b*g, a*f+b*h,
+            c*e+d*g, c*f+d*h,
+            a*sx+b*sy+tx, c*sx+d*sy+ty)
+
+def transformPoint(transform, point):
+    (a,b,c,d,tx,ty) = transform
+    return (a*point[0]+b*point[1]+tx, c*point[0]+d*point[1]+ty)
+
+def transformPoints(transform, points):
+    (a,b,c,d,tx,ty) = transform
+    return [(a*x+b*y+tx, c*x+d*y+ty) for (x,y) in points]
+
+def arrayPoints(columns, rows, coordinates):
+    """Return the placement points of an array reference, row by row"""
+    ## coordinates are the first placement, the point columns pitches away
+    ## from it and the point rows pitches away from it
+    if columns == "" or rows == "":
+        return [tuple(coordinates[0])]
+    ((x,y),(columnX,columnY),(rowX,rowY)) = coordinates[0:3]
+    columnStep = (pitchStep(columnX-x,columns),pitchStep(columnY-y,columns))
+    rowStep = (pitchStep(rowX-x,rows),pitchStep(rowY-y,rows))
+    return [(x+column*columnStep[0]+row*rowStep[0],y+column*columnStep[1]+row*rowStep[1])
+            for row in range(rows) for column in range(columns)]
+
+def arrayCorners(columns, rows, coordinates):
+    """Return the placement points at the corners of an array reference"""
+    if columns == "" or rows == "":
+        return [tuple(coordinates[0])]
+    ((x,y),(columnX,columnY),(rowX,rowY)) = coordinates[0:3]
+    lastColumn = (pitchStep(columnX-x,columns)*(columns-1),pitchStep(columnY-y,columns)*(columns-1))
+    lastRow = (pitchStep(rowX-x,rows)*(rows-1),pitchStep(rowY-y,rows)*(rows-1))
+    return [(x,y),(x+lastColumn[0],y+lastColumn[1]),(x+lastRow[0],y+lastRow[1]),
+            (x+lastColumn[0]+lastRow[0],y+lastColumn[1]+lastRow[1])]
+
+def pitchStep(distance, count):
+    #stay in integers when the lattice is on the database grid
+    if distance%count == 0:
+        return distance//count
+    return float(distance)/count
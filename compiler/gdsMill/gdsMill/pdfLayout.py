@@ -1,7 +1,7 @@
 import pyx
 import math
-import mpmath
 from gdsPrimitives import *
+from gdsTransform import *
 import random
 
 class pdfLayout:
@@ -37,18 +37,9 @@ class pdfLayout:
         """
         This helper method will convert coordinates from a UV space to the cartesian XY space
         """
-        xyCoordinates = []
-        #setup a translation matrix
-        tMatrix = mpmath.matrix([[1.0,0.0,origin[0]],[0.0,1.0,origin[1]],[0.0,0.0,1.0]])
-        #and a rotation matrix
-        rMatrix = mpmath.matrix([[uVector[0],vVector[0],0.0],[uVector[1],vVector[1],0.0],[0.0,0.0,1.0]])
-        for coordinate in uvCoordinates:
-            #grab the point in UV space
-            uvPoint = mpmath.matrix([coordinate[0],coordinate[1],1.0])
-            #now rotate and translate it back to XY space
-            xyPoint = rMatrix * uvPoint
-            xyPoint = tMatrix * xyPoint
-            xyCoordinates += [(xyPoint[0],xyPoint[1])]
+        #rotate and translate the points back to XY space
+        transform = (uVector[0],vVector[0],uVector[1],vVector[1],origin[0],origin[1])
+        xyCoordinates = transformPoints(transform,uvCoordinates)
         return xyCoordinates
         
     def drawBoundary(self,boundary,origin,uVector,vVector):
@@ -82,7 +73,7 @@ class pdfLayout:
         #use the layout xyTree and structureList
         #to draw ONLY the geometry in each structure
         #SREFS and AREFS are handled in the tree
-        for element in self.layout.xyTree:
+        for element in self.layout.coordinateMap():
             #each element is (name,offsetTuple,rotate)
             structureToDraw = self.layout.structures[element[0]]
             for boundary in structureToDraw.boundaries:
@@ -1,8 +1,9 @@
 from gdsPrimitives import *
 from datetime import *
-import mpmath
 import gdsPrimitives
+from gdsTransform import *
 import debug
+import hashlib
 
 class VlsiLayout:
     """Class represent a hierarchical layout"""
@@ -15,6 +16,9 @@ class VlsiLayout:
         self.structures=dict()
         self.layerNumbersInUse = []
         self.debug = False
+        #structures that are written under their own name even when another structure
+        #has the same contents, such as the ones a netlist has a subcircuit for
+        self.keepNames = set()
         if name:
             self.rootStructureName=name
             #create the ROOT structure
@@ -54,11 +58,21 @@ class VlsiLayout:
                         #expanded to include srefs / arefs separately.
                         #each structure will have an X,Y,offset, and rotate associated
                         #with it.  Populate via traverseTheHierarchy method.
+        self.xyTreeRoot = None #the root structure the xyTree was populated for
+
+        self.clearQueryIndex()
         
         #temp variables used in delegate functions
         self.tempCoordinates=None
         self.tempPassFail = True
 
+    def clearQueryIndex(self):
+        """Drop the pin and label indices, they are rebuilt by the next query"""
+        #layer -> grid of the rectangles in the xyTree on that layer
+        self.pinIndex = dict()
+        #(root structure, text string -> positions of the root structure texts carrying it)
+        self.labelIndex = None
+
     def rotatedCoordinates(self,coordinatesToRotate,rotateAngle):
         #helper method to rotate a list of coordinates
         angle=math.radians(float(0))
@@ -148,88 +162,72 @@ class VlsiLayout:
                 for sref in self.structures[name].srefs: #go through each reference
                     if sref.sName in structureNames: #and compare to our list
                         structureNames.remove(sref.sName)
+            for aref in self.structures[name].arefs: #arrays reference structures too
+                if aref.aName in structureNames:
+                    structureNames.remove(aref.aName)
         
         self.rootStructureName = structureNames[0]
 
     def traverseTheHierarchy(self, startingStructureName=None, delegateFunction = None, 
-                             transformPath = [], rotateAngle = 0, transFlags = (0,0,0), coordinates = (0,0)):
+                             parentTransform = identityTransform, rotateAngle = 0, transFlags = (0,0,0), coordinates = (0,0)):
         #since this is a recursive function, must deal with the default
         #parameters explicitly        
         if startingStructureName == None:
             startingStructureName = self.rootStructureName            
 
-        #set up the rotation matrix        
-        if(rotateAngle == None or rotateAngle == ""):
-            rotateAngle = 0
-        else:
-            rotateAngle = math.radians(float(rotateAngle))
-        mRotate = mpmath.matrix([[math.cos(rotateAngle),-math.sin(rotateAngle),0.0],
-                                 [math.sin(rotateAngle),math.cos(rotateAngle),0.0],[0.0,0.0,1.0],])
-        #set up the translation matrix
-        translateX = float(coordinates[0])
-        translateY = float(coordinates[1])
-        mTranslate = mpmath.matrix([[1.0,0.0,translateX],[0.0,1.0,translateY],[0.0,0.0,1.0]])
-        #set up the scale matrix (handles mirror X)
-        scaleX = 1.0
-        if(transFlags[0]):
-            scaleY = -1.0
-        else:
-            scaleY = 1.0
-        mScale = mpmath.matrix([[scaleX,0.0,0.0],[0.0,scaleY,0.0],[0.0,0.0,1.0]])
-        
         #we need to keep track of all transforms in the hierarchy
-        #when we add an element to the xy tree, we apply all transforms from the bottom up
-        transformPath += [(mRotate,mScale,mTranslate)]
+        #each level composes its own placement with the transform of its parent,
+        #so the delegate gets the full transform from this structure to the root
+        transform = composeTransforms(parentTransform,
+                                      srefTransform(rotateAngle,transFlags,coordinates))
         if delegateFunction != None:
-            delegateFunction(startingStructureName, transformPath)
+            delegateFunction(startingStructureName, transform)
         #starting with a particular structure, we will recursively traverse the tree
         #********might have to set the recursion level deeper for big layouts!
         if(len(self.structures[startingStructureName].srefs)>0): #does this structure reference any others?
             #if so, go through each and call this function again
             #if not, return back to the caller (caller can be this function)            
             for sref in self.structures[startingStructureName].srefs:
-                #here, we are going to modify the sref coordinates based on the parent objects rotation                
-#                if (sref.sName.count("via") == 0): 
                 self.traverseTheHierarchy(startingStructureName = sref.sName,                                    
                                           delegateFunction = delegateFunction,
-                                          transformPath = transformPath,
+                                          parentTransform = transform,
                                           rotateAngle = sref.rotateAngle,
                                           transFlags = sref.transFlags,
                                           coordinates = sref.coordinates)
-#            else:
-#                print "WARNING: via encountered, ignoring:", sref.sName
-            #MUST HANDLE AREFs HERE AS WELL
-        #when we return, drop the last transform from the transformPath
-        del transformPath[-1]
+        #every element of an array is visited like a reference of its own
+        for aref in self.structures[startingStructureName].arefs:
+            for point in arrayPoints(aref.columns,aref.rows,aref.coordinates):
+                self.traverseTheHierarchy(startingStructureName = aref.aName,
+                                          delegateFunction = delegateFunction,
+                                          parentTransform = transform,
+                                          rotateAngle = aref.rotateAngle,
+                                          transFlags = aref.transFlags,
+                                          coordinates = point)
         return
     
     def initialize(self):
         self.deduceHierarchy()
-        #self.traverseTheHierarchy()
-        self.populateCoordinateMap()    
+        #the xyTree is populated by the first pin query
+        del self.xyTree[:]
+        self.xyTreeRoot = None
+        self.clearQueryIndex()
+
+    def coordinateMap(self):
+        """Return the xyTree of the root structure, populating it if the root changed since"""
+        if self.xyTreeRoot != self.rootStructureName:
+            del self.xyTree[:]
+            self.populateCoordinateMap()
+        return self.xyTree
     
     def populateCoordinateMap(self):
-        def addToXyTree(startingStructureName = None,transformPath = None):
-        #print"populateCoordinateMap"            
-            uVector = mpmath.matrix([1.0,0.0,0.0])  #start with normal basis vectors
-            vVector = mpmath.matrix([0.0,1.0,0.0])
-            origin = mpmath.matrix([0.0,0.0,1.0]) #and an origin (Z component is 1.0 to indicate position instead of vector)
-            #make a copy of all the transforms and reverse it            
-            reverseTransformPath = transformPath[:]
-            if len(reverseTransformPath) > 1:
-                reverseTransformPath.reverse()               
-            #now go through each transform and apply them to our basis and origin in succession
-            for transform in reverseTransformPath:
-                origin = transform[0] * origin  #rotate
-                uVector = transform[0] * uVector  #rotate
-                vVector = transform[0] * vVector  #rotate
-                origin = transform[1] * origin  #scale
-                uVector = transform[1] * uVector  #rotate
-                vVector = transform[1] * vVector  #rotate
-                origin = transform[2] * origin  #translate
-                #we don't need to do a translation on the basis vectors            
-            self.xyTree+=[(startingStructureName,origin,uVector,vVector)]  #populate the xyTree with each
-                                                                            #structureName and coordinate space
+        self.clearQueryIndex()
+        self.xyTreeRoot = self.rootStructureName
+        def addToXyTree(startingStructureName = None,transform = None):
+            #the origin and the images of the normal basis vectors
+            #(Z component is 1 to indicate position instead of vector)
+            (a,b,c,d,tx,ty) = transform
+            self.xyTree+=[(startingStructureName,(tx,ty,1),(a,c,0),(b,d,0))]  #populate the xyTree with each
+                                                                             #structureName and coordinate space
         self.traverseTheHierarchy(delegateFunction = addToXyTree)
         
     def microns(self,userUnits):
@@ -241,11 +239,8 @@ class VlsiLayout:
         
     def userUnits(self,microns):
         """Utility function to convert microns to user units"""
-        userUnit = self.units[1]/self.units[0]
-        #userUnitsPerMicron = userUnit / 1e-6
-        userUnitsPerMicron = userUnit / (userUnit)
-        layoutUnitsPerMicron = userUnitsPerMicron / self.units[0]
-        #print "userUnit:",userUnit,"userUnitsPerMicron",userUnitsPerMicron,"layoutUnitsPerMicron",layoutUnitsPerMicron,[microns,microns*layoutUnitsPerMicron]
+        #units[0] is the size of a database unit in microns
+        layoutUnitsPerMicron = 1.0 / self.units[0]
         return round(microns*layoutUnitsPerMicron,0)
 
     def changeRoot(self,newRoot, create=False):
@@ -265,6 +260,7 @@ class VlsiLayout:
             if ((newRoot not in self.structures) & create):
                 self.newLayout(newRoot)
             self.rootStructureName = newRoot
+            self.clearQueryIndex()
 
 
     
@@ -298,17 +294,7 @@ class VlsiLayout:
         #  otherwise, if it is a text name of an internal structure, use it.
 
         if layoutToAdd != self:
-            #first, we need to combine the structure dictionaries from both layouts
-            for structure in layoutToAdd.structures:
-                if structure not in self.structures:
-                    self.structures[structure]=layoutToAdd.structures[structure]
-            #also combine the "layers in use" list
-            for layerNumber in layoutToAdd.layerNumbersInUse:
-                if layerNumber not in self.layerNumbersInUse:
-                    self.layerNumbersInUse += [layerNumber]
-            #Also, check if the user units / microns is the same as this Layout
-            #if (layoutToAdd.units != self.units):
-            #print "WARNING:  VlsiLayout: Units from design to be added do not match target Layout"
+            StructureName = self.mergeLayout(layoutToAdd).get(StructureName,StructureName)
 
     #   if debug: print "DEBUG: vlsilayout: Using %d layers"
 
@@ -323,10 +309,145 @@ class VlsiLayout:
         layoutToAddSref = GdsSref()
         layoutToAddSref.sName = StructureName
         layoutToAddSref.coordinates = offsetInLayoutUnits
+        self.orientReference(layoutToAddSref,mirror,rotate)
 
+        #add the sref to the root structure
+        self.structures[self.rootStructureName].srefs+=[layoutToAddSref]        
+        self.clearQueryIndex()
+
+    def addArray(self,layoutToAdd,columns,rows,columnPitch,rowPitch,offsetInMicrons=(0,0),mirror=None,rotate=None):
+        """
+        Method to insert a columns by rows array of the root of one layout into another.
+        Every element is placed with the same mirror and rotation and the pitches are in microns.
+        """
+        offsetInLayoutUnits = (self.userUnits(offsetInMicrons[0]),self.userUnits(offsetInMicrons[1]))
+        columnPitchInLayoutUnits = self.userUnits(columnPitch)
+        rowPitchInLayoutUnits = self.userUnits(rowPitch)
+
+        arrayName = layoutToAdd.rootStructureName
+        if layoutToAdd != self:
+            arrayName = self.mergeLayout(layoutToAdd).get(arrayName,arrayName)
+
+        layoutToAddAref = GdsAref()
+        layoutToAddAref.aName = arrayName
+        layoutToAddAref.columns = columns
+        layoutToAddAref.rows = rows
+        #the first element, the point after the last column and the point above the last row
+        layoutToAddAref.coordinates = [offsetInLayoutUnits,
+                                       (offsetInLayoutUnits[0]+columns*columnPitchInLayoutUnits,offsetInLayoutUnits[1]),
+                                       (offsetInLayoutUnits[0],offsetInLayoutUnits[1]+rows*rowPitchInLayoutUnits)]
+        self.orientReference(layoutToAddAref,mirror,rotate)
+
+        #add the aref to the root structure
+        self.structures[self.rootStructureName].arefs+=[layoutToAddAref]
+        self.clearQueryIndex()
+
+    def mergeLayout(self,layoutToAdd):
+        """
+        Method to make the structures of another layout available to this one.
+        A structure whose name is already taken by different contents is added under
+        a new name. Returns the new names, keyed by the names in layoutToAdd.
+        """
+        #first, we need to combine the structure dictionaries from both layouts
+        #children go first so a renamed child is known before its parents are added
+        renames = dict()
+        signatures = dict()
+        if [name for name in layoutToAdd.structures if self.structures.get(name) is not layoutToAdd.structures[name]]:
+            for structureName in layoutToAdd.structureOrder():
+                structure = layoutToAdd.structures[structureName]
+                if any(sref.sName in renames for sref in structure.srefs) or \
+                   any(aref.aName in renames for aref in structure.arefs):
+                    structure = renameReferences(structure,structureName,renames)
+                if structureName not in self.structures:
+                    self.structures[structureName]=structure
+                elif self.structures[structureName] is not structure and \
+                     self.structureSignature(structureName,signatures) != self.structureSignature(structureName,signatures,structure):
+                    index = 1
+                    newName = "{0}_{1}".format(structureName,index)
+                    while newName in self.structures or newName in layoutToAdd.structures:
+                        index += 1
+                        newName = "{0}_{1}".format(structureName,index)
+                    if self.debug:
+                        debug.info(1,"DEBUG:  Structure %s renamed to %s"%(structureName,newName))
+                    renames[structureName] = newName
+                    self.structures[newName] = renameReferences(structure,newName,dict())
+        #also combine the "layers in use" list
+        for layerNumber in layoutToAdd.layerNumbersInUse:
+            if layerNumber not in self.layerNumbersInUse:
+                self.layerNumbersInUse += [layerNumber]
+        #Also, check if the user units / microns is the same as this Layout
+        #if (layoutToAdd.units != self.units):
+        #print "WARNING:  VlsiLayout: Units from design to be added do not match target Layout"
+        return renames
+
+    def structureOrder(self):
+        """
+        Method to list the structures so every structure comes after the structures it references.
+        """
+        order = []
+        visited = set()
+        def visit(structureName):
+            if structureName in visited or structureName not in self.structures:
+                return
+            visited.add(structureName)
+            for sref in self.structures[structureName].srefs:
+                visit(sref.sName)
+            for aref in self.structures[structureName].arefs:
+                visit(aref.aName)
+            order.append(structureName)
+        for structureName in self.structures:
+            visit(structureName)
+        return order
+
+    def structureSignature(self,structureName,signatures,structure=None):
+        """
+        Method to hash everything a structure draws. Structures with the same shapes,
+        labels and references have the same signature whatever they are called.
+        Signatures are remembered in the signatures dictionary.
+        """
+        if structure == None:
+            if structureName in signatures:
+                return signatures[structureName]
+            structure = self.structures[structureName]
+        contents = [sorted(elementSignature(element) for element in elements)
+                    for elements in [structure.boundaries,structure.paths,structure.texts,
+                                     structure.nodes,structure.boxes]]
+        #referenced structures are identified by their own signature, not by their name
+        contents.append(sorted(elementSignature(sref,sName=self.structureSignature(sref.sName,signatures))
+                               for sref in structure.srefs))
+        contents.append(sorted(elementSignature(aref,aName=self.structureSignature(aref.aName,signatures))
+                               for aref in structure.arefs))
+        signature = hashlib.sha1(repr(contents)).hexdigest()
+        if structure is self.structures.get(structureName):
+            signatures[structureName] = signature
+        return signature
+
+    def uniqueStructureNames(self):
+        """
+        Method to map the name of every structure to the name of the first structure with the
+        same contents, so each distinct structure is written once. The root and the structures
+        in keepNames keep their names.
+        """
+        rootName = getattr(self,"rootStructureName",None)
+        signatures = dict()
+        firstNames = dict()
+        names = dict()
+        for structureName in sorted(self.structures, key=lambda name: (name != rootName, name)):
+            signature = self.structureSignature(structureName,signatures)
+            firstName = firstNames.setdefault(signature,structureName)
+            if structureName == rootName or structureName in self.keepNames:
+                names[structureName] = structureName
+            else:
+                names[structureName] = firstName
+        return names
+
+    def orientReference(self,reference,mirror,rotate):
+        """
+        Method to set the mirror and rotation of a structure or array reference.
+        """
         if mirror or rotate:
         ########flags = (mirror around x-axis, absolute rotation, absolute magnification) 
-            layoutToAddSref.transFlags = (False,False,False)
+            reference.transFlags = (False,False,False)
         #Below angles are angular angles(relative), not absolute
             if mirror=="R90":
                 rotate = 90.0
@@ -335,18 +456,15 @@ class VlsiLayout:
             if mirror=="R270":
                 rotate = 270.0
             if rotate:
-                layoutToAddSref.rotateAngle = rotate
+                reference.rotateAngle = rotate
             if mirror == "x" or mirror == "MX":
-                layoutToAddSref.transFlags = (True,False,False)
+                reference.transFlags = (True,False,False)
             if mirror == "y" or mirror == "MY": #NOTE: "MY" option will override specified rotate angle
-                layoutToAddSref.transFlags = (True,False,False)
-                layoutToAddSref.rotateAngle = 180.0
+                reference.transFlags = (True,False,False)
+                reference.rotateAngle = 180.0
             if mirror == "xy" or mirror == "XY": #NOTE: "XY" option will override specified rotate angle
-                layoutToAddSref.transFlags = (False,False,False)
-                layoutToAddSref.rotateAngle = 180.0
-
-        #add the sref to the root structure
-        self.structures[self.rootStructureName].srefs+=[layoutToAddSref]        
+                reference.transFlags = (False,False,False)
+                reference.rotateAngle = 180.0
         
     def addBox(self,layerNumber=0, purposeNumber=0, dataType= None, offsetInMicrons=(0,0), width=1.0, height=1.0,center=False):
         """
@@ -382,6 +500,25 @@ class VlsiLayout:
         boundaryToAdd.purposeLayer = purposeNumber
         #add the sref to the root structure
         self.structures[self.rootStructureName].boundaries+=[boundaryToAdd]
+        self.clearQueryIndex()
+    
+    def addBoxes(self, layerNumber=0, purposeNumber=0, boxes=[]):
+        """
+        Method to add many boxes of one layer to a layout at once.
+        Each box is a (dataType, offsetInMicrons, width, height) tuple.
+        """
+        boundaries = []
+        for (dataType, offsetInMicrons, width, height) in boxes:
+            (x, y) = (self.userUnits(offsetInMicrons[0]), self.userUnits(offsetInMicrons[1]))
+            (right, top) = (x + self.userUnits(width), y + self.userUnits(height))
+            boundaryToAdd = GdsBoundary()
+            boundaryToAdd.drawingLayer = layerNumber
+            boundaryToAdd.dataType = dataType
+            boundaryToAdd.coordinates = [(x,y), (right,y), (right,top), (x,top), (x,y)]
+            boundaryToAdd.purposeLayer = purposeNumber
+            boundaries.append(boundaryToAdd)
+        self.structures[self.rootStructureName].boundaries+=boundaries
+        self.clearQueryIndex()
     
     def addPath(self, layerNumber=0, purposeNumber = 0, coordinates=[(0,0)], width=1.0):
         """
@@ -401,6 +538,7 @@ class VlsiLayout:
         pathToAdd.coordinates=layoutUnitCoordinates
         #add the sref to the root structure
         self.structures[self.rootStructureName].paths+=[pathToAdd]
+        self.clearQueryIndex()
         
     def addText(self, text, layerNumber=0, purposeNumber = 0, dataType = 0, offsetInMicrons=(0,0), magnification=0.1, rotate = None):
 	offsetInLayoutUnits = (self.userUnits(offsetInMicrons[0]),self.userUnits(offsetInMicrons[1]))
@@ -420,6 +558,7 @@ class VlsiLayout:
             textToAdd.rotateAngle = rotate
         #add the sref to the root structure
         self.structures[self.rootStructureName].texts+=[textToAdd]
+        self.clearQueryIndex()
             
     def isBounded(self,testPoint,startPoint,endPoint):
         #these arguments are touples of (x,y) coordinates
@@ -523,15 +662,13 @@ class VlsiLayout:
         passFailRecord = []
 
         print "Filling layer:",layerToFill
-        def isThisBlockOk(startingStructureName,coordinates,rotateAngle=None):
+        def isThisBlockOk(startingStructureName,transform):
             #go through every boundary and check
             for boundary in self.structures[startingStructureName].boundaries:
                 #only test shapes on the same layer
                 if(boundary.drawingLayer == layerToFill):
                     #remap coordinates
-                    shiftedBoundaryCoordinates = []
-                    for shapeCoordinate in boundary.rotatedCoordinates(rotateAngle):
-                        shiftedBoundaryCoordinates+=[(shapeCoordinate[0]+coordinates[0],shapeCoordinate[1]+coordinates[1])]
+                    shiftedBoundaryCoordinates = transformPoints(transform,boundary.coordinates)
                     joint = self.doShapesIntersect(self.tempCoordinates, shiftedBoundaryCoordinates)
                     if joint:
                         self.tempPassFail = False                    
@@ -542,9 +679,7 @@ class VlsiLayout:
                 #only test shapes on the same layer
                 if(path.drawingLayer == layerToFill):
                     #remap coordinates
-                    shiftedBoundaryCoordinates = []
-                    for shapeCoordinate in path.equivalentBoundaryCoordinates(rotateAngle):
-                        shiftedBoundaryCoordinates+=[(shapeCoordinate[0]+coordinates[0],shapeCoordinate[1]+coordinates[1])]
+                    shiftedBoundaryCoordinates = transformPoints(transform,path.equivalentBoundaryCoordinates())
                     joint = self.doShapesIntersect(self.tempCoordinates, shiftedBoundaryCoordinates)
                     if joint:
                         self.tempPassFail = False                    
@@ -595,24 +730,71 @@ class VlsiLayout:
         return cellSizeMicron
 
     def measureSize(self,startStructure):
-        self.rootStructureName=startStructure
-        self.populateCoordinateMap()
-        cellBoundary = [None, None, None, None]
-        for TreeUnit in self.xyTree:
-            cellBoundary=self.measureSizeInStructure(TreeUnit,cellBoundary)
+        cellBoundary = self.measureStructure(startStructure)
         cellSize=[cellBoundary[2]-cellBoundary[0],cellBoundary[3]-cellBoundary[1]]
         cellSizeMicron=[cellSize[0]*self.units[0],cellSize[1]*self.units[0]]
         return cellSizeMicron
 
     def measureBoundary(self,startStructure):
-        self.rootStructureName=startStructure
-        self.populateCoordinateMap()
-        cellBoundary = [None, None, None, None]
-        for TreeUnit in self.xyTree:
-            cellBoundary=self.measureSizeInStructure(TreeUnit,cellBoundary)
+        cellBoundary = self.measureStructure(startStructure)
         return [[self.units[0]*cellBoundary[0],self.units[0]*cellBoundary[1]],
                 [self.units[0]*cellBoundary[2],self.units[0]*cellBoundary[3]]]
-    
+
+    def measureStructure(self,startStructure):
+        """Return the [left,bottom,right,top] extent of a structure in DB units"""
+        #the structure becomes the root, so pin lookups see its hierarchy
+        self.rootStructureName=startStructure
+        cellBoundary = self.structureBoundingBox(startStructure,identityTransform[0:4],dict())
+        if cellBoundary == None:
+            return [None, None, None, None]
+        return list(cellBoundary)
+
+    def structureBoundingBox(self,structureName,linear,visited):
+        """
+        Return the extent of a structure and everything below it, reached through the
+        linear part (a,b,c,d) of a transform, without its translation.
+        Each structure is only measured once per orientation, not once per occurrence.
+        """
+        key = (structureName,linear)
+        if key in visited:
+            return visited[key]
+        structure = self.structures[structureName]
+        box = self.localBoundingBox(structure,linear)
+        (a,b,c,d) = linear
+        references = [(sref.sName,sref,[sref.coordinates]) for sref in structure.srefs]
+        references += [(aref.aName,aref,arrayCorners(aref.columns,aref.rows,aref.coordinates)) for aref in structure.arefs]
+        for (name,reference,points) in references:
+            (e,f,g,h,tx,ty) = srefTransform(reference.rotateAngle,reference.transFlags,(0,0))
+            childBox = self.structureBoundingBox(name,(a*e+b*g,a*f+b*h,c*e+d*g,c*f+d*h),visited)
+            if childBox == None:
+                continue
+            for (x,y) in points:
+                #the placement is moved by the orientation of this structure
+                (dx,dy) = (a*x+b*y,c*x+d*y)
+                box = unionBox(box,(childBox[0]+dx,childBox[1]+dy,childBox[2]+dx,childBox[3]+dy))
+        visited[key] = box
+        return box
+
+    def localBoundingBox(self,structure,linear):
+        """
+        Return the extent of the boundaries of one structure in the given orientation.
+        It is kept on the structure until boundaries are added to it.
+        """
+        cached = structure.boundingBoxes.get(linear)
+        if cached != None and cached[0] == len(structure.boundaries):
+            return cached[1]
+        #same corners and orientation as transformRectangle
+        uVector = (linear[0],linear[2])
+        vVector = (linear[1],linear[3])
+        box = None
+        for boundary in structure.boundaries:
+            left_bottom=boundary.coordinates[0]
+            right_top=boundary.coordinates[2]
+            thisBoundary=self.transformRectangle([left_bottom[0],left_bottom[1],right_top[0],right_top[1]],uVector,vVector)
+            box = unionBox(box,thisBoundary)
+        structure.boundingBoxes[linear] = (len(structure.boundaries),box)
+        return box
+
     def measureSizeInStructure(self,Structure,cellBoundary):
         StructureName=Structure[0]
         StructureOrigin=[Structure[1][0],Structure[1][1]]
@@ -657,13 +839,22 @@ class VlsiLayout:
         label_layer = None
         label_coordinate = [None, None]
 
+        texts = self.structures[self.rootStructureName].texts
+        if self.labelIndex == None or self.labelIndex[0] != self.rootStructureName:
+            labelIndex = dict()
+            for position in range(len(texts)):
+                labelIndex.setdefault(texts[position].textString,[]).append(position)
+            self.labelIndex = (self.rootStructureName,labelIndex)
+        labelIndex = self.labelIndex[1]
+        positions = labelIndex.get(label_name,[]) + labelIndex.get(label_name+"\x00",[])
+
         # Why must this be the last one found? It breaks if we return the first.
-        for Text in self.structures[self.rootStructureName].texts:
-            if Text.textString == label_name or Text.textString == label_name+"\x00":
-                label_layer = Text.drawingLayer
-                label_coordinate = Text.coordinates[0]
-                #CHANGED BY SAMIRA if label_layer!=None:
-                label_list.append((label_coordinate,label_layer))
+        for position in sorted(positions):
+            Text = texts[position]
+            label_layer = Text.drawingLayer
+            label_coordinate = Text.coordinates[0]
+            #CHANGED BY SAMIRA if label_layer!=None:
+            label_list.append((label_coordinate,label_layer))
 
         debug.check(len(label_list)>0,"Did not find labels {0}.".format(label_name))
         return label_list
@@ -764,27 +955,65 @@ class VlsiLayout:
         Given a coordinate, search for enclosing structures on the given layer.
         Return all pin shapes.
         """
-        boundaries = []
-
-        for TreeUnit in self.xyTree:
-            boundaries += self.getPinInStructure(coordinates,layer,TreeUnit)
+        pinIndex = self.getPinIndex(layer)
+        if pinIndex == None:
+            return []
+        (left,bottom,binSize,bins,rectangles) = pinIndex
+        candidates = bins.get((int((coordinates[0]-left)//binSize),int((coordinates[1]-bottom)//binSize)),[])
 
+        # the candidates are in xyTree order, the order a full search would find them
+        boundaries = []
+        for candidate in candidates:
+            if self.labelInRectangle(coordinates,rectangles[candidate]):
+                boundaries.append(list(rectangles[candidate]))
         return boundaries
 
-
-    def getPinInStructure(self,coordinates,layer,structure):
+    def getPinIndex(self,layer):
+        """
+        Return the uniform grid of all the rectangles on a layer, building it on first use.
+        Each rectangle is put in every bin it overlaps so a query only looks at one bin.
+        """
+        xyTree = self.coordinateMap()
+        if layer in self.pinIndex:
+            return self.pinIndex[layer]
+
+        rectangles = []
+        for TreeUnit in xyTree:
+            rectangles += self.getRectanglesInStructure(layer,TreeUnit)
+        if len(rectangles) == 0:
+            self.pinIndex[layer] = None
+            return None
+
+        # labelInRectangle compares against the truncated corners, so bin those
+        corners = [[int(x) for x in rectangle] for rectangle in rectangles]
+        left = min([corner[0] for corner in corners])
+        bottom = min([corner[1] for corner in corners])
+        right = max([corner[2] for corner in corners])
+        top = max([corner[3] for corner in corners])
+        # about one rectangle per bin for evenly spread shapes
+        binsPerSide = int(math.sqrt(len(rectangles)))+1
+        binSize = max(1,(right-left)//binsPerSide+1,(top-bottom)//binsPerSide+1)
+
+        bins = dict()
+        for index in range(len(corners)):
+            corner = corners[index]
+            for xBin in range((corner[0]-left)//binSize,(corner[2]-left)//binSize+1):
+                for yBin in range((corner[1]-bottom)//binSize,(corner[3]-bottom)//binSize+1):
+                    bins.setdefault((xBin,yBin),[]).append(index)
+        self.pinIndex[layer] = (left,bottom,binSize,bins,rectangles)
+        return self.pinIndex[layer]
+
+    def getRectanglesInStructure(self,layer,structure):
         """ 
-        Go through all the shapes in a structure and return the list of shapes
-        that the label coordinates are inside.
+        Return the rectangles on a layer of one xyTree entry in the coordinates of the root.
+        Rectangle is [leftx, bottomy, rightx, topy].
         """
-
-        # check if this is a rectangle
         structureName=structure[0]
         structureOrigin=[structure[1][0],structure[1][1]]
         structureuVector=[structure[2][0],structure[2][1],structure[2][2]]
         structurevVector=[structure[3][0],structure[3][1],structure[3][2]]
 
-        boundaries = []
+        rectangles = []
         
         for boundary in self.structures[str(structureName)].boundaries:
             # Pin enclosures only work on rectangular pins so ignore any non rectangle
@@ -794,15 +1023,23 @@ class VlsiLayout:
             if layer==boundary.drawingLayer:
                 left_bottom=boundary.coordinates[0]
                 right_top=boundary.coordinates[2]
-                # Rectangle is [leftx, bottomy, rightx, topy].
                 boundaryRect=[left_bottom[0],left_bottom[1],right_top[0],right_top[1]]
                 boundaryRect=self.transformRectangle(boundaryRect,structureuVector,structurevVector)
                 boundaryRect=[boundaryRect[0]+structureOrigin[0],boundaryRect[1]+structureOrigin[1],
                               boundaryRect[2]+structureOrigin[0],boundaryRect[3]+structureOrigin[1]]
-
-                if self.labelInRectangle(coordinates,boundaryRect):
-                    boundaries.append(boundaryRect)
+                rectangles.append(boundaryRect)
                     
+        return rectangles
+
+    def getPinInStructure(self,coordinates,layer,structure):
+        """ 
+        Go through all the shapes in a structure and return the list of shapes
+        that the label coordinates are inside.
+        """
+        boundaries = []
+        for boundaryRect in self.getRectanglesInStructure(layer,structure):
+            if self.labelInRectangle(coordinates,boundaryRect):
+                boundaries.append(boundaryRect)
         return boundaries
 
     def transformRectangle(self,orignalRectangle,uVector,vVector):
@@ -810,11 +1047,8 @@ class VlsiLayout:
         Transforms the four coordinates of a rectangle in space
         and recomputes the left, bottom, right, top values.
         """
-        leftBottom=mpmath.matrix([orignalRectangle[0],orignalRectangle[1]])
-        leftBottom=self.transformCoordinate(leftBottom,uVector,vVector)
-
-        rightTop=mpmath.matrix([orignalRectangle[2],orignalRectangle[3]])
-        rightTop=self.transformCoordinate(rightTop,uVector,vVector)
+        leftBottom=self.transformCoordinate(orignalRectangle[0:2],uVector,vVector)
+        rightTop=self.transformCoordinate(orignalRectangle[2:4],uVector,vVector)
 
         left=min(leftBottom[0],rightTop[0])
         bottom=min(leftBottom[1],rightTop[1])
@@ -860,3 +1094,67 @@ def cmpBoundaryAreas(A,B):
 
 
     
+
+def unionBox(A,B):
+    """
+    Returns the smallest rectangle holding both rectangles, either of which may be None.
+    """
+    if A == None:
+        return tuple(B)
+    return (min(A[0],B[0]),min(A[1],B[1]),max(A[2],B[2]),max(A[3],B[3]))
+
+def elementAttributes(element):
+    """Return the attributes set on an element, which keeps them in slots, as a dictionary"""
+    return dict((name, getattr(element, name)) for name in element.__slots__ if hasattr(element, name))
+
+def copyElement(element):
+    """Return a new element of the same class holding the same attributes"""
+    newElement = type(element)()
+    for (name, value) in elementAttributes(element).items():
+        setattr(newElement, name, value)
+    return newElement
+
+def elementSignature(element, **names):
+    """Return the attributes of an element as a sortable string, with the given names replaced"""
+    attributes = dict(elementAttributes(element), **names)
+    return repr(sorted((key,canonicalValue(value)) for (key,value) in attributes.items()))
+
+def canonicalValue(value):
+    #lists and tuples, booleans and integers or integral floats compare alike
+    valueType = type(value)
+    if valueType is float:
+        if value.is_integer():
+            return int(value)
+        return value
+    if valueType is tuple or valueType is list:
+        return tuple([canonicalValue(item) for item in value])
+    if valueType is bool:
+        return int(value)
+    return value
+
+def renameReferences(structure, name, renames):
+    """Return a copy of a structure under a new name, referencing renamed structures by their new names"""
+    #the element lists are copied so adding to one structure never changes the other,
+    #and the new structure measures its own bounding boxes
+    renamed = GdsStructure()
+    renamed.name = name
+    renamed.createDate = structure.createDate
+    renamed.modDate = structure.modDate
+    renamed.boundaries = list(structure.boundaries)
+    renamed.paths = list(structure.paths)
+    renamed.texts = list(structure.texts)
+    renamed.nodes = list(structure.nodes)
+    renamed.boxes = list(structure.boxes)
+    for sref in structure.srefs:
+        if sref.sName in renames:
+            newSref = copyElement(sref)
+            newSref.sName = renames[sref.sName]
+            sref = newSref
+        renamed.srefs.append(sref)
+    for aref in structure.arefs:
+        if aref.aName in renames:
+            newAref = copyElement(aref)
+            newAref.aName = renames[aref.aName]
+            aref = newAref
+        renamed.arefs.append(aref)
+    return renamed
@@ -194,6 +194,9 @@ def read_config(config_file, is_unit_test=True):
         
 def end_AMC():
     """ Clean up AMC for a proper exit """
+    # keep what was measured from the library cells, if they were used at all
+    if "libcell_cache" in sys.modules:
+        sys.modules["libcell_cache"].save_all()
     cleanup_paths()
     
 def cleanup_paths():
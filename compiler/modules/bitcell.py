@@ -16,6 +16,7 @@ class bitcell(design.design):
     single memory cell used in the design. It is a hand-made cell, so
     the layout and netlist should be available in the technology library.
     """
+    memoize = True
 
     pin_names = ["bl", "br", "wl", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("cell_6t", GDS["unit"], layer["boundary"])
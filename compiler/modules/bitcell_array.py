@@ -31,6 +31,7 @@ class bitcell_array(design.design):
     def __init__(self, cols, rows, name="bitcell_array"):
         design.design.__init__(self, name)
         debug.info(1, "Creating {0} {1} x {2}".format(name, rows, cols))
+        self.gds_arrays = True
 
         self.name = name
         self.column_size = cols
@@ -98,48 +99,18 @@ class bitcell_array(design.design):
     def create_layout(self):
         """ Add bitcell in a 2D array, Flip the cells in odd rows to share power rails """
 
-        xoffset = 0.0
-        self.cell_inst = {}
-
-        for col in range(self.column_size):
-            yoffset = 0.0
-            
-            if col% 2:
-                tempx = xoffset 
-            else:
-                tempx = xoffset + self.cell.width
-            
-            for row in range(self.row_size):
-                name = "bit_r{0}_c{1}".format(row, col)
-                if row % 2:
-                    tempy = yoffset + self.cell.height
-                else:
-                    tempy = yoffset
-                
-                if row % 2 and col% 2:
-                    mirror = "MX"
-                    rotate=0
-                if row % 2 and not col% 2:
-                    mirror = "R0"
-                    rotate=180
-                if not row % 2 and col% 2:
-                    mirror = "R0"
-                    rotate=0
-                if not row % 2 and not col% 2:
-                    mirror = "MY"
-                    rotate=0
-                
-                pin_list = ["bl[{0}]".format(col),"br[{0}]".format(col), "wl[{0}]".format(row), "vdd", "gnd"]
-                if info["foundry_cell"]:
-                    pin_list.extend(["gnd"])
-                self.cell_inst[row,col]=self.add_inst(name=name, 
-                                                      mod=self.cell, 
-                                                      offset=[tempx, tempy], 
-                                                      mirror=mirror,
-                                                      rotate=rotate)
-                self.connect_inst(pin_list)
-                yoffset += self.cell.height
-            xoffset += self.cell.width
+        # the cells in even columns are mirrored in y and the cells in odd rows in x
+        self.cell_inst = self.add_inst_array(name="bit_r{row}_c{col}",
+                                             mod=self.cell,
+                                             offset=[0, 0],
+                                             rows=self.row_size,
+                                             columns=self.column_size,
+                                             mirrors=[[("MY", 0), ("R0", 0)],
+                                                      [("R0", 180), ("MX", 0)]])
+        pin_list = ["bl[{col}]", "br[{col}]", "wl[{row}]", "vdd", "gnd"]
+        if info["foundry_cell"]:
+            pin_list.extend(["gnd"])
+        self.connect_inst(pin_list)
 
     def add_layout_pins(self):
         """ Add bitline and bitline_bar pins + wordline, vdd and gnd """
@@ -18,6 +18,7 @@ class column_mux_array(design.design):
     def __init__(self, columns, word_size, name="columnmux_array"):
         design.design.__init__(self, name)
         debug.info(1, "Creating {0}".format(name))
+        self.gds_arrays = True
         
         self.columns = columns
         self.word_size = word_size
@@ -15,6 +15,7 @@ from nand2 import nand2
 
 class driver(design.design):
     """ Creates an array of drivers (nand2 + inv) to drive the control signals with Go """
+    memoize = True
 
     def __init__(self, rows, inv_size = 1, name = "driver"):
         design.design.__init__(self, name)
@@ -13,6 +13,7 @@ from hierarchical_predecode import hierarchical_predecode
 
 class hierarchical_predecode2x4(hierarchical_predecode):
     """ Pre 2x4 decoder used in hierarchical_decoder. """
+    memoize = True
     
     def __init__(self):
         hierarchical_predecode.__init__(self, 2)
@@ -15,6 +15,7 @@ class hierarchical_predecode3x8(hierarchical_predecode):
     """
     Pre 3x8 decoder used in hierarchical_decoder.
     """
+    memoize = True
     def __init__(self):
         hierarchical_predecode.__init__(self, 3)
 
@@ -26,6 +26,7 @@ class merge(design.design):
     the technology library.
     merge for output data signals and some control signals when num of banks is greater than one
     """
+    memoize = True
 
     pin_names = ["D", "Q", "en1_M", "en2_M", "reset", "M", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("merge", GDS["unit"], layer["boundary"])
@@ -25,6 +25,7 @@ class nor2(design.design):
     single 2 input nor2 cell used in the design. It is a hand-made cell, so
     the layout and netlist should be available in the technology library.
     """
+    memoize = True
 
     pin_names = ["A", "B", "Z", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("nor2", GDS["unit"], layer["boundary"])
@@ -25,6 +25,7 @@ class nor3(design.design):
     single 3 input nor3 cell used in the design. It is a hand-made cell, so
     the layout and netlist should be available in the technology library.
     """
+    memoize = True
 
     pin_names = ["A", "B", "C", "Z", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("nor3", GDS["unit"], layer["boundary"])
@@ -20,10 +20,18 @@ class pinv(design.design):
     """ Pinv generates a parametrically sized inverter. The size is specified as the drive size 
        (relative to minimum NMOS) and a beta value for choosing the pmos size. The inverter's cell
         height is the same as the nand3 (nand2, nor2, nor3) cell. """
+    memoize = True
     
     def __init__(self, size=1, beta=parameter["beta"], height=nand3.height):
         
         name = "pinv_{}".format(size)
+        if beta != parameter["beta"]:
+            name += "_b{}".format(beta)
+        if height != nand3.height:
+            name += "_h{}".format(height)
+        
+        # replace periods with underscore for newer spice compatibility
+        name = name.replace(".", "_")
         design.design.__init__(self, name)
         debug.info(2, "create inverter with size of {0}".format(size))
 
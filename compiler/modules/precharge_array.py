@@ -16,6 +16,7 @@ class precharge_array(design.design):
     def __init__(self, columns, name="precharge_array"):
         design.design.__init__(self, name)
         debug.info(1, "Creating {0}".format(name))
+        self.gds_arrays = True
 
         self.columns = columns
 
@@ -43,17 +44,17 @@ class precharge_array(design.design):
     def add_insts(self):
         """Creates a precharge array by horizontally tiling the precharge cell"""
 
+        # the cells in odd columns are mirrored in y
+        self.pc_inst = self.add_inst_array(name="pre_column_{col}",
+                                           mod=self.pc_cell,
+                                           offset=vector(0, 0),
+                                           rows=1,
+                                           columns=self.columns,
+                                           mirrors=[[("R0", 0), ("MY", 0)]])
+        self.connect_inst(["bl[{col}]", "br[{col}]", "en", "vdd"])
+
         for i in range(self.columns):
-            name = "pre_column_{0}".format(i)
-            offset = vector(self.pc_cell.width * i, 0)
-            
-            if i%2:
-                mirror="MY"
-                offset = vector(self.pc_cell.width * (i+1), 0)
-            else:
-                mirror = "R0"
-            inst=self.add_inst(name=name, mod=self.pc_cell, offset=offset, mirror = mirror)
-            
+            inst = self.pc_inst[0, i]
             bl_pin = inst.get_pin("bl")
             self.add_layout_pin(text="bl[{0}]".format(i), 
                                 layer=self.m2_pin_layer, 
@@ -66,7 +67,6 @@ class precharge_array(design.design):
                                 offset=br_pin.ll(), 
                                 width=self.m2_width, 
                                 height=bl_pin.height())
-            self.connect_inst(["bl[{0}]".format(i), "br[{0}]".format(i), "en", "vdd"])
     
     def connect_rails(self):
         """Add vdd and en rails across the array"""
@@ -16,6 +16,7 @@ class sense_amp_array(design.design):
     def __init__(self, word_size, words_per_row, name="sense_amp_array"):
         design.design.__init__(self, name )
         debug.info(1, "Creating {0}".format(name))
+        self.gds_arrays = True
 
         self.amp = sense_amp()
         self.add_mod(self.amp)
@@ -25,6 +25,7 @@ class single_driver(design.design):
     single single_driver cell used in the design. It is a hand-made cell, so
     the layout and netlist should be available in the technology library.
     """
+    memoize = True
 
     pin_names = ["in0", "in1", "in2", "in3", "out0", "out1", "out2", "out3", "en", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("single_driver", GDS["unit"], layer["boundary"])
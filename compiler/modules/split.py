@@ -26,6 +26,7 @@ class split(design.design):
     the technology library.
     split for input address, input data, and some control signals when num of banks is greater than one
     """
+    memoize = True
 
     pin_names = ["D", "Q", "en1_S", "en2_S", "reset", "S", "vdd", "gnd"]
     (width,height) = utils.get_libcell_size("split", GDS["unit"], layer["boundary"])
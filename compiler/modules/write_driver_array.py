@@ -16,6 +16,7 @@ class write_driver_array(design.design):
     def __init__(self, word_size, words_per_row, name = "write_driver_array"):
         design.design.__init__(self, name)
         debug.info(1, "Creating {0}".format(name))
+        self.gds_arrays = True
 
         self.write_driver = write_driver()
         self.add_mod(self.write_driver)
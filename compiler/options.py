@@ -24,6 +24,11 @@ class options(optparse.Values):
     #AMC_temp = "/SAY/standard/rm2267-654001-SEAS/users/fa292/AMC/compiler/tmp/"
     AMC_temp = os.path.abspath(os.environ.get("AMC_HOME")) + "/tmp/"
     
+    # This is a directory where parsed library cells are cached between runs.
+    # The entries are pickled, so only use a directory nobody else can write.
+    # By default they are only cached in memory.
+    libcell_cache_path = None
+    
     # This is the verbosity level to control debug information. 0 is none, 1 is minimal, etc.
     debug_level = 0
     
@@ -48,6 +53,9 @@ class options(optparse.Values):
     # Remove noncritical memory cells for characterization speed-up
     trim_netlist = False
     
+    # Number of characterization simulations run at the same time, one by default, 0 uses every processor
+    num_sim_processes = 1
+    
     # Define the output file paths
     output_path = "tmp"
     
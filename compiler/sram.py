@@ -33,7 +33,7 @@ class sram(design.design):
     def __init__(self, word_size, words_per_row, num_rows, num_subanks, 
                  branch_factors, bank_orientations, name):
         
-        design.design.name_map=[]
+        design.design.name_map=set()
         start_time = datetime.datetime.now()
         design.design.__init__(self, name)
 
@@ -1226,7 +1226,7 @@ class sram(design.design):
     
     def sp_write(self, sp_name):
         """ Write the entire spice of the object to the file """
-        sp = open(sp_name, 'w')
+        sp = self.sp_open(sp_name)
 
         sp.write("**************************************************\n")
         sp.write("* AMC generated memory.\n")
@@ -1234,9 +1234,7 @@ class sram(design.design):
         sp.write("* Word Size: {}\n".format(self.word_size))
         sp.write("* Number of Banks: {}\n".format(self.num_inbanks*self.num_outbanks))
         sp.write("**************************************************\n")        
-        usedMODS = list()
-        self.sp_write_file(sp, usedMODS)
-        del usedMODS
+        self.sp_write_file(sp, set())
         sp.close()
 
 
@@ -549,7 +549,7 @@ class sync_sram(design.design):
     
     def sp_write(self, sp_name):
         """ Write the entire spice of the object to the file """
-        sp = open(sp_name, 'w')
+        sp = self.sp_open(sp_name)
 
         sp.write("**************************************************\n")
         sp.write("* AMC generated memory.\n")
@@ -557,9 +557,7 @@ class sync_sram(design.design):
         sp.write("* Word Size: {}\n".format(self.word_size))
         sp.write("* Number of Banks: {}\n".format(self.num_inbanks*self.num_outbanks))
         sp.write("**************************************************\n")        
-        usedMODS = list()
-        self.sp_write_file(sp, usedMODS)
-        del usedMODS
+        self.sp_write_file(sp, set())
         sp.close()
 
 
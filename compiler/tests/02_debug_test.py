@@ -0,0 +1,50 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on debug messages being formatted only when they are printed. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class debug_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        class formatted(object):
+            """ Counts how often the message argument is formatted """
+            count = 0
+            def __format__(self, spec):
+                formatted.count += 1
+                return "formatted"
+
+        debug.info(2, "Checking disabled messages and passing checks are not formatted")
+        debug.info(OPTS.debug_level+1, "argument {}", formatted())
+        debug.check(True, "argument {}", formatted())
+        self.assertEqual(formatted.count, 0)
+        self.assertFalse(debug.enabled(OPTS.debug_level+1))
+        self.assertTrue(debug.enabled(OPTS.debug_level))
+
+        debug.info(2, "Checking failing checks are formatted")
+        with self.assertRaises(AssertionError):
+            debug.check(False, "argument {}", formatted())
+        self.assertEqual(formatted.count, 1)
+
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,74 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on building leaf designs once for each set of arguments. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class design_memoize_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import design
+        import pinv
+        import ptx
+        import contact
+
+        debug.info(2, "Checking equal arguments give the same design")
+        inv = pinv.pinv()
+        self.assertTrue(pinv.pinv(size=1) is inv)
+        self.assertTrue(pinv.pinv(1) is inv)
+        self.assertFalse(pinv.pinv(size=2) is inv)
+        tx = ptx.ptx(width=2*inv.minwidth_tx, mults=2, tx_type="pmos")
+        self.assertTrue(ptx.ptx(tx_type="pmos", mults=2, width=2*inv.minwidth_tx) is tx)
+
+        debug.info(2, "Checking every layout argument gives its own name")
+        self.assertFalse(ptx.ptx(tx_type="pmos", min_area=True, dummy_poly=False).name ==
+                         ptx.ptx(tx_type="pmos", min_area=True).name)
+        self.assertFalse(pinv.pinv(beta=3).name == inv.name)
+        self.assertTrue(contact.contact(("active", "contact", "metal1"), add_extra_layer=False) is
+                        contact.contact(("active", "contact", "metal1")))
+        import lfsr
+        import data_pattern
+        lfsr.lfsr(size=4)
+        data_pattern.data_pattern(size=4)
+
+        debug.info(2, "Checking layouts and spice lines are made when first used")
+        self.assertEqual(inv.vlsi_layout, None)
+        self.assertEqual(inv.spice_lines, None)
+        self.assertEqual(inv.gds.rootStructureName, inv.name)
+        self.assertTrue(inv.gds is inv.vlsi_layout)
+        self.assertEqual(inv.spice, [])
+        self.assertNotEqual(tx.spice, [])
+
+        debug.info(2, "Checking a reloaded module reuses its designs")
+        self.assertTrue(reload(pinv).pinv(size=1) is inv)
+
+        debug.info(2, "Checking other designs still need unique names")
+        design.design("memoize_parent")
+        with self.assertRaises(AssertionError):
+            design.design("memoize_parent")
+
+        self.reset()
+        self.assertFalse(pinv.pinv() is inv)
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
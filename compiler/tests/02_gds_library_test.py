@@ -0,0 +1,143 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on indexing a GDS file and loading its structures on demand. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os, marshal, hashlib
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class gds_library_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import gdsMill
+        from tech import GDS
+
+        gds_file = OPTS.AMC_temp + "library.gds"
+        index_file = gds_file + ".idx"
+
+        class counted_library(gdsMill.GdsLibrary):
+            """ Counts the scans of the file instead of using the saved index """
+            scans = 0
+            def buildIndex(self, data):
+                counted_library.scans += 1
+                gdsMill.GdsLibrary.buildIndex(self, data)
+
+        def cell(name, x):
+            layout = gdsMill.VlsiLayout(name=name, units=GDS["unit"])
+            layout.addBox(layerNumber=1, dataType=0, offsetInMicrons=(x,0), width=1.0, height=1.0)
+            layout.addText("A", layerNumber=1, offsetInMicrons=(x,0))
+            return layout
+
+        def write_library(extra_cells, leaf1_x=1.0):
+            # top holds mid and leaf2, mid holds leaf1, both leaves are labeled A
+            mid = gdsMill.VlsiLayout(name="mid", units=GDS["unit"])
+            mid.addInstance(cell("leaf1", leaf1_x), offsetInMicrons=(0,0))
+            top = gdsMill.VlsiLayout(name="top", units=GDS["unit"])
+            top.addInstance(mid, offsetInMicrons=(0,0))
+            top.addInstance(cell("leaf2", 2.0), offsetInMicrons=(0,5))
+            for name in extra_cells:
+                top.addInstance(cell(name, 3.0), offsetInMicrons=(0,10))
+            gdsMill.Gds2writer(top).writeToFile(gds_file)
+
+        debug.info(2, "Checking the index lists every structure, reference and label")
+        write_library([])
+        library = counted_library(gds_file)
+        self.assertEqual(counted_library.scans, 1)
+        self.assertEqual(sorted(library.structureNames()), ["leaf1", "leaf2", "mid", "top"])
+        self.assertEqual(library.references["top"], ["leaf2", "mid"])
+        self.assertEqual(library.references["mid"], ["leaf1"])
+        self.assertEqual(sorted(library.labels["A\x00"]), ["leaf1", "leaf2"])
+        self.assertEqual(sorted(library.hierarchy("mid")), ["leaf1", "mid"])
+        self.assertFalse(hasattr(library, "data"))
+        self.assertRaises(KeyError, library.loadInto, gdsMill.VlsiLayout(units=GDS["unit"]), "missing")
+
+        debug.info(2, "Checking the index is saved only when asked and then used instead of scanning again")
+        self.assertFalse(os.path.isfile(gds_file + ".idx"))
+        self.assertTrue(library.saveIndex(index_file))
+        self.assertEqual(counted_library(gds_file, index_file).structureRanges, library.structureRanges)
+        self.assertEqual(counted_library.scans, 1)
+
+        debug.info(2, "Checking a saved index is not trusted for other contents of the same size and time")
+        file_stat = os.stat(gds_file)
+        write_library([], leaf1_x=4.0)
+        os.utime(gds_file, (file_stat.st_atime, file_stat.st_mtime))
+        self.assertEqual(os.stat(gds_file).st_size, file_stat.st_size)
+        rewritten = counted_library(gds_file, index_file)
+        self.assertEqual(counted_library.scans, 2)
+        leaf1 = gdsMill.VlsiLayout(units=GDS["unit"])
+        rewritten.loadInto(leaf1, "leaf1")
+        self.assertEqual(leaf1.structures["leaf1"].boundaries[0].coordinates[0][0],
+                         int(round(4.0 / GDS["unit"][0])))
+        counted_library(gds_file, index_file)
+        self.assertEqual(counted_library.scans, 2)
+
+        opened = gdsMill.openLibrary(gds_file)
+        self.assertTrue(gdsMill.openLibrary(gds_file) is opened)
+
+        debug.info(2, "Checking a changed file is indexed again")
+        write_library(["leaf3"])
+        stamp = os.stat(gds_file).st_mtime + 10
+        os.utime(gds_file, (stamp, stamp))
+        self.assertFalse(gdsMill.openLibrary(gds_file) is opened)
+        self.assertTrue("leaf3" in gdsMill.openLibrary(gds_file).structureNames())
+        counted_library(gds_file, index_file)
+        self.assertEqual(counted_library.scans, 3)
+        f = open(index_file, "rb")
+        saved = marshal.load(f)
+        f.close()
+        f = open(gds_file, "rb")
+        self.assertEqual(saved[1:3], (os.stat(gds_file).st_size, hashlib.sha1(f.read()).hexdigest()))
+        f.close()
+        os.remove(index_file)
+
+        def read_whole(root):
+            """ Every structure of the file, parsed without the index """
+            whole = gdsMill.VlsiLayout(units=GDS["unit"])
+            reader = gdsMill.Gds2reader(whole)
+            reader.readGds2Buffer(reader.readBuffer(gds_file))
+            whole.rootStructureName = root
+            return whole
+
+        debug.info(2, "Checking one hierarchy is loaded like the whole file")
+        whole = read_whole("mid")
+        layout = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.openLibrary(gds_file).loadInto(layout, "mid")
+        self.assertEqual(sorted(layout.structures.keys()), ["leaf1", "mid"])
+        self.assertEqual(layout.rootStructureName, "mid")
+        self.assertEqual(layout.measureBoundary("mid"), whole.measureBoundary("mid"))
+        loaded = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2reader(loaded).loadFromFile(gds_file)
+        self.assertEqual(sorted(loaded.structures.keys()), sorted(whole.structures.keys()))
+        self.assertEqual(loaded.measureBoundary("top"), read_whole("top").measureBoundary("top"))
+
+        debug.info(2, "Checking a label is found in the first structure that has it")
+        library = gdsMill.openLibrary(gds_file)
+        first = min(["leaf1", "leaf2", "leaf3"], key=lambda name: library.structureRanges[name][0])
+        texts = library.findLabel("A", gdsMill.VlsiLayout(units=GDS["unit"]))
+        self.assertEqual([text.coordinates for text in texts],
+                         [text.coordinates for text in whole.structures[first].texts])
+        record = gdsMill.Gds2reader(gdsMill.VlsiLayout(units=GDS["unit"])).findLabel(gds_file, "A")
+        self.assertEqual(len(record[1]), 2)
+        self.assertEqual(library.findLabel("B", gdsMill.VlsiLayout(units=GDS["unit"])), [])
+
+        os.remove(gds_file)
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
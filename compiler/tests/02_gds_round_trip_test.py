@@ -0,0 +1,166 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on reading and writing back every GDS file of the library. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os, glob, struct, hashlib
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+# SHA-1 of each library cell read and written by the record by record reader and
+# writer the buffered ones replaced. Update them when a library cell changes.
+original_writer = {
+    "scn3me_subm" : {
+        "cell_6t" : "4f9ce2b46198a2eaa25df63e28b12a252173ea7c",
+        "decode_stage_4_4" : "7bc7313ccd08dd45b76416163e12e118fefbd42b",
+        "decode_stage_5_4" : "206b5962e1bd7edba4458c4695c03987b1212e14",
+        "flipflop" : "f959ffc1eb2a8cb60dd44687731aae24e1c6eb66",
+        "merge" : "0d57e4f94e6ca25a2f1e3bcafdea343100ef5b73",
+        "nand2" : "29155dd53bdc9668be3c0da091016ad2f7c2d0e6",
+        "nand3" : "fe859a237fc223900a4cf7b9ac18581827f94efd",
+        "nor2" : "65f0081e367aff63e653ddd79b09a9633bf12177",
+        "nor3" : "4a2440007d6f807623a937baa0ade39c2454a36d",
+        "replica_cell_6t" : "eee9c9c7faed90eed86236bd07f1ed5795d6d5be",
+        "sense_amp" : "2d5541e83fcb124ba062c04f6a79f76bc070be01",
+        "sense_amp1" : "02b0f090bbaaeec111e6e0af6e0ffcf96a8956b9",
+        "single_driver" : "b8bc9c8cd7b2c4a5f4f843a6c72f78bccc54a497",
+        "split" : "dfb5bfa9103253c160016d401e7784444d4fa917",
+        "wordline_driver" : "908458ab41f9558de55be4769e546300edc070e9",
+        "write_complete" : "b3c1714e4f0870c676e9ebd45d271416c734e2a1",
+        "write_driver" : "53782d08ab6f1ff5e0bb03b4e85ce059d9f02782",
+        "xor2" : "bdb22e12349008267cff5ef98748c2afdbb534ba",
+    },
+}
+
+class gds_round_trip_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import gdsMill
+        from gdsMill.vlsiLayout import elementAttributes
+        from tech import GDS
+
+        gds_file = OPTS.AMC_temp + "round_trip.gds"
+
+        def contents(layout):
+            """ Everything read from a file, element by element """
+            structures = {}
+            for (name, structure) in layout.structures.items():
+                structures[name] = [structure.createDate, structure.modDate]
+                for elements in [structure.boundaries, structure.paths, structure.srefs, structure.arefs,
+                                 structure.texts, structure.nodes, structure.boxes]:
+                    structures[name].append([elementAttributes(element) for element in elements])
+            info = dict(layout.info)
+            return (structures, info, sorted(layout.layerNumbersInUse))
+
+        def read(file_name):
+            layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            gdsMill.Gds2reader(layout).loadFromFile(file_name)
+            return layout
+
+        def records(file_name):
+            """ The (type, data) of every record of a file """
+            f = open(file_name, "rb")
+            data = f.read()
+            f.close()
+            (position, found) = (0, [])
+            while position < len(data):
+                (length, record_type) = struct.unpack(">HH", data[position:position+4])
+                found.append((record_type, data[position+4:position+length]))
+                if length == 0 or record_type == 0x0400:
+                    break
+                position += length
+            return found
+
+        debug.info(2, "Checking every library cell reads back as it was written")
+        library = sorted(glob.glob(OPTS.AMC_tech + "gds_lib/*.gds"))
+        self.assertTrue(len(library) > 0)
+        digests = original_writer.get(OPTS.tech_name, {})
+        for cell_gds in library:
+            layout = read(cell_gds)
+            # the record by record reader is still used to report every record
+            record_layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            reader = gdsMill.Gds2reader(record_layout)
+            reader.fileHandle = open(cell_gds, "rb")
+            reader.readGds2()
+            reader.fileHandle.close()
+            self.assertEqual(contents(layout), contents(record_layout))
+
+            gdsMill.Gds2writer(layout).writeToFile(gds_file)
+            self.assertEqual(contents(read(gds_file)), contents(layout))
+            name = os.path.basename(cell_gds)[:-4]
+            if name in digests:
+                # the original reader dropped the text presentations, the rest is unchanged
+                stream = "".join(struct.pack(">HH", len(data) + 4, record_type) + data
+                                 for (record_type, data) in records(gds_file) if record_type != 0x1701)
+                self.assertEqual(hashlib.sha1(stream).hexdigest(), digests[name], name)
+
+        debug.info(2, "Checking boxes, text presentations and arrays")
+        leaf = gdsMill.VlsiLayout(name="leaf", units=GDS["unit"])
+        leaf.addBox(layerNumber=1, dataType=0, offsetInMicrons=(0,0), width=1.0, height=2.0)
+        top = gdsMill.VlsiLayout(name="top", units=GDS["unit"])
+        top.addArray(leaf, 3, 2, 2.0, 3.0, offsetInMicrons=(10,0), mirror="MX")
+        top.addArray(leaf, 2, 4, 3.0, 2.0, offsetInMicrons=(0,10), rotate=90)
+        text = gdsMill.GdsText()
+        (text.drawingLayer, text.purposeLayer, text.dataType) = (4, 0, 0)
+        text.presentationFlags = (1, 2, 0)
+        text.magFactor = 0.5
+        text.coordinates = [(100, 200)]
+        text.textString = "PRES"
+        top.structures["top"].texts.append(text)
+        box = gdsMill.GdsBox()
+        (box.drawingLayer, box.boxValue) = (5, 3)
+        box.coordinates = [(0,0), (0,10), (10,10), (10,0), (0,0)]
+        top.structures["top"].boxes.append(box)
+        gdsMill.Gds2writer(top).writeToFile(gds_file)
+
+        written = read(gds_file)
+        self.assertEqual(written.structures["leaf"].boundaries[0].coordinates,
+                         [(int(x), int(y)) for (x, y) in leaf.structures["leaf"].boundaries[0].coordinates])
+        [array1, array2] = written.structures["top"].arefs
+        self.assertEqual((array1.aName, array1.columns, array1.rows), ("leaf", 3, 2))
+        self.assertEqual(array1.coordinates, top.structures["top"].arefs[0].coordinates)
+        self.assertEqual(array1.transFlags[0], True)
+        self.assertEqual((array2.columns, array2.rows, array2.rotateAngle), (2, 4, 90))
+        [written_text] = written.structures["top"].texts
+        self.assertEqual((written_text.presentationFlags, written_text.magFactor, written_text.textString),
+                         ((1, 2, 0), 0.5, "PRES"))
+        [written_box] = written.structures["top"].boxes
+        self.assertEqual((written_box.drawingLayer, written_box.boxValue, written_box.coordinates),
+                         (5, 3, box.coordinates))
+
+        # the record types of the GDSII stream format
+        record_types = [record_type for (record_type, data) in records(gds_file)]
+        box_start = record_types.index(0x2D00)
+        self.assertEqual(record_types[box_start:box_start+4], [0x2D00, 0x0D02, 0x2E02, 0x1003])
+        self.assertEqual(record_types.count(0x1302), 2)
+        self.assertTrue((0x1701, struct.pack(">H", 1<<4 | 2<<2 | 0)) in records(gds_file))
+
+        debug.info(2, "Checking a written file is written again byte for byte")
+        f = open(gds_file, "rb")
+        first = f.read()
+        f.close()
+        gdsMill.Gds2writer(written).writeToFile(gds_file)
+        f = open(gds_file, "rb")
+        self.assertEqual(f.read(), first)
+        f.close()
+
+        os.remove(gds_file)
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,105 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on merging and writing GDS structures with equal names or contents. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class gds_structure_dedup_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import gdsMill
+        from tech import GDS
+
+        def cell(name, width):
+            layout = gdsMill.VlsiLayout(name=name, units=GDS["unit"])
+            layout.addBox(layerNumber=1, dataType=0, offsetInMicrons=(0,0), width=width, height=1.0)
+            return layout
+
+        debug.info(2, "Checking cells with one name and different shapes are both kept")
+        top = gdsMill.VlsiLayout(name="top", units=GDS["unit"])
+        top.addInstance(cell("cell", 1.0), offsetInMicrons=(0,0))
+        wide = cell("cell", 2.0)
+        top.addInstance(wide, offsetInMicrons=(0,5))
+        self.assertEqual(sorted(top.structures.keys()), ["cell", "cell_1", "top"])
+        self.assertEqual([sref.sName for sref in top.structures["top"].srefs], ["cell", "cell_1"])
+
+        debug.info(2, "Checking a renamed cell does not share its lists with the original")
+        renamed = top.structures["cell_1"]
+        self.assertEqual(renamed.boundaries, wide.structures["cell"].boundaries)
+        wide.addBox(layerNumber=1, dataType=0, offsetInMicrons=(0,2), width=1.0, height=1.0)
+        self.assertEqual(len(renamed.boundaries), 1)
+        self.assertFalse(renamed.boundingBoxes is wide.structures["cell"].boundingBoxes)
+
+        debug.info(2, "Checking integer and integral float coordinates give one signature")
+        ints = cell("ints", 1.0)
+        floats = cell("floats", 1.0)
+        for boundary in ints.structures["ints"].boundaries:
+            boundary.coordinates = [(int(x), int(y)) for (x, y) in boundary.coordinates]
+        for boundary in floats.structures["floats"].boundaries:
+            boundary.coordinates = [(float(x), float(y)) for (x, y) in boundary.coordinates]
+        self.assertEqual(ints.structureSignature("ints", {}), floats.structureSignature("floats", {}))
+
+        debug.info(2, "Checking cells with one name and equal shapes are merged")
+        top.addInstance(cell("cell", 1.0), offsetInMicrons=(0,10))
+        self.assertEqual(len(top.structures), 3)
+        self.assertEqual(top.structures["top"].srefs[2].sName, "cell")
+
+        debug.info(2, "Checking cells with equal shapes are written once")
+        top.addInstance(cell("copy", 2.0), offsetInMicrons=(0,15))
+        self.assertEqual(top.uniqueStructureNames()["copy"], "cell_1")
+        gdsMill.Gds2writer(top).writeToFile(OPTS.AMC_temp + "dedup.gds")
+        written = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2reader(written).loadFromFile(OPTS.AMC_temp + "dedup.gds")
+        self.assertEqual(sorted(written.structures.keys()), ["cell", "cell_1", "top"])
+        self.assertEqual([sref.sName for sref in written.structures["top"].srefs],
+                         ["cell", "cell_1", "cell", "cell_1"])
+        self.assertEqual(written.measureBoundary("top"), top.measureBoundary("top"))
+
+        debug.info(2, "Checking cells with equal shapes keep their names if a netlist has them")
+        top.keepNames = set(["copy"])
+        self.assertEqual(top.uniqueStructureNames()["copy"], "copy")
+        import design
+        import driver
+        from vector import vector
+        parent = design.design("dedup_parent")
+        parent.add_pin_list(["in", "out", "en", "vdd", "gnd"])
+        for (i, name) in enumerate(["drv_a", "drv_b"]):
+            drv = driver.driver(rows=1, inv_size=2, name=name)
+            parent.add_mod(drv)
+            parent.add_inst(name=name, mod=drv, offset=vector(0, 20*i))
+            parent.connect_inst(["in", "out", "en", "vdd", "gnd"])
+        parent.sp_write(OPTS.AMC_temp + "dedup.sp")
+        parent.gds_write(OPTS.AMC_temp + "dedup.gds")
+        written = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2reader(written).loadFromFile(OPTS.AMC_temp + "dedup.gds")
+        f = open(OPTS.AMC_temp + "dedup.sp")
+        subckts = [line.split()[1] for line in f if line.upper().startswith(".SUBCKT")]
+        f.close()
+        self.assertTrue("drv_a" in subckts and "drv_b" in subckts)
+        self.assertEqual([name for name in subckts if name not in written.structures], [])
+
+        os.remove(OPTS.AMC_temp + "dedup.gds")
+        os.remove(OPTS.AMC_temp + "dedup.sp")
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,69 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on arrays of instances that are stored once and computed per tile. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class instance_array_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import design
+        import bitcell
+        from vector import vector
+        from tech import layer
+
+        cell = bitcell.bitcell()
+        mirrors = [[("MY", 0), ("R0", 0)], [("R0", 180), ("MX", 0)]]
+
+        debug.info(2, "Checking tiles are placed like single instances")
+        parent = design.design("array_parent")
+        array = parent.add_inst_array(name="bit_r{row}_c{col}", mod=cell, offset=vector(0, 0),
+                                      rows=3, columns=2, mirrors=mirrors)
+        parent.connect_inst(["bl[{col}]", "br[{col}]", "wl[{row}]", "vdd", "gnd"])
+        single = design.design("single_parent")
+        for (row, col) in array.tiles():
+            (mirror, rotate) = mirrors[row % 2][col % 2]
+            offset = vector((col + (1 - col % 2))*cell.width, (row + row % 2)*cell.height)
+            inst = single.add_inst(name="bit_r{0}_c{1}".format(row, col), mod=cell,
+                                   offset=offset, mirror=mirror, rotate=rotate)
+            self.assertEqual(array[row, col].offset, inst.offset)
+            self.assertEqual(array[row, col].get_pin("bl"), inst.get_pin("bl"))
+        self.assertEqual(len(parent.insts), 1)
+        self.assertEqual(parent.get_inst("bit_r{row}_c{col}"), array)
+        self.assertEqual(parent.find_highest_coords().grid(), single.find_highest_coords().grid())
+        for layer_name in ["metal1", "metal3"]:
+            self.assertEqual(parent.get_grid_blockages(layer[layer_name]),
+                             single.get_grid_blockages(layer[layer_name]))
+
+        debug.info(2, "Checking the tiles follow the translation of the layout")
+        parent.translate_all(vector(cell.width, 0))
+        self.assertEqual(array[0, 0].ll(), vector(-cell.width, 0))
+
+        debug.info(2, "Checking the netlist names and nets of the tiles")
+        connections = list(array.get_connections(parent.conns[0]))
+        self.assertEqual(len(connections), 6)
+        self.assertEqual(connections[1], ("bit_r1_c0", ["bl[0]", "br[0]", "wl[1]", "vdd", "gnd"]))
+
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,101 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on the library cell cache against a direct read of the library. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os, shutil
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class libcell_cache_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import gdsMill
+        import libcell_cache
+        from tech import GDS, layer
+
+        # files measured by earlier tests must be measured again into this cache,
+        # and later tests get back the cache they would have had without this test
+        cache_path = OPTS.libcell_cache_path
+        cached_files = dict(libcell_cache.cache)
+        OPTS.libcell_cache_path = OPTS.AMC_temp + "libcell_cache/"
+        libcell_cache.cache.clear()
+        cell_gds = OPTS.AMC_tech + "gds_lib/cell_6t.gds"
+        cell_sp = OPTS.AMC_tech + "sp_lib/cell_6t.sp"
+
+        debug.info(2, "Checking cached cell size and pins against the library")
+        cell_vlsi = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2reader(cell_vlsi).loadFromFile(cell_gds)
+        size = libcell_cache.get_size(cell_gds, "cell_6t", GDS["unit"], layer["boundary"])
+        self.assertEqual(size, cell_vlsi.getLayoutBorder(layer["boundary"]))
+        for pin in ["bl", "br", "wl", "vdd", "gnd"]:
+            shapes = libcell_cache.get_pin_shapes(cell_gds, "cell_6t", pin, GDS["unit"])
+            self.assertEqual(shapes, cell_vlsi.getPinShapeByLabel(pin))
+        (lines, pins) = libcell_cache.get_sp(cell_sp, "cell_6t")
+        self.assertEqual(pins, ["bl", "br", "wl", "vdd", "gnd"])
+        import bitcell
+        self.assertTrue(bitcell.bitcell().spice is lines)
+        self.assertTrue(isinstance(lines, tuple))
+
+        debug.info(2, "Checking the on-disk cache is used by a new process")
+        self.assertTrue(libcell_cache.get_gds(cell_gds, "cell_6t").dirty)
+        libcell_cache.save_all()
+        self.assertFalse(libcell_cache.get_gds(cell_gds, "cell_6t").dirty)
+        libcell_cache.cache.clear()
+        cached = libcell_cache.get_gds(cell_gds, "cell_6t")
+        self.assertTrue(("size", "cell_6t", GDS["unit"], layer["boundary"]) in cached.derived)
+
+        debug.info(2, "Checking layouts handed out do not share structure lists")
+        layout1 = libcell_cache.get_layout(cell_gds, "cell_6t", GDS["unit"])
+        layout2 = libcell_cache.get_layout(cell_gds, "cell_6t", GDS["unit"])
+        layout1.addText("test", 1, offsetInMicrons=(0,0))
+        self.assertNotEqual(len(layout1.structures["cell_6t"].texts),
+                            len(layout2.structures["cell_6t"].texts))
+
+        debug.info(2, "Checking only the hierarchy of a cell is parsed out of its file")
+        library_gds = OPTS.AMC_temp + "libcell_cache.gds"
+        leaf = gdsMill.VlsiLayout(name="leaf", units=GDS["unit"])
+        leaf.addBox(layerNumber=1, dataType=0, offsetInMicrons=(0,0), width=1.0, height=2.0)
+        mid = gdsMill.VlsiLayout(name="mid", units=GDS["unit"])
+        mid.addInstance(leaf, offsetInMicrons=(1,0))
+        mid.addBox(layerNumber=layer["boundary"], dataType=0, offsetInMicrons=(0,0), width=3.0, height=4.0)
+        other = gdsMill.VlsiLayout(name="other", units=GDS["unit"])
+        other.addBox(layerNumber=1, dataType=0, offsetInMicrons=(0,0), width=5.0, height=5.0)
+        top = gdsMill.VlsiLayout(name="top", units=GDS["unit"])
+        top.addInstance(mid, offsetInMicrons=(0,0))
+        top.addInstance(other, offsetInMicrons=(0,5))
+        top.addBox(layerNumber=layer["boundary"], dataType=0, offsetInMicrons=(0,0), width=6.0, height=10.0)
+        gdsMill.Gds2writer(top).writeToFile(library_gds)
+        layout = libcell_cache.get_layout(library_gds, "mid", GDS["unit"])
+        self.assertEqual(sorted(layout.structures.keys()), ["leaf", "mid"])
+        self.assertEqual(layout.rootStructureName, "mid")
+        self.assertEqual(sorted(libcell_cache.get_gds(library_gds, "mid").data["structures"].keys()),
+                         ["leaf", "mid"])
+        self.assertEqual(libcell_cache.get_size(library_gds, "mid", GDS["unit"], layer["boundary"]), [3.0, 4.0])
+        self.assertEqual(libcell_cache.get_size(library_gds, "top", GDS["unit"], layer["boundary"]), [6.0, 10.0])
+        os.remove(library_gds)
+
+        shutil.rmtree(OPTS.libcell_cache_path, ignore_errors=True)
+        OPTS.libcell_cache_path = cache_path
+        libcell_cache.cache.clear()
+        libcell_cache.cache.update(cached_files)
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,59 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on merging and placing the LEF blockage rectangles. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class merge_rects_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        from utils import merge_rects, grid_rect
+        from vector import vector
+        from tech import layer
+        import design
+
+        debug.info(2, "Checking overlapping and abutting rectangles are merged")
+        self.assertEqual(merge_rects([(0,0,4,2), (2,1,6,3)]), [(0,0,4,1), (0,1,6,2), (2,2,6,3)])
+        self.assertEqual(merge_rects([(0,0,2,2), (2,0,4,2), (0,2,4,3)]), [(0,0,4,3)])
+        self.assertEqual(merge_rects([(0,0,2,2), (3,0,4,2), (1,1,1,5)]), [(0,0,2,2), (3,0,4,2)])
+        self.assertEqual(merge_rects([(0,0,4,4), (1,1,2,2)]), [(0,0,4,4)])
+
+        debug.info(2, "Checking instance blockages match the transformed pins")
+        cell = design.design("blockage_cell")
+        rect = cell.add_rect(layer="metal1", offset=vector(0.3, 0.6), width=0.9, height=1.5)
+        self.assertEqual(rect.offset, vector(0.3, 0.6))
+        self.assertAlmostEqual(rect.width, 0.9)
+        self.assertEqual(len(cell.rect_map[layer["metal1"]]), 1)
+        self.assertEqual([obj.offset for obj in cell.objs], [vector(0.3, 0.6)])
+        cell.add_layout_pin(text="A", layer="metal1", offset=vector(0.3, 0.6), width=0.9, height=1.5)
+        (cell.width, cell.height) = (1.2, 2.1)
+        parent = design.design("blockage_parent")
+        for (mirror, rotate) in [("R0", 0), ("MX", 0), ("MY", 90), ("XY", 270), ("R0", 180)]:
+            inst = parent.add_inst(name="cell", mod=cell, offset=vector(3, 6), mirror=mirror, rotate=rotate)
+            self.assertEqual(inst.get_grid_blockages(layer["metal1"]), [grid_rect(inst.get_pin("A").rect)])
+        self.assertEqual(parent.get_grid_blockages(layer["metal1"], top_level=True),
+                         merge_rects(grid_rect(inst.get_pin("A").rect) for inst in parent.insts))
+
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
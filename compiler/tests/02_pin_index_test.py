@@ -0,0 +1,135 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on the pin and label indices against a search of every shape. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class pin_index_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import gdsMill
+        import pinv
+        from tech import GDS
+
+        def linear_shapes(layout, coordinate, layer):
+            """ The shapes under a point found by looking at every shape """
+            shapes = []
+            for tree_unit in layout.coordinateMap():
+                shapes += layout.getPinInStructure(coordinate, layer, tree_unit)
+            return shapes
+
+        def linear_pin_shapes(layout, label):
+            """ The largest shape under each text of a label found by looking at every shape """
+            pins = []
+            for text in layout.structures[layout.rootStructureName].texts:
+                if text.textString not in [label, label + "\x00"]:
+                    continue
+                shapes = linear_shapes(layout, text.coordinates[0], text.drawingLayer)
+                shapes.sort(gdsMill.vlsiLayout.cmpBoundaryAreas, reverse=True)
+                pins.append(["p" + str(text.coordinates[0]) + "_" + str(text.drawingLayer),
+                             text.drawingLayer, [x*layout.units[0] for x in shapes[0]]])
+            return pins
+
+        def check_layout(layout):
+            """ Compare the indexed and full searches at every label, at the corners
+                of every shape and on the edges of the grid cells of the index """
+            texts = layout.structures[layout.rootStructureName].texts
+            for label in set(text.textString.rstrip("\x00") for text in texts):
+                self.assertEqual(layout.getPinShapeByLabel(label), linear_pin_shapes(layout, label))
+            for layer in set(text.drawingLayer for text in texts):
+                index = layout.getPinIndex(layer)
+                if index == None:
+                    continue
+                (left, bottom, bin_size, bins, rectangles) = index
+                columns = max(x for (x, y) in bins) + 2
+                rows = max(y for (x, y) in bins) + 2
+                points = [(left + i*bin_size + dx, bottom + j*bin_size + dy)
+                          for i in range(columns) for j in range(rows)
+                          for dx in [-1, 0, 1] for dy in [-1, 0, 1]]
+                for rectangle in rectangles:
+                    for (x, y) in [(0, 1), (0, 3), (2, 1), (2, 3)]:
+                        corner = (int(rectangle[x]), int(rectangle[y]))
+                        points += [(corner[0] + dx, corner[1] + dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1]]
+                for point in points:
+                    self.assertEqual(layout.getAllPinShapesInStructureList(point, layer),
+                                     linear_shapes(layout, point, layer))
+
+        debug.info(2, "Checking a library cell")
+        cell = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2reader(cell).loadFromFile(OPTS.AMC_tech + "gds_lib/sense_amp.gds")
+        cell.measureBoundary(cell.rootStructureName)
+        self.assertEqual(cell.xyTree, [])
+        check_layout(cell)
+        self.assertTrue(len(cell.xyTree) > 0)
+
+        debug.info(2, "Checking a cell with mirrored and rotated references")
+        inv = pinv.pinv(size=3)
+        inv.gds_write(OPTS.AMC_temp + "pin_index.gds")
+        layout = gdsMill.VlsiLayout(units=GDS["unit"])
+        gdsMill.Gds2reader(layout).loadFromFile(OPTS.AMC_temp + "pin_index.gds")
+        check_layout(layout)
+
+        debug.info(2, "Checking a measured structure becomes the root of the pin queries")
+        top = layout.rootStructureName
+        child = layout.structures[top].srefs[0].sName
+        layout.measureBoundary(child)
+        self.assertEqual([tree_unit[0] for tree_unit in layout.coordinateMap()][0], child)
+        check_layout(layout)
+        layout.measureBoundary(top)
+        self.assertEqual([tree_unit[0] for tree_unit in layout.coordinateMap()][0], top)
+
+        debug.info(2, "Checking labels on the edges of the grid cells")
+        text = layout.structures[layout.rootStructureName].texts[0]
+        (left, bottom, bin_size, bins, rectangles) = layout.getPinIndex(text.drawingLayer)
+        # the shapes crossed by a vertical edge get a label on it, at their bottom edge
+        edges = [left + i*bin_size for i in range(1, max(x for (x, y) in bins) + 1)]
+        labels = [(edge, int(rectangle[1])) for edge in edges for rectangle in rectangles
+                  if int(rectangle[0]) <= edge <= int(rectangle[2])]
+        self.assertTrue(len(labels) > 0)
+        for (x, y) in labels:
+            layout.addText("edge", layerNumber=text.drawingLayer,
+                           offsetInMicrons=(x*layout.units[0], y*layout.units[0]))
+        linear = linear_pin_shapes(layout, "edge")
+        self.assertEqual(len(linear), len(labels))
+        self.assertEqual(layout.getPinShapeByLabel("edge"), linear)
+
+        debug.info(2, "Checking the indices are rebuilt after they are cleared")
+        layer_shapes = layout.getAllPinShapesByLabel("edge")
+        tree_size = len(layout.coordinateMap())
+        (x, y) = labels[0]
+        layout.addBox(layerNumber=text.drawingLayer, dataType=0,
+                      offsetInMicrons=(x*layout.units[0] - 1, y*layout.units[0] - 1), width=2, height=2)
+        self.assertEqual(layout.pinIndex, {})
+        self.assertEqual(layout.labelIndex, None)
+        layout.initialize()
+        self.assertEqual(len(layout.coordinateMap()), tree_size)
+        self.assertNotEqual(layout.getAllPinShapesByLabel("edge"), layer_shapes)
+        self.assertEqual(layout.getPinShapeByLabel("edge"), linear_pin_shapes(layout, "edge"))
+        layout.clearQueryIndex()
+        self.assertEqual(layout.getPinShapeByLabel("edge"), linear_pin_shapes(layout, "edge"))
+        check_layout(layout)
+
+        os.remove(OPTS.AMC_temp + "pin_index.gds")
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
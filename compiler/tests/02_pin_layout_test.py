@@ -0,0 +1,100 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on grid snapping and comparing of vectors and pins. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os, pickle
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class pin_layout_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        from vector import vector
+        from pin_layout import pin_layout
+        from tech import drc
+        import utils
+
+        grid = drc["grid"]
+
+        debug.info(2, "Checking vectors snap to whole grid steps")
+        offset = vector(3*grid + 0.1*grid, 7*grid - 0.2*grid)
+        self.assertEqual(offset.grid(), (3, 7))
+        self.assertEqual(offset.snap_to_grid(), vector(3*grid, 7*grid))
+        self.assertEqual(utils.round_to_grid(0.1+0.2), vector(0.1+0.2, 0).snap_to_grid().x)
+        self.assertEqual(len(set([vector(1, 2), vector(1, 2), vector(2, 1)])), 2)
+
+        debug.info(2, "Checking vectors can not be changed once made")
+        key = vector(1, 2)
+        with self.assertRaises(AttributeError):
+            key.x = 3
+        with self.assertRaises(AttributeError):
+            key.z = 3
+        self.assertEqual(key, vector(1, 2))
+        self.assertEqual(pickle.loads(pickle.dumps(key, 2)), key)
+
+        debug.info(2, "Checking pins with float errors are duplicates")
+        pin1 = pin_layout("A", [vector(2*grid, 0), vector(3*grid, grid)], "metal1", 0, 0)
+        pin2 = pin_layout("A", [vector(0, 0), vector(grid, grid)], "metal1", 0, 0)
+        pin2.transform(vector(0.1+0.2, 0), "", 0)
+        self.assertNotEqual(pin2.rect[1].x, 3*grid)
+        self.assertEqual(pin1, pin2)
+        self.assertEqual(len(set([pin1, pin2])), 1)
+        pin3 = pin_layout("B", [vector(2*grid, 0), vector(3*grid, grid)], "metal1", 0, 0)
+        self.assertNotEqual(pin1, pin3)
+
+        debug.info(2, "Checking instance pins are reused until the instance moves")
+        import design
+        import bitcell
+        cell = bitcell.bitcell()
+        parent = design.design("pin_parent")
+        inst = parent.add_inst(name="cell", mod=cell, offset=vector(0, 0), mirror="MX")
+        self.assertTrue(parent.get_inst("cell") is inst)
+        self.assertEqual(parent.get_inst("no_cell"), None)
+        bl_pins = inst.get_pins("bl")
+        self.assertTrue(inst.get_pins("bl")[0] is bl_pins[0])
+        self.assertEqual(bl_pins[0].ll(), vector(cell.get_pin("bl").lx(), -cell.get_pin("bl").uy()))
+        lowest = parent.find_lowest_coords()
+        self.assertEqual(lowest, inst.ll())
+        parent.translate_all(vector(-grid, 0))
+        self.assertEqual(inst.get_pin("bl").ll(), bl_pins[0].ll() + vector(grid, 0))
+
+        debug.info(2, "Checking the translation is folded into instances and extents")
+        self.assertEqual(inst.ll(), lowest + vector(grid, 0))
+        self.assertEqual(parent.find_lowest_coords(), lowest + vector(grid, 0))
+        self.assertEqual(parent.find_highest_coords(), inst.ur())
+
+        debug.info(2, "Checking instance pins follow the pins of the master")
+        master = design.design("pin_master")
+        (master.width, master.height) = (3*grid, grid)
+        master.add_layout_pin("A", "metal1", vector(0, 0), width=grid, height=grid)
+        master_inst = parent.add_inst(name="master", mod=master, offset=vector(0, 0))
+        self.assertEqual(master_inst.get_pin("A").ll(), vector(0, 0))
+        master.remove_layout_pin("A")
+        master.add_layout_pin("A", "metal1", vector(2*grid, 0), width=grid, height=grid)
+        self.assertEqual(master_inst.get_pin("A").ll(), vector(2*grid, 0))
+        master.translate_all(vector(-grid, 0))
+        self.assertEqual(master_inst.get_pin("A").ll(), vector(3*grid, 0))
+        master.get_pin("A").rect = [vector(0, 0), vector(grid, grid)]
+        self.assertEqual(master_inst.get_pin("A").ll(), vector(0, 0))
+
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
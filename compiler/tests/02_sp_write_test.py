@@ -0,0 +1,60 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on writing spice netlists in dependency order, plain and compressed. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os, gzip
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class sp_write_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import precharge_array
+
+        a = precharge_array.precharge_array(columns=4)
+
+        debug.info(2, "Checking every module is written once and after the modules it uses")
+        modules = a.sp_modules()
+        names = [mod.name for mod in modules]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(names[-1], a.name)
+        for (i, mod) in enumerate(modules):
+            if not mod.spice:
+                for child in mod.mods:
+                    self.assertTrue(names.index(child.name) < i)
+
+        debug.info(2, "Checking the compressed netlist is the plain one")
+        a.sp_write(OPTS.AMC_temp + "sp_write.sp")
+        a.sp_write(OPTS.AMC_temp + "sp_write.sp.gz")
+        plain = open(OPTS.AMC_temp + "sp_write.sp").read()
+        compressed = gzip.open(OPTS.AMC_temp + "sp_write.sp.gz").read()
+        self.assertEqual(plain, compressed)
+        for col in range(4):
+            self.assertTrue("Xpre_column_{0} bl[{0}] br[{0}] en vdd precharge\n".format(col) in plain)
+        for mod in modules:
+            if not mod.spice and mod.insts:
+                self.assertEqual(plain.count(".SUBCKT {0} ".format(mod.name)), 1)
+
+        os.remove(OPTS.AMC_temp + "sp_write.sp")
+        os.remove(OPTS.AMC_temp + "sp_write.sp.gz")
+        self.reset()
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,70 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+""" Check a bitcell_array written with GDS arrays matches one written with references. """
+
+import unittest
+from testutils import header,AMC_test
+import sys,os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class array_gds_array_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        import gdsMill
+        import bitcell_array
+        from tech import GDS
+
+        debug.info(2, "Writing 8x4 array with and without GDS arrays")
+        a = bitcell_array.bitcell_array(name="bitcell_array", cols=4, rows=8)
+        b = bitcell_array.bitcell_array(name="bitcell_array_sref", cols=4, rows=8)
+        b.gds_arrays = False
+        a.gds_write(OPTS.AMC_temp + "aref.gds")
+        b.gds_write(OPTS.AMC_temp + "sref.gds")
+
+        layouts = []
+        for gds_name in ["aref.gds", "sref.gds"]:
+            layout = gdsMill.VlsiLayout(units=GDS["unit"])
+            gdsMill.Gds2reader(layout).loadFromFile(OPTS.AMC_temp + gds_name)
+            layouts.append(layout)
+        (aref_layout, sref_layout) = layouts
+
+        # one array for each of the four mirrored bitcell orientations
+        self.assertEqual(len(aref_layout.structures["bitcell_array"].arefs), 4)
+        self.assertEqual([ref.sName for ref in aref_layout.structures["bitcell_array"].srefs].count("cell_6t"), 0)
+        self.assertEqual(sum([array.columns*array.rows for array in aref_layout.structures["bitcell_array"].arefs]), 32)
+        self.assertEqual(len(aref_layout.coordinateMap()), len(sref_layout.coordinateMap()))
+
+        debug.info(2, "Checking size and pins are the same")
+        self.assertEqual(aref_layout.measureBoundary("bitcell_array"), sref_layout.measureBoundary("bitcell_array_sref"))
+        for pin in ["bl[0]", "br[3]", "wl[0]", "wl[7]", "vdd", "gnd"]:
+            aref_shapes = [sorted(shape[2]) for shape in aref_layout.getAllPinShapesByLabel(pin)]
+            sref_shapes = [sorted(shape[2]) for shape in sref_layout.getAllPinShapesByLabel(pin)]
+            self.assertEqual(sorted(aref_shapes), sorted(sref_shapes))
+
+        debug.info(2, "Checking the cached size follows edits")
+        (ll, ur) = aref_layout.measureBoundary("bitcell_array")
+        aref_layout.addBox(layerNumber=1, offsetInMicrons=ur, width=1.0, height=2.0)
+        (new_ll, new_ur) = aref_layout.measureBoundary("bitcell_array")
+        self.assertEqual(new_ll, ll)
+        self.assertAlmostEqual(new_ur[0], ur[0]+1.0)
+        self.assertAlmostEqual(new_ur[1], ur[1]+2.0)
+
+        self.reset()
+        globals.end_AMC()
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
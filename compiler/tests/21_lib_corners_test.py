@@ -0,0 +1,106 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on writing the .lib file of every corner from the simulations of all the corners. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+class sram_stub():
+    """ The sizes of an sram the .lib file is written for, without its layout """
+
+    name = "sram_stub"
+    addr_size = 4
+    word_size = 2
+    w_per_row = 1
+    num_rows = 16
+    width = 10.0
+    height = 20.0
+
+class lib_corners_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        from characterizer import lib, charutils
+
+        corners_opts = (OPTS.process_corners, OPTS.supply_voltages, OPTS.temperatures)
+        OPTS.process_corners = ["TT", "SS"]
+        OPTS.supply_voltages = [4.5, 5.5]
+        OPTS.temperatures = [0, 100]
+        metrics = ["write_delay_lh", "write_delay_hl", "read_delay_lh", "read_delay_hl",
+                   "read_write_delay_lh", "read_write_delay_hl", "slew_lh", "slew_hl",
+                   "leakage_power", "read_power", "write_power", "read_write_power"]
+        simulated = []
+
+        def value(corner, slew, load, lib_file):
+            """ A measurement that encodes its corner and its slew/load pair """
+            (proc, volt, temp) = corner
+            return (10000*OPTS.process_corners.index(proc) + 1000*volt + temp
+                    + 0.1*list(lib_file.slews).index(slew) + 0.01*list(lib_file.loads).index(load))
+
+        def simulate_point(size, corner, name, w_per_row, num_rows, load, slew, work_dir):
+            simulated.append(work_dir)
+            return dict((m, value(corner, slew, load, lib.lib.current)) for m in metrics)
+
+        def run_parallel(function, args_list, processes=0):
+            # the points finish in reverse order, the results still follow the points
+            results = [function(*args) for args in reversed(args_list)]
+            return list(reversed(results))
+
+        class current_lib(lib.lib):
+            """ Keeps the lib being built so the stub simulations can read its slews and loads """
+            def prepare_tables(self):
+                lib.lib.prepare_tables(self)
+                lib.lib.current = self
+
+        (simulate_point_orig, run_parallel_orig) = (lib.simulate_point, charutils.run_parallel)
+        (lib.simulate_point, charutils.run_parallel) = (simulate_point, run_parallel)
+        try:
+            lib_file = current_lib(out_dir=OPTS.AMC_temp, sram=sram_stub())
+        finally:
+            (lib.simulate_point, charutils.run_parallel) = (simulate_point_orig, run_parallel_orig)
+
+        debug.info(1, "Checking every corner and slew/load pair is simulated in its own directory")
+        num_points = len(lib_file.slews)*len(lib_file.loads)
+        self.assertEqual(len(lib_file.corners), 8)
+        self.assertEqual(len(simulated), 8*num_points)
+        self.assertEqual(len(set(simulated)), len(simulated))
+
+        debug.info(1, "Checking each corner gets its own measurements in slew/load order")
+        for (corner, corner_name, lib_name) in zip(lib_file.corners, lib_file.corner_names, lib_file.lib_files):
+            (proc, volt, temp) = corner
+            expected = [value(corner, slew, load, lib_file) for slew in lib_file.slews for load in lib_file.loads]
+            for m in metrics:
+                self.assertEqual(lib_file.corner_results[corner][m], expected)
+            self.assertTrue(proc in corner_name and "{0}C".format(temp) in corner_name)
+
+            text = open(lib_name).read()
+            self.assertTrue("library ({0}_lib)".format(corner_name) in text)
+            self.assertTrue("voltage : {0} ;".format(volt) in text)
+            self.assertTrue("temperature : {0};".format(temp) in text)
+            rounded = [charutils.round_time(x) for x in expected]
+            for i in range(len(lib_file.slews)):
+                self.assertTrue(lib_file.create_list(rounded[i*len(lib_file.loads):(i+1)*len(lib_file.loads)]) in text)
+            self.assertTrue("value : {0};".format(expected) in text)
+            os.remove(lib_name)
+
+        (OPTS.process_corners, OPTS.supply_voltages, OPTS.temperatures) = corners_opts
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
@@ -0,0 +1,53 @@
+# BSD 3-Clause License (See LICENSE.OR for licensing information)
+# Copyright (c) 2016-2019 Regents of the University of California
+# and The Board of Regents for the Oklahoma Agricultural and
+# Mechanical College (acting for and on behalf of Oklahoma State University)
+# All rights reserved.
+
+
+"Run a regresion test on running characterization points in a pool of processes. "
+
+import unittest
+from testutils import header, AMC_test
+import sys, os, time
+sys.path.append(os.path.join(sys.path[0],".."))
+import globals
+from globals import OPTS
+import debug
+
+def simulate(slew, load):
+    """ Stands for a simulation, the first points finish last """
+
+    time.sleep(0.05/slew)
+    return (slew, load, os.getpid())
+
+class run_parallel_test(AMC_test):
+
+    def runTest(self):
+        globals.init_AMC("config_20_{0}".format(OPTS.tech_name))
+
+        from characterizer import charutils
+
+        debug.info(1, "Checking the simulations run one at a time unless more processes are asked for")
+        self.assertEqual(OPTS.num_sim_processes, 1)
+
+        points = [(slew, load) for slew in [1, 2, 4] for load in [1, 8]]
+
+        debug.info(1, "Checking the results are in the order of the points")
+        results = charutils.run_parallel(simulate, points, 3)
+        self.assertEqual([(slew, load) for (slew, load, pid) in results], points)
+
+        debug.info(1, "Checking one process runs the points in this process")
+        results = charutils.run_parallel(simulate, points, 1)
+        self.assertEqual([(slew, load) for (slew, load, pid) in results], points)
+        self.assertEqual(set(pid for (slew, load, pid) in results), set([os.getpid()]))
+
+        globals.end_AMC()
+
+
+# instantiate a copy of the class to actually run the test
+if __name__ == "__main__":
+    (OPTS, args) = globals.parse_args()
+    del sys.argv[1:]
+    header(__file__, OPTS.tech_name)
+    unittest.main()
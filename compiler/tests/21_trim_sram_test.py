@@ -23,6 +23,7 @@ class sram_test(AMC_test):
         
         import sram
         from characterizer import trim_spice
+        from tech import spice
  
         debug.info(1, "SRAM Test")
         a = sram.sram(word_size=16, words_per_row=1, num_rows=64, 
@@ -40,10 +41,64 @@ class sram_test(AMC_test):
         
         address1="1"*a.addr_size
         address2="0"*a.addr_size
+
+        def cell_caps(trim):
+            """ The capacitance of each pin of the bitcell, from the size of its transistors """
+            caps = dict((pin, 0.0) for pin in trim.cell.pins)
+            for (line, nets, master) in trim.cell.elements:
+                if not line.upper().startswith("M"):
+                    continue
+                params = dict(x.lower().split("=") for x in line.split() if "=" in x)
+                (width, length) = [trim_spice.microns(params[x]) for x in ["w", "l"]]
+                for (position, net) in enumerate(nets[0:3]):
+                    if net in caps:
+                        caps[net] += width*length*spice["gate_cap"] if position == 1 else width*spice["drain_cap"]
+            return caps
+
+        def check_loads(trim, reduced):
+            """ The load on each net of the bitcell array is the pins of the cells removed from the net """
+            lines = reduced.split("\n")
+            start = lines.index(trim.array.line)
+            array_lines = lines[start:lines.index(".ENDS {0}".format(trim.array.name), start)]
+            caps = cell_caps(trim)
+            expected = {}
+            for (line, nets, master) in trim.array.elements:
+                if master == trim.cell.name and line not in array_lines:
+                    for (pin, net) in zip(trim.cell.pins, nets):
+                        expected[net] = expected.get(net, 0.0) + caps[pin]
+            loads = [line.split() for line in array_lines if line.startswith("Ctrim_load")]
+            self.assertTrue(len(loads) > 0)
+            for (name, net, ground, cap) in loads:
+                self.assertAlmostEqual(float(cap[:-1]), expected[net], places=2)
+            return dict((net, float(cap[:-1])) for (name, net, ground, cap) in loads)
         
         reduced_file="{0}{1}".format(OPTS.AMC_temp, "reduced.sp")
-        trim_spice.trim_spice(filename, reduced_file, a.word_size, a.w_per_row, a.num_rows, 
-                              address1, address2)
+        trim = trim_spice.trim_spice(filename, reduced_file, a.word_size, a.w_per_row, a.num_rows, 
+                                     address1, address2)
+        reduced = open(reduced_file).read()
+        debug.info(1, "Checking only the cells of the addressed rows are kept")
+        for col in range(a.word_size):
+            for row in [0, a.num_rows-1]:
+                self.assertTrue("Xbit_r{0}_c{1} ".format(row, col) in reduced)
+        self.assertFalse("Xbit_r1_c0 " in reduced)
+        self.assertTrue("Ctrim_load" in reduced)
+
+        debug.info(1, "Checking the loads on the kept bit lines and word lines")
+        loads = check_loads(trim, reduced)
+        self.assertAlmostEqual(loads["bl[0]"], (a.num_rows-2)*cell_caps(trim)["bl"], places=2)
+        self.assertTrue(0 < trim.flat_transistors(trim.removed) < trim.flat_transistors())
+
+        debug.info(1, "Checking one data bit trims the other arrays")
+        trim = trim_spice.trim_spice(filename, reduced_file, a.word_size, a.w_per_row, a.num_rows, 
+                                     address1, address2, data_bits=[3])
+        reduced = open(reduced_file).read()
+        self.assertTrue("Xsense_amp3 " in reduced)
+        self.assertFalse("Xsense_amp5 " in reduced)
+        self.assertFalse("Xwrite_driver5 " in reduced)
+        self.assertFalse("Xpre_column_5 " in reduced)
+        check_loads(trim, reduced)
+        # the trim does not change the parsed netlist
+        self.assertEqual(len(trim.subckts["bitcell_ary"].elements), a.word_size*a.num_rows)
         globals.end_AMC()
         
 # instantiate a copy of the class to actually run the test
@@ -69,10 +69,11 @@ class AMC_test(unittest.TestCase):
                 os.remove(f)        
 
     def reset(self):
-        """ Reset the static duplicate name checker for unit tests """
+        """ Reset the static duplicate name checker and built designs for unit tests """
         
         import design
-        design.design.name_map=[]
+        design.design.name_map=set()
+        design.design_registry.designs.clear()
 
 
     def isdiff(self,file1,file2):
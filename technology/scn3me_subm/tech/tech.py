@@ -322,6 +322,12 @@ SPICE_MODEL_DIR=os.environ.get("SPICE_MODEL_DIR")
 #spice stimulus related variables
 spice["inv_delay"] = 0.14                    # Estimated inverter gate delay [ns]
 spice["input_cap"] = 10                     # Input capacitance of split cell (Din,ctrl,addr) [fF] 
+spice["gate_cap"] = 2.5                     # Estimated gate capacitance per channel area [fF/um^2]
+spice["drain_cap"] = 1.0                    # Estimated drain/source capacitance per transistor width [fF/um]
+# Both come from the TT_on_c5n.mod models: gate_cap is eps_ox/TOX (3.45e-11/1.39e-8 F/m^2).
+# drain_cap is the junction of a 1.5um long diffusion (CJ of 0.42 and 0.72 fF/um^2),
+# its far side wall (CJSW, 0.32 and 0.27 fF/um) and the gate overlap (CGDO, 0.2 and 0.29 fF/um)
+# of the nmos and pmos, with the junctions reverse biased at half the supply (MJ, PB): 0.8 and 1.05 fF/um.
 spice["feasible_period"] = 5                # estimated feasible period in ns
 spice["supply_voltages"] = [4.5, 5.0, 5.5]  # Supply voltage corners in [V]
 spice["nom_supply_voltage"] = 5.0           # Nominal supply voltage in [V]